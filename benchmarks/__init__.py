@@ -0,0 +1,11 @@
+"""
+性能基准 (在仓库根目录执行)
+
+    python -m benchmarks engine [--quick] [--sizes 1K,1M,1G] [--chunks auto,1M] [--dir tmpfs=/dev/shm] [-o 结果.json]
+    python -m benchmarks batch [--files 2000] [--depth 3] [--dist lognormal:256K:1.5] [--combos plain,struct+dirname]
+    python -m benchmarks record (<目录>... | --journal <任务ID>) -o 清单.json
+    python -m benchmarks replay <清单.json> [--scale 0.1] [--ssd DIR]
+    python -m benchmarks compare <基准结果.json> <新结果.json> [--threshold 10]
+
+结果默认写入 Logs/Bench/，compare 发现退化超过阈值时返回退出码 1 (可用于 CI)。
+"""
@@ -0,0 +1,188 @@
+import os
+import sys
+import argparse
+import tempfile
+import multiprocessing
+
+# 允许从任意目录执行 python -m benchmarks (子进程同样继承此路径)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks import common, engine, batch
+
+EXIT_OK = 0
+EXIT_REGRESSION = 1
+EXIT_USAGE = 2
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="python -m benchmarks", description="Encryption Studio 性能基准")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("engine", help="单文件引擎吞吐 / 内存峰值 + 文本加密 ops/s")
+    p.add_argument("--sizes", help=f"文件大小列表 (默认 {engine.DEFAULT_SIZES})")
+    p.add_argument("--chunks", default=engine.DEFAULT_CHUNKS,
+                   help="分块上限列表，auto 为引擎自动选择 (默认 %(default)s)")
+    p.add_argument("--dir", action="append", metavar="[名称=]DIR",
+                   help="测试文件所在目录，可重复 (默认 tmpfs=/dev/shm 与系统临时目录)")
+    p.add_argument("--repeat", type=int, default=3, help="每个用例重复次数，取最快一次 (默认 %(default)s)")
+    p.add_argument("--quick", action="store_true", help=f"快速模式: 大小 {engine.QUICK_SIZES}，重复 1 次")
+    p.add_argument("--no-text", action="store_true", help="跳过文本加密基准")
+    p.add_argument("--no-file", action="store_true", help="跳过文件加解密基准")
+    p.add_argument("-o", "--out", help="结果文件路径 (默认 Logs/Bench/engine_<时间>.json)")
+
+    for name, help_text in (("batch", "合成目录树的端到端批处理 (按选项组合)"),
+                            ("replay", "按记录的清单重建目录树并执行批处理")):
+        p = sub.add_parser(name, help=help_text)
+        if name == "batch":
+            p.add_argument("--files", type=int, default=2000, help="文件数 (默认 %(default)s)")
+            p.add_argument("--depth", type=int, default=3, help="最大目录深度 (默认 %(default)s)")
+            p.add_argument("--fanout", type=int, default=4, help="每层子目录数 (默认 %(default)s)")
+            p.add_argument("--dist", default=batch.DEFAULT_DIST,
+                           help="文件大小分布: fixed:1M / uniform:4K:16M / lognormal:中位数:sigma / "
+                                "mix:4K=70,1M=25,64M=5 (默认 %(default)s)")
+            p.add_argument("--seed", type=int, default=1, help="随机种子 (相同参数生成相同的目录树)")
+        else:
+            p.add_argument("manifest", help="record 生成的清单 JSON")
+            p.add_argument("--scale", type=float, default=1.0, help="按比例缩放文件大小 (默认 %(default)s)")
+        p.add_argument("--combos", help=f"选项组合，逗号分隔，组合内用 + 连接 ({'/'.join(batch.COMBO_TOKENS)})，"
+                                        f"默认 {','.join(batch.DEFAULT_COMBOS)}"
+                                        + (" (重放时默认使用原任务的选项)" if name == "replay" else ""))
+        p.add_argument("--dir", default=None, help="生成测试数据的目录 (默认系统临时目录)")
+        p.add_argument("--ssd", metavar="DIR", help="SSD 暂存目录 (组合中含 ssd 时使用；指定后默认组合另加 +ssd)")
+        p.add_argument("--decrypt", action="store_true", help="同时测量解密 (对加密输出再解密)")
+        p.add_argument("--repeat", type=int, default=1, help="每个组合重复次数，取最快一次 (默认 %(default)s)")
+        p.add_argument("-o", "--out", help="结果文件路径 (默认 Logs/Bench/batch_<时间>.json)")
+
+    p = sub.add_parser("record", help="记录真实任务的清单 (只含目录结构与文件大小)")
+    p.add_argument("paths", nargs="*", metavar="PATH", help="任务的输入文件或目录")
+    p.add_argument("--journal", metavar="JOB", help="从任务日志读取 (任务 ID 或日志文件路径)")
+    p.add_argument("--keep-names", action="store_true", help="保留真实文件名 (默认替换为哈希，只保留扩展名)")
+    p.add_argument("-o", "--out", required=True, help="清单输出路径")
+
+    p = sub.add_parser("compare", help="比较两次结果，标出退化")
+    p.add_argument("base", help="基准结果 JSON")
+    p.add_argument("new", help="新结果 JSON")
+    p.add_argument("--threshold", type=float, default=10.0, help="允许的退化百分比 (默认 %(default)s)")
+    p.add_argument("--all", action="store_true", help="列出全部指标 (默认只列出变化超过阈值的)")
+    return parser
+
+
+def run_engine(args):
+    sizes = [common.parse_size(s) for s in (args.sizes or (engine.QUICK_SIZES if args.quick
+                                                           else engine.DEFAULT_SIZES)).split(",") if s.strip()]
+    chunks = engine.parse_chunks(args.chunks)
+    dirs = engine.parse_dirs(args.dir) if args.dir else engine.default_dirs()
+    repeat = 1 if args.quick else max(1, args.repeat)
+
+    cases = []
+    if not args.no_file:
+        print(f"📦 文件加解密: 大小 {', '.join(map(common.size_label, sizes))}，目录 "
+              f"{', '.join(f'{n}={p}' for n, p in dirs)}", flush=True)
+        cases += engine.run_file_cases(sizes, chunks, dirs, repeat)
+    if not args.no_text:
+        print("📝 文本加密", flush=True)
+        cases += engine.run_text_cases()
+
+    print()
+    engine.summarize(cases)
+    path = common.save_results("engine", cases, args.out,
+                               params={"sizes": sizes, "chunks": args.chunks, "repeat": repeat,
+                                       "dirs": dict(dirs)})
+    print(f"\n结果已保存: {path}")
+    return EXIT_OK
+
+
+def _combos(args, default):
+    if args.combos:
+        return batch.parse_combos(args.combos)
+    combos = list(default)
+    if args.ssd:
+        combos += [c + "+ssd" for c in combos if "ssd" not in c]
+    return combos
+
+
+def run_batch(args):
+    work_dir = os.path.abspath(args.dir or tempfile.gettempdir())
+    os.makedirs(work_dir, exist_ok=True)
+    if args.command == "batch":
+        manifest = batch.synthetic_manifest(args.files, args.depth, args.fanout, args.dist, args.seed)
+        name = f"synthetic-{args.files}-{args.dist}"
+        combos = _combos(args, batch.DEFAULT_COMBOS)
+        scale = 1.0
+    else:
+        manifest = batch.load_manifest(args.manifest)
+        name = "replay-" + os.path.splitext(os.path.basename(args.manifest))[0]
+        combos = _combos(args, [batch.combo_of(manifest["options"])] if manifest.get("options")
+                         else batch.DEFAULT_COMBOS)
+        scale = args.scale
+        print(f"📋 清单来源: {manifest.get('source')}")
+
+    cases = batch.run_workload(name, manifest, combos, work_dir, ssd_dir=args.ssd, decrypt=args.decrypt,
+                               scale=scale, repeat=args.repeat)
+    print()
+    batch.summarize(cases)
+    path = common.save_results("batch", cases, args.out,
+                               params={"workload": name, "source": manifest.get("source"), "combos": combos,
+                                       "scale": scale, "dir": work_dir, "ssd": args.ssd})
+    print(f"\n结果已保存: {path}")
+    return EXIT_OK
+
+
+def run_record(args):
+    if bool(args.journal) == bool(args.paths):
+        print("❌ 请指定输入路径或 --journal (二选一)", file=sys.stderr)
+        return EXIT_USAGE
+    journal = None
+    if args.journal:
+        from core.journal import JournalState, JOURNAL_SUFFIX
+        from config import DIRS
+        path = args.journal if os.path.isfile(args.journal) else os.path.join(
+            DIRS["JOURNAL"], f"Job_{args.journal}{JOURNAL_SUFFIX}")
+        journal = JournalState.load(path)
+    manifest = batch.record_manifest(args.paths, journal, args.keep_names)
+    batch.save_manifest(manifest, args.out)
+    print(f"✅ 已记录 {batch.manifest_summary(manifest)} -> {args.out}")
+    return EXIT_OK
+
+
+def run_compare(args):
+    base, new = common.load_results(args.base), common.load_results(args.new)
+    rows = common.compare_results(base, new, args.threshold)
+    if not rows:
+        print("⚠️ 两份结果没有可比较的用例")
+        return EXIT_USAGE
+
+    regressions = [r for r in rows if r[5]]
+    shown = rows if args.all else [r for r in rows if r[5] or abs(r[4]) > args.threshold]
+    if shown:
+        common.print_table(("用例", "指标", "基准", "新值", "变化", ""),
+                           [(name, metric, before, after, f"{change:+.1f}%", "❌ 退化" if bad else "")
+                            for name, metric, before, after, change, bad in shown])
+    for env_name, res in (("基准", base), ("新值", new)):
+        env = res.get("env", {})
+        print(f"{env_name}: {env.get('time')} {env.get('commit') or ''} {env.get('platform')}")
+    if regressions:
+        print(f"\n❌ {len(regressions)} 项指标退化超过 {args.threshold}%")
+        return EXIT_REGRESSION
+    print(f"\n✅ 共比较 {len(rows)} 项指标，无超过 {args.threshold}% 的退化")
+    return EXIT_OK
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    try:
+        if args.command == "engine":
+            return run_engine(args)
+        if args.command in ("batch", "replay"):
+            return run_batch(args)
+        if args.command == "record":
+            return run_record(args)
+        return run_compare(args)
+    except (OSError, ValueError) as e:
+        print(f"❌ {e}", file=sys.stderr)
+        return EXIT_USAGE
+
+
+if __name__ == "__main__":
+    multiprocessing.freeze_support()
+    sys.exit(main())
@@ -0,0 +1,312 @@
+import os
+import json
+import time
+import random
+import shutil
+import hashlib
+import tempfile
+
+from benchmarks.common import parse_size, size_label, free_bytes, peak_rss_mb, run_isolated, print_table
+
+MANIFEST_VERSION = 1
+DEFAULT_DIST = "lognormal:256K:1.5"
+# 组合选项：plain 平铺输出 / struct 保持结构 / dirname 加密目录名 (含 struct) / ssd 暂存加速 / noname 不混淆文件名
+COMBO_TOKENS = ("plain", "struct", "dirname", "ssd", "noname")
+DEFAULT_COMBOS = ("plain", "struct", "struct+dirname")
+EXTENSIONS = (".jpg", ".pdf", ".docx", ".mp4", ".txt", ".zip", ".xlsx")
+# 生成的源文件 + 输出 + 暂存 预留的倍数
+SPACE_FACTOR = 2.5
+_RANDOM_BLOCK = 4 * 1024 * 1024
+_KEY = "benchmark"
+
+
+# ================= 大小分布 =================
+def parse_dist(text):
+    """
+    文件大小分布：
+      fixed:1M                      全部相同
+      uniform:4K:16M                均匀分布
+      lognormal:256K:1.5            对数正态 (中位数, sigma)，接近真实文件集合
+      mix:4K=70,1M=25,64M=5         按权重混合的几档固定大小
+    返回 sampler(rng) -> 字节数
+    """
+    kind, _, rest = text.partition(":")
+    args = rest.split(":") if rest else []
+    if kind == "fixed" and len(args) == 1:
+        size = parse_size(args[0])
+        return lambda rng: size
+    if kind == "uniform" and len(args) == 2:
+        lo, hi = parse_size(args[0]), parse_size(args[1])
+        return lambda rng: rng.randint(lo, hi)
+    if kind == "lognormal" and len(args) == 2:
+        import math
+        mu, sigma = math.log(max(parse_size(args[0]), 1)), float(args[1])
+        return lambda rng: max(0, int(rng.lognormvariate(mu, sigma)))
+    if kind == "mix" and rest:
+        sizes, weights = [], []
+        for item in rest.split(","):
+            size, _, weight = item.partition("=")
+            sizes.append(parse_size(size))
+            weights.append(float(weight or 1))
+        return lambda rng: rng.choices(sizes, weights)[0]
+    raise ValueError(f"无法解析大小分布: {text}")
+
+
+# ================= 生成目录树 =================
+class _ContentWriter:
+    """用一块随机数据循环切片写入，生成大批量文件时避免逐字节 urandom 的开销"""
+
+    def __init__(self, seed):
+        self.block = random.Random(seed).randbytes(_RANDOM_BLOCK)
+
+    def write(self, path, size):
+        with open(path, 'wb') as f:
+            offset = 0
+            while size > 0:
+                n = min(size, _RANDOM_BLOCK - offset)
+                f.write(self.block[offset:offset + n])
+                size -= n
+                offset = (offset + n) % _RANDOM_BLOCK
+
+
+def synthetic_manifest(files, depth, fanout, dist, seed=1):
+    """按参数生成清单 (相对路径, 大小)：每个文件随机落在 0~depth 层、每层 fanout 个子目录之一"""
+    rng = random.Random(seed)
+    sampler = parse_dist(dist)
+    entries = []
+    for n in range(files):
+        parts = [f"d{rng.randrange(fanout)}" for _ in range(rng.randint(0, depth))]
+        stem = f"文件_{n}" if n % 5 == 0 else f"file_{n}"
+        parts.append(stem + rng.choice(EXTENSIONS))
+        entries.append(("/".join(parts), sampler(rng)))
+    return {"version": MANIFEST_VERSION, "source": f"synthetic files={files} depth={depth} fanout={fanout} "
+                                                   f"dist={dist} seed={seed}",
+            "files": entries, "options": {}}
+
+
+def materialize(manifest, root, scale=1.0, seed=1):
+    """按清单在 root 下生成文件 (内容随机)，scale 按比例缩放文件大小"""
+    writer = _ContentWriter(seed)
+    total = 0
+    for rel, size in manifest["files"]:
+        path = os.path.join(root, *rel.split("/"))
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        size = int(size * scale)
+        writer.write(path, size)
+        total += size
+    return total
+
+
+# ================= 记录清单 =================
+def _anonymize(part, is_file):
+    digest = hashlib.sha1(part.encode("utf-8")).hexdigest()[:10]
+    if is_file:
+        return f"f_{digest}{os.path.splitext(part)[1].lower()}"
+    return f"d_{digest}"
+
+
+def _relative_entries(pairs):
+    """[(绝对路径, 大小)] -> 相对于公共目录的 [(相对路径, 大小)]"""
+    if not pairs:
+        return []
+    dirs = [os.path.dirname(p) for p, _ in pairs]
+    base = os.path.commonpath(dirs) if len(set(os.path.splitdrive(d)[0] for d in dirs)) == 1 else ""
+    entries = []
+    for p, size in pairs:
+        rel = os.path.relpath(p, base) if base else p.lstrip(os.sep)
+        entries.append((rel.replace(os.sep, "/"), size))
+    return entries
+
+
+def record_manifest(paths=None, journal=None, keep_names=False):
+    """
+    记录真实任务的清单 (只含目录结构与文件大小，不读取内容)。
+    journal: 任务日志 (JournalState)，取其中计划处理的文件与任务选项；否则扫描 paths。
+    keep_names=False 时每级目录名与文件名替换为哈希 (保留扩展名)，清单可以带出生产环境。
+    """
+    options = {}
+    if journal is not None:
+        pairs = [(src, size) for src, (size, _) in journal.planned.items()]
+        source = f"journal {journal.job_id}"
+        options = {k: journal.options[k] for k in ("keep_structure", "encrypt_filename", "encrypt_dirname",
+                                                   "use_ssd") if k in journal.options}
+        options["is_encrypt"] = journal.is_encrypt
+    else:
+        pairs = []
+        for p in paths:
+            p = os.path.abspath(p)
+            if os.path.isfile(p):
+                pairs.append((p, os.path.getsize(p)))
+                continue
+            for dirpath, _, names in os.walk(p):
+                for name in names:
+                    full = os.path.join(dirpath, name)
+                    try: pairs.append((full, os.path.getsize(full)))
+                    except OSError: pass
+        source = "scan"
+
+    entries = _relative_entries(pairs)
+    if not keep_names:
+        entries = [("/".join(_anonymize(x, i == len(parts) - 1) for i, x in enumerate(parts)), size)
+                   for parts, size in ((rel.split("/"), size) for rel, size in entries)]
+    return {"version": MANIFEST_VERSION, "source": source, "created": time.strftime("%Y-%m-%d %H:%M:%S"),
+            "files": sorted(entries), "options": options}
+
+
+def save_manifest(manifest, path):
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    # 每个文件一行，大清单也便于 diff / grep
+    head = json.dumps({k: v for k, v in manifest.items() if k != "files"}, ensure_ascii=False)[:-1]
+    lines = ",\n".join(json.dumps(e, ensure_ascii=False) for e in manifest["files"])
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(f'{head}, "files": [\n{lines}\n]}}\n')
+
+
+def load_manifest(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        manifest = json.load(f)
+    if manifest.get("version") != MANIFEST_VERSION or "files" not in manifest:
+        raise ValueError(f"无效的清单文件: {path}")
+    return manifest
+
+
+def manifest_summary(manifest):
+    sizes = sorted(size for _, size in manifest["files"])
+    if not sizes:
+        return "0 个文件"
+    depth = max(rel.count("/") for rel, _ in manifest["files"])
+    return (f"{len(sizes)} 个文件, {sum(sizes) / 1024 ** 2:.1f}MB, 中位数 {size_label(sizes[len(sizes) // 2])}, "
+            f"最大 {size_label(sizes[-1])}, 目录深度 {depth}")
+
+
+# ================= 执行 =================
+def parse_combos(text):
+    combos = []
+    for item in text.split(","):
+        tokens = [t for t in item.strip().split("+") if t]
+        bad = [t for t in tokens if t not in COMBO_TOKENS]
+        if bad or not tokens:
+            raise ValueError(f"未知的组合选项: {item} (可用: {', '.join(COMBO_TOKENS)})")
+        combos.append("+".join(tokens))
+    return combos
+
+
+def combo_of(options):
+    """清单中记录的任务选项 -> 组合名 (重放时默认按原任务的选项执行)"""
+    tokens = []
+    if options.get("encrypt_dirname"): tokens.append("dirname")
+    elif options.get("keep_structure"): tokens.append("struct")
+    if options.get("use_ssd"): tokens.append("ssd")
+    if options.get("encrypt_filename") is False: tokens.append("noname")
+    return "+".join(tokens) or "plain"
+
+
+def combo_options(combo, ssd_dir):
+    tokens = set(combo.split("+"))
+    if "ssd" in tokens and not ssd_dir:
+        raise ValueError(f"组合 {combo} 需要 --ssd 目录")
+    return dict(keep_structure="struct" in tokens or "dirname" in tokens,
+                encrypt_dirname="dirname" in tokens,
+                encrypt_filename="noname" not in tokens,
+                use_ssd="ssd" in tokens, ssd_dir=ssd_dir if "ssd" in tokens else None)
+
+
+def _batch_case(src, out, is_encrypt, options):
+    """子进程内执行：无界面运行一个完整批次，返回吞吐 / 首个输出时间 / 总耗时 / 内存峰值"""
+    from core.batch_runner import BatchRunner
+
+    first = {}
+    logs = []
+    start = time.perf_counter()
+
+    def on_result(path, ok, detail):
+        if ok and "t" not in first:
+            first["t"] = time.perf_counter() - start
+
+    runner = BatchRunner([src], _KEY, is_encrypt, custom_out_dir=out,
+                         on_progress=lambda text, pct: None, on_log=logs.append, on_result=on_result,
+                         **(options if is_encrypt else dict(options, encrypt_filename=False, encrypt_dirname=False)))
+    results = runner.run()
+    makespan = time.perf_counter() - start
+
+    done_bytes = 0
+    for s, _ in results["success"]:
+        try: done_bytes += os.path.getsize(s)
+        except OSError: pass
+    snap = runner.metrics_snapshot() or {}
+    try:
+        import resource
+        # 已退出的子进程 (工作进程 / 通信 Manager) 中内存峰值最大的一个
+        children = round(resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024, 1)
+    except ImportError:
+        children = None
+    return {
+        "metrics": {"files_s": round(len(results["success"]) / makespan, 1),
+                    "mb_s": round(done_bytes / makespan / 1024 / 1024, 2),
+                    "ttfb": round(first.get("t", makespan), 3),
+                    "makespan": round(makespan, 3),
+                    "peak_rss_mb": peak_rss_mb(),
+                    "worker_rss_mb": children},
+        "ok": len(results["success"]), "fail": len(results["fail"]),
+        "bottleneck": runner.metrics.bottleneck() if runner.metrics else None,
+        "utilization": snap.get("utilization"),
+        "errors": [line for line in logs if line.startswith("❌")][:5],
+    }
+
+
+def run_workload(name, manifest, combos, work_dir, ssd_dir=None, decrypt=False, scale=1.0, repeat=1, log=print):
+    """生成清单对应的目录树，逐个组合执行 (每次在独立子进程中)，返回用例结果"""
+    total = int(sum(size for _, size in manifest["files"]) * scale)
+    # 目录不存在时 free_bytes 返回 0，会被误报为空间不足
+    if not os.path.isdir(work_dir):
+        raise OSError(f"测试数据目录不存在: {work_dir}")
+    if free_bytes(work_dir) < total * SPACE_FACTOR:
+        raise OSError(f"{work_dir} 可用空间不足 (需要约 {total * SPACE_FACTOR / 1024 ** 2:.0f}MB)")
+
+    root = tempfile.mkdtemp(prefix="encbatch_", dir=work_dir)
+    cases = []
+    try:
+        src = os.path.join(root, "src")
+        log(f"📦 生成测试数据: {manifest_summary(manifest)}" + (f" (大小 ×{scale})" if scale != 1.0 else ""))
+        materialize(manifest, src, scale)
+
+        for combo in combos:
+            options = combo_options(combo, ssd_dir)
+            ops = (True, False) if decrypt else (True,)
+            best = {}
+            for _ in range(max(1, repeat)):
+                enc_out = os.path.join(root, "enc")
+                dec_out = os.path.join(root, "dec")
+                for is_encrypt in ops:
+                    op = "encrypt" if is_encrypt else "decrypt"
+                    r = run_isolated(_batch_case, src if is_encrypt else enc_out,
+                                     enc_out if is_encrypt else dec_out, is_encrypt, options)
+                    if op not in best or r["metrics"]["makespan"] < best[op]["metrics"]["makespan"]:
+                        best[op] = r
+                shutil.rmtree(enc_out, ignore_errors=True)
+                shutil.rmtree(dec_out, ignore_errors=True)
+
+            for op, r in best.items():
+                case = f"batch/{op}/{name}/{combo}"
+                m = r["metrics"]
+                log(f"  {case}: {m['files_s']} 文件/s, {m['mb_s']} MB/s, 首个输出 {m['ttfb']}s, "
+                    f"总耗时 {m['makespan']}s" + (f", 失败 {r['fail']}" if r["fail"] else ""))
+                for line in r["errors"]:
+                    log(f"    {line}")
+                cases.append({"name": case, "metrics": m,
+                              "params": {"op": op, "workload": name, "combo": combo, "files": r["ok"] + r["fail"],
+                                         "fail": r["fail"], "bottleneck": r["bottleneck"],
+                                         "utilization": r["utilization"]}})
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+    return cases
+
+
+def summarize(cases):
+    rows = []
+    for c in cases:
+        m, p = c["metrics"], c["params"]
+        rows.append((c["name"], m["files_s"], m["mb_s"], m["ttfb"], m["makespan"], m["peak_rss_mb"],
+                     m["worker_rss_mb"], p.get("bottleneck") or ""))
+    print_table(("用例", "文件/s", "MB/s", "首个输出(s)", "总耗时(s)", "主进程内存(MB)", "工作进程内存(MB)", "瓶颈"),
+                rows)
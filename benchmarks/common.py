@@ -0,0 +1,139 @@
+import os
+import sys
+import json
+import time
+import shutil
+import platform
+import subprocess
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+from config import BASE_DIR
+
+# 结果文件默认目录
+RESULTS_DIR = os.path.join(BASE_DIR, "Logs", "Bench")
+
+# 各指标的方向：1 越大越好，-1 越小越好 (compare 据此判断退化)
+METRIC_DIRECTION = {
+    "mb_s": 1, "files_s": 1, "ops_s": 1,
+    "seconds": -1, "ttfb": -1, "makespan": -1, "peak_rss_mb": -1, "worker_rss_mb": -1,
+}
+# 内存指标的绝对容差 (MB)：小于此变化视为噪声
+RSS_TOLERANCE_MB = 8
+
+_UNITS = {"K": 1024, "M": 1024 ** 2, "G": 1024 ** 3, "T": 1024 ** 4}
+
+
+def parse_size(text):
+    """'64K' / '1M' / '4G' / '1500' -> 字节数"""
+    text = text.strip().upper().rstrip("B")
+    if text and text[-1] in _UNITS:
+        return int(float(text[:-1]) * _UNITS[text[-1]])
+    return int(text)
+
+
+def size_label(n):
+    for unit in ("G", "M", "K"):
+        if n >= _UNITS[unit] and n % _UNITS[unit] == 0:
+            return f"{n // _UNITS[unit]}{unit}"
+    return str(n)
+
+
+def write_random_file(path, size, block=4 * 1024 * 1024):
+    """生成随机内容的测试文件 (不可压缩，避免文件系统压缩影响结果)"""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'wb') as f:
+        written = 0
+        while written < size:
+            n = min(block, size - written)
+            f.write(os.urandom(n))
+            written += n
+
+
+def free_bytes(path):
+    try:
+        return shutil.disk_usage(path).free
+    except OSError:
+        return 0
+
+
+def peak_rss_mb():
+    """当前进程的内存峰值 (MB)，不支持的平台返回 None"""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux 单位为 KB，macOS 为字节
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def run_isolated(func, *args):
+    """
+    在全新的子进程中执行 func(*args) 并返回结果 (每个用例单独测量内存峰值)。
+    使用 ProcessPoolExecutor 而非 multiprocessing.Pool：后者的守护进程不能再创建批处理的进程池。
+    """
+    with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn")) as pool:
+        return pool.submit(func, *args).result()
+
+
+def environment():
+    """结果附带的运行环境 (比较不同机器的结果时参考)"""
+    commit = None
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=BASE_DIR, capture_output=True,
+                                text=True, timeout=5).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        pass
+    return {"time": time.strftime("%Y-%m-%d %H:%M:%S"), "python": platform.python_version(),
+            "platform": platform.platform(), "machine": platform.machine(), "cpus": os.cpu_count(),
+            "commit": commit}
+
+
+def save_results(kind, cases, out=None, params=None):
+    """保存结果 JSON：{"kind", "env", "params", "cases": [{"name", "params", "metrics"}]}"""
+    if out is None:
+        out = os.path.join(RESULTS_DIR, f"{kind}_{time.strftime('%Y%m%d_%H%M%S')}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+    with open(out, 'w', encoding='utf-8') as f:
+        json.dump({"kind": kind, "env": environment(), "params": params or {}, "cases": cases},
+                  f, ensure_ascii=False, indent=2)
+    return out
+
+
+def load_results(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def compare_results(base, new, threshold):
+    """
+    按用例名与指标逐项比较，返回 [(用例, 指标, 旧值, 新值, 变化百分比, 是否退化)]。
+    threshold: 允许的退化百分比；变化方向见 METRIC_DIRECTION。
+    """
+    base_cases = {c["name"]: c["metrics"] for c in base["cases"]}
+    rows = []
+    for case in new["cases"]:
+        old = base_cases.get(case["name"])
+        if old is None:
+            continue
+        for metric, value in case["metrics"].items():
+            direction = METRIC_DIRECTION.get(metric)
+            before = old.get(metric)
+            if direction is None or value is None or not before:
+                continue
+            change = (value - before) / before * 100
+            worse = -change * direction
+            regressed = worse > threshold
+            if metric.endswith("_rss_mb") and abs(value - before) < RSS_TOLERANCE_MB:
+                regressed = False
+            rows.append((case["name"], metric, before, value, change, regressed))
+    return rows
+
+
+def print_table(headers, rows):
+    widths = [max(len(str(h)), *(len(str(r[i])) for r in rows)) if rows else len(str(h))
+              for i, h in enumerate(headers)]
+    print("  ".join(str(h).ljust(w) for h, w in zip(headers, widths)))
+    for r in rows:
+        print("  ".join(str(v).ljust(w) for v, w in zip(r, widths)))
@@ -0,0 +1,177 @@
+import os
+import time
+import shutil
+import hashlib
+import tempfile
+
+from benchmarks.common import (parse_size, size_label, write_random_file, free_bytes, peak_rss_mb,
+                               run_isolated, print_table)
+
+# 默认参数 (--quick 使用更小的规模)
+DEFAULT_SIZES = "1K,64K,1M,16M,256M,1G"
+QUICK_SIZES = "1K,1M,16M"
+DEFAULT_CHUNKS = "auto,64K,1M,10M,64M"
+TEXT_ALGOS = ("AES", "DES", "TripleDES", "RC4")
+TEXT_HASHES = ("Base64", "MD5", "SHA256")
+TEXT_LENGTHS = (64, 4096)
+
+# 小文件单次耗时太短，重复处理直到累计处理量达到此值 (且不超过 MAX_LOOPS 次)
+TARGET_BYTES = 64 * 1024 * 1024
+MAX_LOOPS = 1000
+# 生成测试文件时为 源 + 密文 + 解密输出 预留的倍数
+SPACE_FACTOR = 3.2
+
+_KEY = hashlib.sha256(b"benchmark").digest()
+
+
+def default_dirs():
+    """tmpfs (内存盘，排除磁盘影响) + 系统临时目录 (磁盘)"""
+    dirs = []
+    if os.path.isdir("/dev/shm"):
+        dirs.append(("tmpfs", "/dev/shm"))
+    dirs.append(("disk", tempfile.gettempdir()))
+    return dirs
+
+
+def _loops(size):
+    return max(1, min(MAX_LOOPS, TARGET_BYTES // max(size, 1)))
+
+
+def _file_case(src, work_dir, is_encrypt, chunk, repeat):
+    """
+    子进程内执行：对 src 重复 加密 / 解密，返回最好一轮的 MB/s 与进程内存峰值。
+    解密用例先加密一次 (不计时) 作为输入。
+    """
+    from core.file_cipher import FileCipherEngine
+
+    engine = FileCipherEngine()
+    size = os.path.getsize(src)
+    rss_before = peak_rss_mb()
+    inp = src
+    if not is_encrypt:
+        ok, msg, inp = engine.process_file_direct(src, os.path.join(work_dir, "input.enc"), _KEY, True)
+        if not ok:
+            raise RuntimeError(msg)
+
+    target = os.path.join(work_dir, "out.enc" if is_encrypt else "out.bin")
+    loops = _loops(size)
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(loops):
+            ok, msg, out = engine.process_file_direct(inp, target, _KEY, is_encrypt,
+                                                      chunk_size=chunk, keep_target_name=True)
+            if not ok:
+                raise RuntimeError(msg)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+
+    return {"mb_s": round(size * loops / best / 1024 / 1024, 2),
+            "files_s": round(loops / best, 1),
+            "peak_rss_mb": peak_rss_mb(),
+            "rss_before_mb": rss_before}
+
+
+def run_file_cases(sizes, chunks, dirs, repeat, log=print):
+    from core.file_cipher import FileCipherEngine
+
+    cases = []
+    for dir_name, base in dirs:
+        root = tempfile.mkdtemp(prefix="encbench_", dir=base)
+        try:
+            for size in sizes:
+                need = int(size * SPACE_FACTOR)
+                if free_bytes(root) < need:
+                    log(f"⚠️ 跳过 {dir_name}/{size_label(size)}：可用空间不足 (需要约 {need / 1024 ** 2:.0f}MB)")
+                    continue
+                src = os.path.join(root, f"src_{size_label(size)}.bin")
+                write_random_file(src, size)
+
+                # 不同上限可能得到相同的实际分块 (引擎按文件大小取值)，只测一次
+                seen = set()
+                for label, cap in chunks:
+                    effective = FileCipherEngine._get_smart_chunk_size(size, cap)
+                    if effective in seen:
+                        continue
+                    seen.add(effective)
+                    for is_encrypt in (True, False):
+                        op = "encrypt" if is_encrypt else "decrypt"
+                        name = f"file/{op}/{dir_name}/{size_label(size)}/chunk={size_label(effective)}"
+                        work = tempfile.mkdtemp(dir=root)
+                        try:
+                            metrics = run_isolated(_file_case, src, work, is_encrypt, cap, repeat)
+                        finally:
+                            shutil.rmtree(work, ignore_errors=True)
+                        log(f"  {name}: {metrics['mb_s']} MB/s, 峰值内存 {metrics['peak_rss_mb']}MB")
+                        cases.append({"name": name, "metrics": metrics,
+                                      "params": {"op": op, "dir": dir_name, "size": size,
+                                                 "chunk_cap": label, "chunk": effective}})
+                os.remove(src)
+        finally:
+            shutil.rmtree(root, ignore_errors=True)
+    return cases
+
+
+def _ops_per_sec(func, min_seconds=0.5):
+    """重复调用 func 至少 min_seconds 秒"""
+    n = 0
+    start = time.perf_counter()
+    while True:
+        for _ in range(100):
+            func()
+        n += 100
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_seconds:
+            return round(n / elapsed, 1)
+
+
+def run_text_cases(log=print):
+    from core.text_cipher import TextCipher
+
+    cases = []
+    for length in TEXT_LENGTHS:
+        text = ("文本加密基准 benchmark " * (length // 16 + 1))[:length]
+        for algo in TEXT_ALGOS:
+            name = f"text/encrypt/{algo}/{length}"
+            ops = _ops_per_sec(lambda: TextCipher.encrypt(text, algo, "benchmark"))
+            cases.append({"name": name, "metrics": {"ops_s": ops}, "params": {"algo": algo, "length": length}})
+            log(f"  {name}: {ops} ops/s")
+        for method in TEXT_HASHES:
+            name = f"text/hash/{method}/{length}"
+            ops = _ops_per_sec(lambda: TextCipher.hash_encoding(text, method))
+            cases.append({"name": name, "metrics": {"ops_s": ops}, "params": {"method": method, "length": length}})
+            log(f"  {name}: {ops} ops/s")
+    return cases
+
+
+def parse_chunks(text):
+    """'auto,64K,1M' -> [(标签, 上限或 None)]"""
+    chunks = []
+    for item in text.split(","):
+        item = item.strip()
+        if item:
+            chunks.append((item, None if item.lower() == "auto" else parse_size(item)))
+    return chunks
+
+
+def parse_dirs(items):
+    """['tmpfs=/dev/shm', '/data/bench'] -> [(名称, 目录)]"""
+    dirs = []
+    for item in items:
+        name, _, path = item.rpartition("=")
+        path = os.path.abspath(path)
+        if not os.path.isdir(path):
+            raise ValueError(f"目录不存在: {path}")
+        dirs.append((name or os.path.basename(path.rstrip(os.sep)) or "root", path))
+    return dirs
+
+
+def summarize(cases):
+    rows = []
+    for c in cases:
+        m = c["metrics"]
+        if "mb_s" in m:
+            rows.append((c["name"], f"{m['mb_s']} MB/s", f"{m['files_s']} 文件/s", f"{m['peak_rss_mb']} MB"))
+        else:
+            rows.append((c["name"], f"{m['ops_s']} ops/s", "", ""))
+    print_table(("用例", "吞吐", "频率", "内存峰值"), rows)
@@ -0,0 +1,437 @@
+"""
+命令行批处理入口 (无界面 / 不导入 Qt)
+
+    python cli.py encrypt <文件或目录>... [-o 输出目录] [--key-env ENC_KEY]
+    python cli.py decrypt <文件或目录>... [-o 输出目录] [--key-file key.txt]
+    python cli.py watch [监视目录] [-o 输出目录] --key-env ENC_KEY   (默认 OriginalFile -> EncryptedFile)
+    python cli.py jobs                                  列出可恢复的未完成任务
+    python cli.py resume <任务ID|日志路径> --key-env ENC_KEY [--discard]
+    python cli.py cluster publish --queue <共享目录> <文件或目录>... -o 输出目录 --key-env ENC_KEY [--decrypt]
+    python cli.py cluster work --queue <共享目录> [任务ID] --key-env ENC_KEY   (任意台机器、任意个进程)
+    python cli.py cluster status --queue <共享目录> [任务ID]
+    python cli.py events [--job 任务ID] [--status fail] [--since 12h] [--until "2026-10-18 08:00"] [--jobs]
+
+默认向 stdout 输出 JSON Lines (每行一个事件)：
+    {"event": "log", "msg": ...}
+    {"event": "progress", "pct": ..., "text": ...}
+    {"event": "file", "path": ..., "ok": true, "out": ...} / {"...", "ok": false, "error": ...}
+    {"event": "finished", "success": n, "fail": n, "elapsed": 秒, "stopped": bool}
+
+退出码：0 全部成功 / 1 存在失败 / 2 参数或密钥错误 / 130 被中断
+(watch 模式持续运行，Ctrl+C / SIGTERM 正常退出时返回 0)
+"""
+import os
+import sys
+import json
+import time
+import signal
+import argparse
+import multiprocessing
+
+EXIT_OK = 0
+EXIT_FAILED = 1
+EXIT_USAGE = 2
+EXIT_INTERRUPTED = 130
+
+# 进度事件的最小输出间隔 (秒)，避免刷屏
+PROGRESS_INTERVAL = 0.5
+
+
+class _Output:
+    """事件输出：json 模式写 JSON Lines，text 模式写可读文本 (日志走 stderr)"""
+
+    def __init__(self, fmt):
+        self.fmt = fmt
+        self._last_progress = 0
+        self._last_pct = -1
+
+    def emit(self, event, **fields):
+        if self.fmt == "json":
+            fields = {"event": event, **fields}
+            sys.stdout.write(json.dumps(fields, ensure_ascii=False) + "\n")
+            sys.stdout.flush()
+            return
+        if event == "log":
+            print(fields["msg"], file=sys.stderr, flush=True)
+        elif event == "progress":
+            print(fields["text"], file=sys.stderr, flush=True)
+        elif event == "finished":
+            print(f"完成: 成功 {fields['success']} / 失败 {fields['fail']} / 用时 {fields['elapsed']}s", flush=True)
+
+    def log(self, msg):
+        self.emit("log", msg=msg)
+
+    def progress(self, text, pct):
+        now = time.monotonic()
+        if pct >= 100 or (pct != self._last_pct and now - self._last_progress >= PROGRESS_INTERVAL):
+            self._last_progress = now
+            self._last_pct = pct
+            self.emit("progress", pct=pct, text=text)
+
+    def result(self, path, success, detail):
+        if success:
+            self.emit("file", path=path, ok=True, out=detail)
+        else:
+            self.emit("file", path=path, ok=False, error=detail)
+
+
+def _read_key(args):
+    """密钥来源优先级：--key-file > --key-env > --key (命令行明文会留在进程列表里，不推荐)"""
+    if args.key_file:
+        with open(args.key_file, 'r', encoding='utf-8') as f:
+            return f.read().strip()
+    if args.key_env:
+        return os.environ.get(args.key_env, "")
+    return args.key or ""
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="cli.py", description="Encryption Studio 命令行批处理 (无界面)")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    sub.add_parser("jobs", help="列出可恢复的未完成任务")
+
+    p = sub.add_parser("events", help="查询批次事件流 (每个文件的处理结果)")
+    p.add_argument("--job", help="任务 ID (支持通配符，如 20261018_*)")
+    p.add_argument("--status", choices=("ok", "fail"), help="只列出成功 / 失败的文件")
+    p.add_argument("--since", metavar="TIME", help="起始时间: 2026-10-18 22:00 / 2026-10-18 / 相对时间 12h、30m、2d")
+    p.add_argument("--until", metavar="TIME", help="截止时间 (格式同 --since)")
+    p.add_argument("--path", metavar="GLOB", help="按源文件路径通配符过滤")
+    p.add_argument("--limit", type=int, metavar="N", help="最多输出条数")
+    p.add_argument("--jobs", action="store_true", help="只列出各任务概况 (文件数 / 失败数 / 起止时间)")
+    p.add_argument("--format", choices=("json", "text"), default="json", help="输出格式 (默认 json)")
+
+    p = sub.add_parser("resume", help="恢复中断的任务 (跳过已完成文件，回收暂存输出)")
+    p.add_argument("job", metavar="JOB", help="任务 ID 或日志文件路径 (见 jobs 命令)")
+    key = p.add_mutually_exclusive_group()
+    key.add_argument("--key", help="密码明文")
+    key.add_argument("--key-env", metavar="VAR", help="从环境变量读取密码")
+    key.add_argument("--key-file", metavar="FILE", help="从文件读取密码 (首行)")
+    p.add_argument("--discard", action="store_true", help="放弃该任务 (不再提示恢复)")
+    p.add_argument("--format", choices=("json", "text"), default="json", help="输出格式 (默认 json)")
+
+    # 集群模式：批次发布到共享目录，多台机器的工作节点认领处理
+    p = sub.add_parser("cluster", help="共享目录任务队列 (多台机器共同处理一个批次)")
+    actions = p.add_subparsers(dest="action", required=True)
+    for action, help_text in (("publish", "扫描输入并发布批次"), ("work", "作为工作节点认领并处理任务"),
+                              ("status", "查看批次进度")):
+        a = actions.add_parser(action, help=help_text)
+        a.add_argument("--queue", required=True, metavar="DIR", help="共享队列目录 (各节点以相同路径挂载)")
+        if action == "publish":
+            a.add_argument("paths", nargs="+", metavar="PATH", help="待处理的文件或目录 (须位于共享存储上)")
+            a.add_argument("-o", "--out", help="输出目录 (默认与源文件同级)")
+            a.add_argument("--decrypt", action="store_true", help="发布解密批次 (默认加密)")
+            a.add_argument("--keep-structure", action="store_true", help="在输出目录中保持原目录结构")
+            a.add_argument("--no-encrypt-filename", action="store_true", help="不混淆文件名")
+            a.add_argument("--encrypt-dirname", action="store_true", help="加密目录名 (需配合 --keep-structure)")
+            a.add_argument("--task-files", type=int, metavar="N", help="每个队列任务最多包含的文件数")
+        else:
+            a.add_argument("job", nargs="?", metavar="JOB", help="只处理/查看指定批次 (默认全部)")
+        if action == "work":
+            a.add_argument("--slots", type=int, metavar="N", help="本节点并行处理的文件数 (默认 CPU 数)")
+            a.add_argument("--node", help="节点名 (默认 主机名-进程号)")
+            a.add_argument("--stale", type=float, metavar="SEC", help="其他节点心跳超时多少秒后回收其任务")
+            a.add_argument("--follow", action="store_true", help="队列处理完后继续等待新批次")
+        if action != "status":
+            key = a.add_mutually_exclusive_group(required=True)
+            key.add_argument("--key", help="密码明文")
+            key.add_argument("--key-env", metavar="VAR", help="从环境变量读取密码")
+            key.add_argument("--key-file", metavar="FILE", help="从文件读取密码 (首行)")
+            a.add_argument("--format", choices=("json", "text"), default="json", help="输出格式 (默认 json)")
+
+    for name, help_text in (("encrypt", "加密文件/目录"), ("decrypt", "解密文件/目录"),
+                            ("watch", "监视目录，自动加密新写入的文件")):
+        p = sub.add_parser(name, help=help_text)
+        if name == "watch":
+            p.add_argument("src", nargs="?", metavar="DIR", help="监视目录 (默认 OriginalFile)")
+            p.add_argument("-o", "--out", help="输出目录 (默认 EncryptedFile)")
+            p.add_argument("--settle", type=float, metavar="SEC", help="文件停止写入多少秒后开始加密")
+            p.add_argument("--initial", action="store_true", help="启动时也处理目录中已有的文件")
+            p.add_argument("--polling", action="store_true", help="强制使用轮询 (不使用 inotify)")
+        else:
+            p.add_argument("paths", nargs="+", metavar="PATH", help="待处理的文件或目录 (目录递归展开)")
+            p.add_argument("-o", "--out", help="输出目录 (默认与源文件同级)")
+            p.add_argument("--keep-structure", action="store_true", help="在输出目录中保持原目录结构")
+            p.add_argument("--no-journal", action="store_true", help="不写任务日志 (中断后无法恢复)")
+            p.add_argument("--no-metrics", action="store_true", help="不写批次指标汇总 (Logs/Metrics)")
+            p.add_argument("--no-events", action="store_true", help="不写事件流 (Logs/Events，events 命令查不到本任务)")
+            p.add_argument("--delete-source", action="store_true", help="处理成功后删除源文件 (逐个完成即删除)")
+            p.add_argument("--wipe", choices=("zero", "random"), help="删除源文件前先覆写 (需配合 --delete-source)")
+
+        key = p.add_mutually_exclusive_group(required=True)
+        key.add_argument("--key", help="密码明文")
+        key.add_argument("--key-env", metavar="VAR", help="从环境变量读取密码")
+        key.add_argument("--key-file", metavar="FILE", help="从文件读取密码 (首行)")
+
+        if name != "decrypt":
+            p.add_argument("--no-encrypt-filename", action="store_true", help="不混淆文件名")
+            p.add_argument("--encrypt-dirname", action="store_true", help="加密目录名 (需配合 --keep-structure)")
+        else:
+            p.set_defaults(no_encrypt_filename=True, encrypt_dirname=False)
+            p.add_argument("--no-preflight", action="store_true", help="跳过预检 (不预先校验密钥/重名/磁盘空间)")
+            p.add_argument("--on-collision", choices=("rename", "fail"),
+                           help="还原后文件重名: rename 自动改名 (默认) / fail 跳过后来者")
+        p.add_argument("--ssd", metavar="DIR", help="启用 SSD 暂存加速，DIR 为 SSD 上的任意目录")
+        p.add_argument("--memory-budget", type=int, metavar="MB", help="缓冲内存预算 (MB，0 为不限制)")
+        qos = p.add_argument_group("QoS (与其他服务共用主机时降低影响)")
+        qos.add_argument("--nice", type=int, default=0, metavar="N", help="工作线程 CPU nice 值 (0~19)")
+        qos.add_argument("--ionice", choices=("idle", "low"), help="工作线程 I/O 优先级")
+        qos.add_argument("--limit-rate", type=float, metavar="MB/s", help="整个任务的读写限速")
+        p.add_argument("--metrics-file", metavar="FILE",
+                       help="定期写入 Prometheus 文本格式指标 (供 node exporter textfile 采集)")
+        p.add_argument("--trace", action="store_true",
+                       help="记录执行时间线，批次结束后写入 Logs/Trace (Chrome / Perfetto 格式)")
+        p.add_argument("--profile", action="store_true",
+                       help="以 cProfile 剖析工作进程，批次结束后合并写入 Logs/Profile (.pstats + 报告)")
+        p.add_argument("--profile-memory", action="store_true",
+                       help="剖析时同时以 tracemalloc 记录内存分配排行 (含 --profile，开销较大)")
+        p.add_argument("--format", choices=("json", "text"), default="json", help="输出格式 (默认 json)")
+    return parser
+
+
+def _install_stop_handler(out, stop):
+    """Ctrl+C / SIGTERM：通知各工作进程停止，保留未回写数据后退出"""
+    def on_signal(signum, frame):
+        out.log("⚠️ 收到中断信号，正在停止...")
+        stop()
+
+    signal.signal(signal.SIGINT, on_signal)
+    if hasattr(signal, "SIGTERM"):
+        signal.signal(signal.SIGTERM, on_signal)
+
+
+def _engine_options(args, is_encrypt):
+    from config import DIRS
+    return dict(
+        encrypt_filename=is_encrypt and not args.no_encrypt_filename,
+        encrypt_dirname=is_encrypt and args.encrypt_dirname,
+        use_ssd=bool(args.ssd), ssd_dir=args.ssd,
+        memory_budget=None if args.memory_budget is None else args.memory_budget * 1024 * 1024,
+        nice=args.nice, io_priority=args.ionice,
+        rate_limit=int(args.limit_rate * 1024 * 1024) if args.limit_rate else None,
+        metrics_file=args.metrics_file,
+        trace_dir=DIRS["TRACE"] if args.trace else None,
+        profile_dir=DIRS["PROFILE"] if args.profile or args.profile_memory else None,
+        profile_memory=args.profile_memory,
+    )
+
+
+def run_watch(args, key, out):
+    from config import DIRS, WATCH_SETTLE, init_directories
+    from core.watcher import WatchService
+
+    if not args.src or not args.out:
+        init_directories()
+    src = args.src or DIRS["ORIGINAL"]
+    if not os.path.isdir(src):
+        out.log(f"❌ 监视目录不存在: {src}")
+        return EXIT_USAGE
+
+    service = WatchService(
+        src, args.out or DIRS["ENCRYPTED"], key,
+        settle=WATCH_SETTLE if args.settle is None else args.settle,
+        initial=args.initial, force_polling=args.polling,
+        on_log=out.log, on_result=out.result, on_progress=out.progress,
+        **_engine_options(args, True)
+    )
+    _install_stop_handler(out, service.stop)
+
+    start = time.monotonic()
+    service.run()
+    out.emit("finished", success=service.processed, fail=service.failed,
+             elapsed=round(time.monotonic() - start, 3), stopped=True)
+    return EXIT_OK
+
+
+def _find_job(job):
+    from core.journal import JournalState, find_unfinished
+
+    if os.path.isfile(job):
+        return JournalState.load(job)
+    for state in find_unfinished():
+        if state.job_id == job:
+            return state
+    return None
+
+
+def run_jobs():
+    from core.journal import find_unfinished
+
+    for state in find_unfinished():
+        print(json.dumps({"id": state.job_id, "path": state.path, "encrypt": state.is_encrypt,
+                          "status": state.status or "interrupted", "done": len(state.done),
+                          "planned": len(state.planned), "staged": len(state.staged_pending()),
+                          "deferred": state.deferred,
+                          "summary": state.summary_text()}, ensure_ascii=False))
+    return EXIT_OK
+
+
+def run_events(args):
+    from itertools import islice
+    from core.events import query, job_summaries, parse_time
+
+    try:
+        since = parse_time(args.since) if args.since else None
+        until = parse_time(args.until) if args.until else None
+    except ValueError as e:
+        print(f"❌ {e}", file=sys.stderr)
+        return EXIT_USAGE
+
+    def clock(ts):
+        return time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(ts)) if ts else "-"
+
+    if args.jobs:
+        for summary in job_summaries(job=args.job):
+            if (since is not None and (summary["end"] or 0) < since) or \
+                    (until is not None and (summary["start"] or 0) > until):
+                continue
+            if args.format == "json":
+                print(json.dumps(summary, ensure_ascii=False))
+            else:
+                print(f"{summary['job']}  {summary['op'] or '-'}  {clock(summary['start'])} ~ {clock(summary['end'])}  "
+                      f"文件 {summary['files']}  失败 {summary['fail']}  {summary['status'] or '未结束'}")
+        return EXIT_OK
+
+    records = query(job=args.job, status=args.status, since=since, until=until, path=args.path)
+    for rec in islice(records, args.limit):
+        if args.format == "json":
+            sys.stdout.write(json.dumps(rec, ensure_ascii=False) + "\n")
+        else:
+            duration = "-" if rec.get("duration") is None else f"{rec['duration']:.3f}s"
+            detail = f"  {rec.get('error')}" if rec.get("result") == "fail" else ""
+            print(f"{clock(rec['ts'])}  {rec['result']:<4}  {rec.get('bytes') or 0:>12}  {duration:>9}  "
+                  f"{rec['path']}{detail}")
+    return EXIT_OK
+
+
+def run_cluster_status(args):
+    from core.cluster import list_jobs, job_status
+
+    for job_dir, meta in list_jobs(args.queue):
+        if args.job and meta["id"] != args.job:
+            continue
+        print(json.dumps(job_status(job_dir), ensure_ascii=False))
+    return EXIT_OK
+
+
+def run_cluster(args, key, out):
+    from config import CLUSTER_STALE, CLUSTER_TASK_FILES
+    from core import cluster
+
+    if args.action == "publish":
+        if args.out:
+            os.makedirs(args.out, exist_ok=True)
+        job_id, count = cluster.publish_job(
+            args.queue, [os.path.abspath(p) for p in args.paths], key, not args.decrypt,
+            custom_out_dir=os.path.abspath(args.out) if args.out else None,
+            keep_structure=args.keep_structure,
+            encrypt_filename=not args.decrypt and not args.no_encrypt_filename,
+            encrypt_dirname=not args.decrypt and args.encrypt_dirname,
+            task_files=args.task_files or CLUSTER_TASK_FILES, log=out.log)
+        out.emit("published", job=job_id, files=count)
+        return EXIT_OK
+
+    worker = cluster.ClusterWorker(
+        args.queue, key, job_id=args.job, slots=args.slots, node=args.node,
+        stale=CLUSTER_STALE if args.stale is None else args.stale, exit_when_done=not args.follow,
+        on_log=out.log, on_result=out.result, on_progress=out.progress)
+    return _run_batch(worker, out)
+
+
+def _run_batch(runner, out):
+    _install_stop_handler(out, runner.stop)
+
+    start = time.monotonic()
+    try:
+        results = runner.run()
+    except ValueError as e:
+        out.log(f"❌ {e}")
+        return EXIT_USAGE
+    stopped = not runner.is_running
+    out.emit("finished", success=len(results["success"]), fail=len(results["fail"]),
+             elapsed=round(time.monotonic() - start, 3), stopped=stopped)
+
+    if stopped:
+        return EXIT_INTERRUPTED
+    return EXIT_FAILED if results["fail"] else EXIT_OK
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if args.command == "jobs":
+        return run_jobs()
+    if args.command == "events":
+        return run_events(args)
+    if args.command == "cluster" and args.action == "status":
+        return run_cluster_status(args)
+    out = _Output(args.format)
+    is_encrypt = args.command != "decrypt"
+
+    if args.command == "resume":
+        try:
+            state = _find_job(args.job)
+        except (OSError, ValueError) as e:
+            state = None
+            out.log(f"❌ 无法读取任务日志: {e}")
+        if state is None or not state.resumable:
+            out.log(f"❌ 没有可恢复的任务: {args.job}")
+            return EXIT_USAGE
+        if state.running:
+            out.log(f"❌ 任务 {state.job_id} 正在其他进程中运行")
+            return EXIT_USAGE
+        if args.discard:
+            from core.journal import STATUS_ABANDONED
+            state.mark(STATUS_ABANDONED)
+            out.log(f"🗑️ 已放弃任务 {state.job_id}")
+            return EXIT_OK
+
+    try:
+        key = _read_key(args)
+    except OSError as e:
+        out.log(f"❌ 无法读取密钥文件: {e}")
+        return EXIT_USAGE
+    if not key:
+        out.log("❌ 密码为空")
+        return EXIT_USAGE
+    if args.command == "watch":
+        return run_watch(args, key, out)
+    if args.command == "cluster":
+        return run_cluster(args, key, out)
+
+    # 延迟导入：参数错误时不必加载调度模块
+    from config import DIRS
+    from core.batch_runner import BatchRunner
+
+    if args.command == "resume":
+        if not state.check_key(key):
+            out.log("❌ 密钥与原任务不一致")
+            return EXIT_USAGE
+        out.log(state.summary_text())
+        runner = BatchRunner(state.files, key, state.is_encrypt, resume=state,
+                             metrics_dir=DIRS["METRICS"], events_dir=DIRS["EVENTS"],
+                             on_progress=out.progress, on_log=out.log, on_result=out.result,
+                             **state.options)
+        return _run_batch(runner, out)
+
+    if args.out:
+        os.makedirs(args.out, exist_ok=True)
+    runner = BatchRunner(
+        [os.path.abspath(p) for p in args.paths], key, is_encrypt,
+        custom_out_dir=os.path.abspath(args.out) if args.out else None,
+        keep_structure=args.keep_structure,
+        delete_source=args.delete_source, wipe=args.wipe,
+        preflight=not getattr(args, "no_preflight", False),
+        on_collision=getattr(args, "on_collision", None),
+        journal_dir=None if args.no_journal else DIRS["JOURNAL"],
+        metrics_dir=None if args.no_metrics else DIRS["METRICS"],
+        events_dir=None if args.no_events else DIRS["EVENTS"],
+        on_progress=out.progress, on_log=out.log, on_result=out.result,
+        **_engine_options(args, is_encrypt)
+    )
+    return _run_batch(runner, out)
+
+
+if __name__ == "__main__":
+    # Windows 多进程打包必须
+    multiprocessing.freeze_support()
+    sys.exit(main())
@@ -20,6 +20,16 @@ DIRS = {
     "DECRYPTED": os.path.join(BASE_DIR, "DecryptedFile"),
     "KEYS": os.path.join(BASE_DIR, "Keys"),
     "LOGS": os.path.join(BASE_DIR, "Logs"),
+    # 批处理任务日志 (崩溃后恢复用)
+    "JOURNAL": os.path.join(BASE_DIR, "Logs", "Journal"),
+    # 批次指标汇总 (JSON)
+    "METRICS": os.path.join(BASE_DIR, "Logs", "Metrics"),
+    # 执行时间线 (Chrome / Perfetto trace JSON)
+    "TRACE": os.path.join(BASE_DIR, "Logs", "Trace"),
+    # 工作进程性能剖析 (cProfile .pstats + 报告)
+    "PROFILE": os.path.join(BASE_DIR, "Logs", "Profile"),
+    # 批次事件流 (每个文件一条 JSON Lines 记录，可查询)
+    "EVENTS": os.path.join(BASE_DIR, "Logs", "Events"),
     # [注意] 这里故意不定义 TEMP/SSD 目录，强制由用户在 UI 指定
 }
 
@@ -31,6 +41,115 @@ CHUNK_SIZES = {
     "HUGE": 64 * 1024 * 1024   # 64MB
 }
 
+# 在途分块缓冲的全局内存预算 (所有工作进程合计，0 表示不限制)
+MEMORY_BUDGET = 512 * 1024 * 1024
+
+# SSD 暂存区保留的安全余量 (暂存占用上限 = 剩余空间 - 余量)
+SSD_STAGE_RESERVE = 1024 * 1024 * 1024
+
+# 源文件预读 (慢速盘 -> SSD 暂存区)
+SSD_PREFETCH_BUDGET = 2 * 1024 * 1024 * 1024  # 预读副本占用上限 (另受暂存区容量一半限制)
+PREFETCH_LOOKAHEAD = 4                         # 每个慢速设备最多领先工作进程的文件数
+PREFETCH_BLOCK = 16 * 1024 * 1024              # 顺序读块大小
+
+# 回写复制引擎
+COPY_WORKERS = 4                   # 并行回写的文件数
+COPY_BLOCK = 32 * 1024 * 1024      # 单次内核拷贝/进度上报粒度
+
+# 流式扫描
+SCAN_WORKERS = 8       # 并行 scandir 线程数 (网络共享上并行枚举收益明显)
+SCAN_BATCH = 512       # 每批交给调度器的文件数
+
+# 设备类别并发策略: 类别 -> (初始并发, 并发上限)
+# HDD/USB 机械盘多路并行会导致磁头来回寻道，默认单流；NVMe 队列深，可多开
+DEVICE_CONCURRENCY = {
+    "NVME": (4, 16),
+    "SSD": (3, 8),
+    "RAM": (4, 16),
+    "HDD": (1, 2),
+    "USB": (1, 1),
+    "NETWORK": (2, 8),
+    "UNKNOWN": (2, 8),
+}
+
+# AIMD 自适应并发参数
+AIMD_WINDOW = 2.0         # 吞吐统计窗口 (秒)
+AIMD_GAIN_RATIO = 1.05    # 吞吐提升超过 5% 视为加并发有效
+AIMD_DROP_RATIO = 0.75    # 吞吐下降超过 25% 触发乘性减
+# 进程池占满后每个设备组可多提交的任务数 (在进程池队列中等待，工作进程完成一个即可接着处理下一个)
+SUBMIT_AHEAD = 2
+
+# 源文件删除 (处理成功后)
+REMOVE_WORKERS = 8                 # 并行删除线程数 (网络共享上逐个删除很慢)
+WIPE_BLOCK = 4 * 1024 * 1024       # 覆写擦除的块大小
+WIPE_MODES = ("zero", "random")    # 删除前覆写: 全零 / 随机数据
+
+# 后台任务 QoS (与其他服务共用主机时降低对它们的影响)
+QOS_BACKGROUND_NICE = 10          # 后台模式的 CPU nice 值 (0~19，越大越让步)
+QOS_IO_CLASSES = {                # I/O 优先级: 名称 -> (ioprio 类别, 级别)
+    "idle": (3, 0),               # 磁盘空闲时才处理
+    "low": (2, 7),                # best-effort 最低级
+}
+QOS_RATE_REFRESH = 0.5            # 工作进程重新读取限速值的间隔 (秒)，运行中调整限速在此时间内生效
+QOS_BURST = 0.25                  # 令牌桶容量 (按限速的秒数计)
+QOS_THROTTLE_CHUNK = 1024 * 1024  # 限速时单次读写的块上限，避免大块突发
+
+# 解密预检 (只读文件头)
+PREFLIGHT_SAMPLE = 8         # 抽样验证密钥的文件数
+PREFLIGHT_WORKERS = 16       # 并行读取文件头的线程数
+PREFLIGHT_COLLISION = "rename"  # 还原后重名: rename 自动改名 / fail 跳过后来者
+
+# 运行指标
+METRICS_DUMP_INTERVAL = 10.0  # Prometheus 文本文件的刷新间隔 (秒)
+BOTTLENECK_IDLE_UTILIZATION = 0.5  # 核心利用率低于该值时瓶颈判为调度 (工作进程多数时间空闲)
+TRACE_MAX_EVENTS = 2_000_000  # 单个进程缓冲的追踪事件上限 (超出丢弃)
+PROFILE_TOP = 40              # 剖析报告列出的函数数
+PROFILE_ALLOC_TOP = 25        # 内存分配报告列出的代码行数
+
+# 运行日志 (后台线程批量写入)
+LOG_FLUSH_INTERVAL = 1.0      # 至多每隔多少秒刷新一次日志文件 / 控制台
+LOG_FLUSH_LEVEL = "error"     # 该级别及以上的日志立即刷新
+LOG_QUEUE_BATCH = 512         # 后台线程每次最多连续处理的日志条数
+EVENTS_INDEX_BLOCK = 1000     # 事件流每多少条记录建一条稀疏索引
+EVENTS_FLUSH_INTERVAL = 1.0   # 事件流至多每隔多少秒写出一次
+LOG_VIEW_MAX_LINES = 5000     # 界面日志保留的最近行数 (完整记录见日志文件)
+LOG_VIEW_FLUSH_MS = 50        # 界面日志合并刷新的间隔 (毫秒)
+LOG_VIEW_FLUSH_LINES = 100    # 每次刷新最多写入的行数 (超出的留到下一次，单次刷新不超过一帧)
+
+# 启动
+STARTUP_SPLASH_DELAY = 0.3    # 加载超过多少秒才显示启动画面 (更快时直接显示主窗口)
+STARTUP_PROFILE_TOP = 30      # --startup-profile 报告列出的模块数
+SPLASH_ANIMATION = "auto"     # 启动画面动画: auto 按渲染开销自适应 / on 始终 60fps / off 静态画面
+SPLASH_FPS = 60               # 启动画面动画的最高帧率
+SPLASH_MIN_FPS = 8            # 降帧下限，仍超出预算时改为静态画面
+SPLASH_FRAME_BUDGET_MS = 4.0  # 单帧绘制开销超过此值 (毫秒) 时降低帧率
+
+# 任务日志
+JOURNAL_FSYNC_INTERVAL = 1.0  # 至多每隔多少秒 fsync 一次 (掉电最多丢失这段时间的记录)
+JOURNAL_KEEP = 50             # 保留最近多少个已完成任务的日志
+
+# 集群模式 (共享目录任务队列，多台机器共同处理一个批次)
+CLUSTER_TASK_FILES = 32                   # 每个队列任务最多包含的文件数
+CLUSTER_TASK_BYTES = 256 * 1024 * 1024    # 每个队列任务最多包含的数据量
+CLUSTER_HEARTBEAT = 5.0                   # 节点心跳间隔 (秒)
+CLUSTER_STALE = 60.0                      # 心跳超过多少秒未更新视为节点失联，其认领的任务重新入队
+CLUSTER_POLL = 1.0                        # 队列为空时的轮询间隔 (秒)
+
+# 多任务调度：优先级 -> 公平份额权重 (同时运行的任务按权重分配进程池槽位)
+JOB_PRIORITY_WEIGHTS = {
+    "HIGH": 8,
+    "NORMAL": 2,
+    "LOW": 1,
+}
+
+# 监视模式 (watch)
+WATCH_SETTLE = 2.0         # 文件停止写入多少秒后视为写完
+WATCH_POLL_INTERVAL = 1.0  # 无 inotify 时的轮询间隔 (秒)
+WATCH_RESCAN_INTERVAL = 10.0  # 轮询模式下核对已知文件大小 / 修改时间的间隔 (原地改写不改变目录 mtime)
+WATCH_MAX_BATCH = 256      # 单个微批次最多文件数
+# 下载/编辑中的临时文件不处理
+WATCH_IGNORE_SUFFIXES = (".tmp", ".part", ".crdownload", ".swp", "~")
+
 def init_directories():
     """初始化所有必要目录"""
     for path in DIRS.values():
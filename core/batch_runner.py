@@ -0,0 +1,976 @@
+import os
+import glob
+import time
+import base64
+import hashlib
+import uuid
+import signal
+import threading
+from multiprocessing.managers import SyncManager
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+
+from config import (MEMORY_BUDGET, SSD_PREFETCH_BUDGET, COPY_WORKERS, PREFLIGHT_COLLISION,
+                    QOS_IO_CLASSES, QOS_THROTTLE_CHUNK, METRICS_DUMP_INTERVAL, SUBMIT_AHEAD)
+from core.concurrency import ConcurrencyController
+from core.memory_budget import MemoryBudget
+from core.staging import StagingArea, WriteBackPipeline, STAGE_DIR_NAME
+from core.prefetch import SourcePrefetcher, SLOW_DEVICE_CLASSES, PENDING
+from core.copy_engine import CopyEngine, move_file
+from core.file_cipher import part_pattern
+from core.journal import BatchJournal, STATUS_FINISHED, STATUS_STOPPED
+from core.scanner import ParallelScanner
+from core.preflight import run_preflight
+from core.qos import RateLimiter, run_with_priority, qos_supported
+from core.source_remover import SourceRemover
+from core.metrics import BatchMetrics, FileStats, write_atomic, write_summary
+from core.tracing import BatchTracer, TeeProbe, process_buffer
+from core.profiling import BatchProfiler, worker_profiler
+from core.events import EventLog
+
+# ================= 辅助函数与常量 =================
+
+ENC_PREFIX = "ENC_DIR_"
+
+
+def format_size(size_bytes):
+    if size_bytes == 0: return "0 B"
+    units = ("B", "KB", "MB", "GB", "TB")
+    i = 0
+    while size_bytes >= 1024 and i < len(units) - 1:
+        size_bytes /= 1024
+        i += 1
+    return f"{size_bytes:.2f} {units[i]}"
+
+
+def get_drive_root(path):
+    """获取路径所在的驱动器根目录"""
+    path = os.path.abspath(path)
+    while not os.path.ismount(path):
+        parent = os.path.dirname(path)
+        if parent == path:
+            return parent
+        path = parent
+    return path
+
+
+def encrypt_dir_name_str(dir_name):
+    """加密文件夹名：添加前缀并Base64"""
+    try:
+        # 避免重复加密
+        if dir_name.startswith(ENC_PREFIX): return dir_name
+        encoded = base64.urlsafe_b64encode(dir_name.encode()).decode()
+        return f"{ENC_PREFIX}{encoded}"
+    except:
+        return dir_name
+
+
+def decrypt_dir_name_str(dir_name):
+    """【智能检测】只有当文件夹名包含特征前缀时才解密"""
+    if dir_name.startswith(ENC_PREFIX):
+        try:
+            encoded = dir_name[len(ENC_PREFIX):]
+            return base64.urlsafe_b64decode(encoded.encode()).decode()
+        except:
+            return dir_name
+    # 否则原样返回
+    return dir_name
+
+
+def plan_target(f_path, common_base, is_encrypt, custom_out=None, keep_structure=False, encrypt_dirname=False):
+    """计算单个文件的最终输出路径 (含目录结构与目录名加/解密)"""
+    # --- A. 确定该文件的输出基准目录 ---
+    current_base = custom_out or os.path.dirname(f_path)
+
+    # --- B. 计算相对结构 (智能解密检测在这里发生) ---
+    rel_path_struct = ""
+    if keep_structure and common_base:
+        try:
+            rel = os.path.relpath(os.path.dirname(f_path), common_base)
+            if rel == ".": rel = ""
+
+            # 处理每一层文件夹名
+            parts = rel.split(os.sep)
+            processed_parts = []
+            for p in parts:
+                if not p: continue
+                if is_encrypt:
+                    # 【加密模式】：根据勾选决定是否加密目录名
+                    if encrypt_dirname:
+                        processed_parts.append(encrypt_dir_name_str(p))
+                    else:
+                        processed_parts.append(p)
+                else:
+                    # 【解密模式】：强制自动检测前缀，不需要用户干预
+                    # 如果有 ENC_DIR_ 前缀就解密，没有就原样
+                    processed_parts.append(decrypt_dir_name_str(p))
+
+            rel_path_struct = os.sep.join(processed_parts)
+        except:
+            rel_path_struct = ""
+
+    # --- C. 组合完整输出路径 ---
+    final_out_dir = os.path.join(current_base, rel_path_struct)
+
+    # 确定文件名
+    fname = os.path.basename(f_path)
+    if is_encrypt:
+        return os.path.join(final_out_dir, fname + ".enc")
+    return os.path.join(final_out_dir, fname)
+
+
+def common_base_of(files):
+    """保持结构时的相对基准：所有输入的公共目录"""
+    try:
+        base = os.path.commonpath(files)
+        if os.path.isfile(base): base = os.path.dirname(base)
+        return base
+    except:
+        return ""
+
+
+def _ignore_sigint():
+    """子进程忽略 Ctrl+C：中断由主进程统一处理 (stop_event)，避免进程池与通信通道被直接打断"""
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+
+# ================= 跨进程任务 Wrapper =================
+def task_wrapper(file_path, target_full_path, key_bytes, is_enc, enc_name, queue, stop_event, pause_event,
+                 chunk_size=None, read_path=None, keep_target_name=False,
+                 nice=0, io_class=None, rate_share=None, trace_dir=None, profile_dir=None, profile_memory=False,
+                 fence=None):
+    """
+    进程池任务：直接调用 Engine 将 file_path 处理到 target_full_path。
+    read_path: 预读到 SSD 的同名副本 (进度仍以 file_path 为键上报)
+    keep_target_name: 解密时使用预检确定的输出文件名 (不再按文件头还原)
+    nice / io_class: 本文件处理期间的 CPU / I/O 优先级；rate_share: 本任务分到的限速 (共享值，bytes/s)
+    trace_dir: 开启时间线追踪时各进程事件文件的目录
+    profile_dir: 开启性能剖析时各进程结果的目录 (profile_memory 同时记录内存分配)
+    fence: 集群认领文件路径，写出最终输出前确认仍然存在 (已被其他节点回收时放弃输出)
+    """
+    from core.file_cipher import FileCipherEngine
+
+    class MPController:
+        def is_stop_requested(self):
+            return stop_event.is_set()
+
+        def wait_if_paused(self):
+            pause_event.wait()
+
+        def is_fenced(self):
+            return fence is not None and not os.path.exists(fence)
+
+    last_update = 0
+
+    def mp_callback(current, total):
+        nonlocal last_update
+        now = time.time()
+        # 减少 IPC 通信频率，每 0.05s 发送一次
+        if now - last_update > 0.05 or current == total:
+            queue.put(("PROGRESS", file_path, current, total))
+            last_update = now
+
+    controller = MPController()
+    if rate_share is not None:
+        limiter = RateLimiter(lambda: rate_share.value, stop_event.is_set)
+        controller.throttle = limiter.consume
+        # 限速生效期间改用小块读写 (运行中开启限速时，已在处理的文件同样在 QOS_RATE_REFRESH 内切换)
+        controller.chunk_limit = lambda: QOS_THROTTLE_CHUNK if limiter.rate else None
+
+    engine = FileCipherEngine()
+    stats = FileStats()
+    trace = process_buffer() if trace_dir else None
+    profiler = worker_profiler(profile_dir, profile_memory) if profile_dir else None
+    probes = [p for p in (stats, trace, profiler if profile_memory else None) if p]
+    try:
+        # 发送开始信号 (附开始时间，主进程据此统计排队等待)
+        started = time.time()
+        size = os.path.getsize(file_path)
+        queue.put(("START", file_path, size, started))
+        t0 = time.perf_counter()
+
+        # 调用核心处理函数 process_file_direct
+        def work():
+            return engine.process_file_direct(
+                read_path or file_path, target_full_path, key_bytes, is_enc,
+                encrypt_filename=enc_name,
+                callback=mp_callback,
+                controller=controller,
+                chunk_size=chunk_size,
+                keep_target_name=keep_target_name,
+                probe=TeeProbe(*probes) if len(probes) > 1 else stats
+            )
+
+        # 剖析须在实际执行的线程内开启 (QoS 模式下引擎在独立线程中运行)
+        success, msg, out_path = run_with_priority(
+            (lambda: profiler.run(work)) if profiler else work, nice, io_class)
+        if trace:
+            trace.complete(os.path.basename(file_path), t0, time.perf_counter(), cat="file",
+                           args={"path": file_path, "bytes": size, "ok": success, "chunk": chunk_size})
+        # 分阶段计时随完成消息发回 (在返回结果之前，主进程收集结果前已可读到)
+        queue.put(("STATS", file_path, stats.to_dict(), time.time() - started))
+        return (file_path, success, msg, out_path)
+    except Exception as e:
+        # 捕获异常转为失败消息
+        return (file_path, False, str(e), "")
+    finally:
+        if trace:
+            try: trace.flush(trace_dir)
+            except OSError: pass
+        if profiler:
+            try: profiler.flush()
+            except OSError: pass
+
+
+# ================= 批处理调度核心 =================
+class BatchRunner:
+    """
+    批处理调度核心 (不依赖 Qt)。
+    GUI 的 BatchWorkerThread 与命令行入口共用此实现，通过回调输出：
+    on_progress(text, pct) / on_log(msg) / on_result(file_path, success, detail)
+    detail 成功时为输出路径，失败时为原因。
+    """
+    POLL_INTERVAL = 0.05
+
+    def __init__(self, files, key, is_encrypt, encrypt_filename=False,
+                 custom_out_dir=None,
+                 keep_structure=False, encrypt_dirname=False,
+                 use_ssd=False, ssd_dir=None, memory_budget=None,
+                 base_dir=None, manager=None, budget=None, stage_pool=None, journal_dir=None, resume=None,
+                 preflight=True, on_collision=None,
+                 nice=0, io_priority=None, rate_limit=None,
+                 delete_source=False, wipe=None, metrics_file=None, metrics_dir=None, trace_dir=None,
+                 profile_dir=None, profile_memory=False, events_dir=None, log_results=True,
+                 on_progress=None, on_log=None, on_result=None):
+        self.files = files
+        self.key = key
+        self.is_enc = is_encrypt
+        self.enc_name = encrypt_filename
+        self.custom_out = custom_out_dir
+
+        self.keep_structure = keep_structure
+        self.encrypt_dirname = encrypt_dirname
+        self.use_ssd = use_ssd
+        self.ssd_dir = ssd_dir
+        self.memory_budget = MEMORY_BUDGET if memory_budget is None else memory_budget
+        # base_dir: 保持结构时的相对基准 (默认取所有输入的公共路径)
+        self.base_dir = base_dir
+        # journal_dir: 写入任务日志 (崩溃后可恢复)；resume: 从 JournalState 恢复未完成的任务
+        self.journal_dir = journal_dir
+        self.resume_state = resume
+        self.journal = None
+        # 解密预检：扫描完成后先并行校验文件头 (密钥 / 重名 / 空间)，再开始处理
+        self.preflight = preflight and not is_encrypt
+        self.on_collision = on_collision or PREFLIGHT_COLLISION
+        # QoS：工作线程的 nice 值 / I/O 优先级 (见 config.QOS_IO_CLASSES)，整个任务的限速 (bytes/s，运行中可调)
+        self.nice = nice or 0
+        self.io_priority = io_priority if io_priority in QOS_IO_CLASSES else None
+        self.rate_limit = rate_limit or None
+        self.rate_share = None
+        self._share_sent = None
+        # 处理成功后删除源文件 (后台并行，逐个文件完成即删除)；wipe: 删除前覆写 "zero"/"random"
+        self.delete_source = delete_source
+        self.wipe = wipe if delete_source else None
+        self.remover = None
+        # 运行指标：metrics_file 定期写入 Prometheus 文本 (node exporter textfile)，metrics_dir 写入批次 JSON 汇总
+        self.metrics_file = metrics_file
+        self.metrics_dir = metrics_dir
+        self.metrics = None
+        # 时间线追踪 (可选)：批次结束时在 trace_dir 下写入 Chrome / Perfetto trace JSON
+        self.trace_dir = trace_dir
+        self.tracer = None
+        # 性能剖析 (可选)：工作进程以 cProfile 执行每个文件，批次结束时合并写入 profile_dir
+        self.profile_dir = profile_dir
+        self.profile_memory = profile_memory
+        self.profiler = None
+        # 事件流 (可选)：每个文件的处理结果写入 events_dir 下的 JSON Lines (cli.py events 查询)
+        self.events_dir = events_dir
+        self.events = None
+        # 逐文件结果是否输出到 on_log (界面改由 on_result 汇总显示时关闭)
+        self.log_results = log_results
+        # 进程池占满后每个设备组预先提交的任务数 (进程池进程数多于并发配额时须为 0，见 JobScheduler)
+        self.submit_ahead = SUBMIT_AHEAD
+
+        self.on_progress = on_progress or (lambda text, pct: None)
+        self.on_log = on_log or (lambda msg: None)
+        self.on_result = on_result or (lambda fp, success, detail: None)
+
+        self.results = {"success": [], "fail": []}
+        # 外部传入的 Manager 由调用方负责关闭 (监视模式下多个批次共用)
+        self.manager = manager
+        self._own_manager = manager is None
+        # 多任务共用的内存预算 / 暂存盘总账 (JobScheduler 注入)，为空时按本任务的选项自建
+        self.budget = budget
+        self.stage_pool = stage_pool
+        self.stage = None
+        self.running = {}
+        self.queue = None
+        self.stop_event = None
+        self.pause_event = None
+        self._paused = False
+        self._is_running = True
+
+    # ---------- 控制 ----------
+    def pause(self):
+        self._paused = True
+        if self.pause_event: self.pause_event.clear()
+
+    def resume(self):
+        self._paused = False
+        if self.pause_event: self.pause_event.set()
+
+    def stop(self):
+        self._is_running = False
+        if self.stop_event: self.stop_event.set()
+
+    def set_rate_limit(self, bytes_per_sec):
+        """
+        调整限速 (任意线程调用，0/None 取消限速)：包括已在处理的文件在内，
+        工作进程在 QOS_RATE_REFRESH 秒内按新的限速值调整速率与读写块大小
+        """
+        self.rate_limit = bytes_per_sec or None
+        self.on_log(f"🐢 [限速] {format_size(self.rate_limit) + '/s' if self.rate_limit else '已取消'}")
+
+    @property
+    def is_running(self):
+        return self._is_running
+
+    def metrics_snapshot(self):
+        """实时指标快照 (任意线程调用，批次开始前返回 None)"""
+        return self.metrics.snapshot() if self.metrics else None
+
+    def journal_options(self):
+        """恢复任务时需要原样还原的选项 (对应 core.journal.JOURNAL_OPTIONS)"""
+        return {"encrypt_filename": self.enc_name, "custom_out_dir": self.custom_out,
+                "keep_structure": self.keep_structure, "encrypt_dirname": self.encrypt_dirname,
+                "use_ssd": self.use_ssd, "ssd_dir": self.ssd_dir,
+                "memory_budget": self.memory_budget, "base_dir": self.base_dir,
+                "preflight": self.preflight, "on_collision": self.on_collision,
+                "nice": self.nice, "io_priority": self.io_priority, "rate_limit": self.rate_limit,
+                "delete_source": self.delete_source, "wipe": self.wipe}
+
+    # ---------- 执行 ----------
+    def run(self, executor=None):
+        """
+        阻塞执行整个批次，返回 {"success": [(src, out)], "fail": [(src, reason)]}
+        executor: 外部进程池 (复用已启动的工作进程)，为空时自建
+        """
+        self.setup()
+        if executor is not None:
+            while self.step(executor):
+                self.wait()
+            # 共用进程池不能关闭：终止时只等待本批已提交的任务退出
+            while not self.drain():
+                self.wait()
+            return self.finish()
+
+        with ProcessPoolExecutor(max_workers=self.max_workers, initializer=_ignore_sigint) as executor:
+            while self.step(executor):
+                self.wait()
+
+            if not self._is_running:
+                executor.shutdown(wait=False, cancel_futures=True)
+        return self.finish()
+
+    def wait(self, timeout=None):
+        """两轮 step 之间调用：任一在途任务完成即返回 (立即补充空出的并发窗口)，最多等待 timeout 秒"""
+        timeout = self.POLL_INTERVAL if timeout is None else timeout
+        pending = [f for f in self.running if not f.done()]
+        if pending:
+            wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+        else:
+            time.sleep(timeout)
+
+    def setup(self):
+        setup_start = time.perf_counter()
+        # 0. 跨进程通信通道 (在工作线程中创建，避免阻塞调用方)
+        if self.manager is None:
+            self.manager = SyncManager()
+            self.manager.start(_ignore_sigint)
+        self.queue = self.manager.Queue()
+        self.stop_event = self.manager.Event()
+        self.pause_event = self.manager.Event()
+        if not self._paused: self.pause_event.set()
+        if not self._is_running: self.stop_event.set()
+        # 限速份额：主进程按在途文件数均分，工作进程定期读取
+        self.rate_share = self.manager.Value('d', 0.0)
+
+        # 1. 预计算密钥字节流 (SHA256)
+        self.key_bytes = hashlib.sha256(self.key.encode()).digest()
+
+        # 任务日志：恢复时先回收上次的暂存输出，已完成的文件直接跳过
+        self.skip = set()
+        self.skipped = 0
+        if self.resume_state:
+            if not self.resume_state.check_key(self.key):
+                raise ValueError("密钥与原任务不一致")
+            self.journal = BatchJournal.reopen(self.resume_state)
+            self._recover(self.resume_state)
+        elif self.journal_dir:
+            self.journal = BatchJournal.create(self.journal_dir, self.files, self.key, self.is_enc,
+                                               self.journal_options())
+        job_key = self.journal.job_id if self.journal else uuid.uuid4().hex[:8]
+        if self.events_dir:
+            try:
+                self.events = EventLog(self.events_dir, job_key, self.is_enc)
+                self.events.start(self.files, self.journal_options())
+            except OSError as e:
+                self.on_log(f"⚠️ [事件] 无法创建事件流: {e}")
+                self.events = None
+
+        if self.delete_source:
+            self.remover = SourceRemover(self.wipe)
+            # 恢复任务：上次已完成但未来得及删除的源文件
+            for src in self.skip:
+                if os.path.exists(src): self.remover.submit(src)
+
+        # 2. 流式扫描：枚举与 stat 在后台并行进行，发现一批调度一批
+        self.total_bytes = 0
+        self.size_of_file = {}
+        self.processed_bytes_map = {}
+
+        # 计算公共基准路径 (仅字符串运算，不访问磁盘)
+        self.common_base = self.base_dir or ""
+        if self.keep_structure and not self.common_base and len(self.files) > 0:
+            self.common_base = common_base_of(self.files)
+
+        self.on_log("--- 正在扫描任务队列 ---")
+        self.scanner = ParallelScanner(self.files).start()
+
+        # 3. SSD 暂存区准备 (容量按剩余空间记账，空间紧张时暂停启动而非降级)
+        self.stage = None
+
+        if self.use_ssd and self.ssd_dir:
+            try:
+                # 获取分区根目录，创建临时暂存区 (每个任务独立子目录，多个任务可同时使用同一块 SSD)
+                drive_root = get_drive_root(self.ssd_dir)
+                self.stage = StagingArea.create(os.path.join(drive_root, STAGE_DIR_NAME, job_key), self.ssd_dir,
+                                                pool=self.stage_pool)
+
+                if self.stage.capacity <= 0:
+                    self.on_log(f"⚠️ [空间检测] SSD 剩余空间不足，已自动降级为直接写入模式")
+                    self.stage.cleanup()
+                    self.stage = None
+                else:
+                    self.on_log(f"✅ [SSD 加速] 已启用。暂存区: {self.stage.root} (可用 {format_size(self.stage.capacity)})")
+                    self.on_log("ℹ️ 提示: SSD 加速时内存占用升高属于正常系统缓存现象")
+
+            except Exception as e:
+                self.on_log(f"❌ SSD 检测出错: {e}, 已禁用加速")
+                self.stage = None
+        self.use_ssd = self.stage is not None
+        if self.stage and self.journal:
+            self.journal.stage(self.stage.root)
+
+        # 4. 调度组件：按源/目标设备分组的并发控制器 + 内存预算 + 暂存/预读
+        # 文件总数在扫描结束前未知，进程数按 CPU 配置 (实际在途数量由控制器决定)
+        self.max_workers = os.cpu_count() or 1
+        # 如果是 SSD，IO 吞吐大，可以多开几个进程
+        if self.use_ssd: self.max_workers = max(self.max_workers, 4)
+
+        self.controller = ConcurrencyController(self.max_workers, log=self.on_log)
+        self.task_of_file = {}
+        self.oversized = 0
+
+        # 慢速源盘预读：从暂存区划出一部分空间 (最多一半)，与输出暂存分开记账，互不挤占
+        self.prefetcher = None
+        if self.stage:
+            pf_budget = min(SSD_PREFETCH_BUDGET, self.stage.capacity // 2)
+            self.stage.resize(-pf_budget)
+            self.prefetcher = SourcePrefetcher(os.path.join(self.stage.root, "_prefetch"), pf_budget, log=self.on_log)
+            # 与暂存区同一设备的源文件不预读：同盘复制只会多一次读写
+            self.stage_dev = os.stat(self.stage.root).st_dev
+            self._same_dev_logged = set()
+
+        if self.budget is None:
+            self.budget = MemoryBudget(self.memory_budget, self.max_workers)
+        self.chunk_of_task = {}
+        self.metrics = BatchMetrics(job_key, self.max_workers)
+        if self.trace_dir:
+            try:
+                self.tracer = BatchTracer(self.trace_dir, job_key)
+                self.tracer.buffer.complete("setup", setup_start, time.perf_counter())
+                self.on_log("🧭 [追踪] 已开启执行时间线记录")
+            except OSError as e:
+                self.on_log(f"⚠️ [追踪] 无法创建追踪目录: {e}")
+        if self.profile_dir:
+            try:
+                self.profiler = BatchProfiler(self.profile_dir, job_key, self.profile_memory)
+                self.on_log(f"🔬 [剖析] 已开启工作进程性能剖析{' (含内存分配)' if self.profile_memory else ''}")
+            except OSError as e:
+                self.on_log(f"⚠️ [剖析] 无法创建剖析目录: {e}")
+        self.submitted_at = {}
+        self.started_at = {}
+        self._metrics_dumped = 0
+
+        self.on_log(f"🚀 启动 {self.max_workers} 个加密核心")
+        if self.nice or self.io_priority:
+            if qos_supported():
+                self.on_log(f"🐢 [QoS] 后台优先级: nice {self.nice}, I/O {self.io_priority or '默认'}")
+            else:
+                self.on_log("⚠️ [QoS] 当前平台不支持按任务降低优先级，已忽略")
+        if self.rate_limit:
+            self.on_log(f"🐢 [限速] {format_size(self.rate_limit)}/s")
+        if self.budget.limit:
+            self.on_log(f"ℹ️ 缓冲内存预算: {format_size(self.budget.limit)}")
+
+        # 5. 流水线回写：SSD 模式下进度 = 加密 60% + 回写 40%，每个文件加密完成后立即进入回写
+        self.writeback_bytes = 0
+        self._wb_lock = threading.Lock()
+        self.writeback = None
+        self.copier = None
+        if self.use_ssd:
+            self.copier = CopyEngine(should_stop=lambda: not self._is_running)
+            self.writeback = WriteBackPipeline(self._timed_move, workers=COPY_WORKERS)
+        self.direct_done_bytes = 0
+        self.enc_weight = 0.6 if self.use_ssd else 1.0
+        self.scanning = True
+        self.last_pct = 0
+
+        self.running = {}
+        self.planned_count = 0
+        self.finished_count = 0
+
+        # 预检期间扫描结果先暂存，预检通过后才进入调度
+        self.preflight_pending = {} if self.preflight else None
+        self._preflight_thread = None
+        self._preflight_report = None
+        self.resolved = set()
+
+    def step(self, executor):
+        """
+        调度循环的一轮：消费扫描结果、汇总进度、收集完成项、补充任务。
+        返回 False 表示批次已结束 (或被终止)。
+        """
+        if not self._is_running:
+            return False
+        step_start = time.perf_counter()
+
+        # 消费扫描结果：新发现的文件立即进入调度
+        for f_path, size in self.scanner.poll():
+            if f_path in self.size_of_file: continue
+            if f_path in self.skip:
+                self.skipped += 1
+                continue
+            if self.preflight_pending is not None:
+                self.preflight_pending[f_path] = size
+                continue
+            self._add_file(f_path, size)
+        self._record_missing()
+
+        if self.scanning and self.scanner.done and self._preflight_ready():
+            self._on_scan_done()
+
+        try:
+            while not self.queue.empty():
+                msg_type, *data = self.queue.get_nowait()
+                if msg_type == "PROGRESS":
+                    fp, curr, _ = data
+                    self.controller.record_bytes(self.task_of_file.get(fp), curr - self.processed_bytes_map.get(fp, 0))
+                    self.processed_bytes_map[fp] = curr
+                elif msg_type == "START":
+                    fp, _, started = data
+                    if fp in self.submitted_at:
+                        self.metrics.record_queue_wait(started - self.submitted_at.pop(fp))
+                elif msg_type == "STATS":
+                    self.metrics.record_file(data[1], data[2])
+        except:
+            pass
+
+        # 先收集完成项，空出的并发窗口在本轮立即补充
+        for f in [f for f in self.running if f.done()]:
+            self._on_task_done(self.running.pop(f), f)
+
+        if self.writeback:
+            for task, src, dst, err in self.writeback.poll():
+                self.stage.release(task)
+                self.finished_count += 1
+                if err is None:
+                    try: os.rmdir(os.path.dirname(src))
+                    except OSError: pass
+                    self._record(task[0], True, dst)
+                else:
+                    self._record(task[0], False, f"回写失败: {err}")
+                    self.on_log(f"⚠️ 数据保留在: {src}")
+
+        if self.remover:
+            self._poll_remover()
+
+        if not self.scanning and self.finished_count >= self.planned_count:
+            return False
+
+        # 按各设备组的并发窗口补充任务
+        for task in self.controller.pop_ready(self._admit, self.submit_ahead):
+            f_path, target_file_path, _ = task
+            read_path = self.prefetcher.read_path(task) if self.prefetcher else None
+            chunk = self.chunk_of_task.pop(task)
+            # 限速时用小块读写，避免大块突发占满磁盘 (运行中调整限速时由工作进程按共享限速值切换)
+            if self.rate_limit: chunk = min(chunk, QOS_THROTTLE_CHUNK)
+            self.submitted_at[f_path] = self.started_at[f_path] = time.time()
+            if self.tracer:
+                self.tracer.buffer.instant("submit", time.perf_counter(), args={"path": f_path})
+            self.running[executor.submit(
+                task_wrapper,
+                f_path, target_file_path, self.key_bytes, self.is_enc, self.enc_name,
+                self.queue, self.stop_event, self.pause_event, chunk, read_path,
+                f_path in self.resolved, self.nice, self.io_priority, self.rate_share,
+                self.tracer.parts_dir if self.tracer else None,
+                self.profiler.parts_dir if self.profiler else None, self.profile_memory
+            )] = task
+
+        self._update_rate_share()
+        self.controller.tick()
+        self._update_metrics()
+        self._report_progress()
+        if self.journal: self.journal.flush()
+        if self.events: self.events.flush()
+        if self.tracer:
+            now = time.perf_counter()
+            self.tracer.buffer.complete("step", step_start, now, cat="monitor")
+            self.tracer.buffer.counter("workers", now, busy=self.controller.in_flight)
+        return True
+
+    def drain(self):
+        """step 结束后调用：取消尚未开始的任务，返回已提交任务是否全部退出 (非阻塞)"""
+        for f in self.running:
+            f.cancel()
+        return all(f.done() for f in self.running)
+
+    def finish(self):
+        finish_start = time.perf_counter()
+        self.scanner.stop()
+        self.scanner.join()
+
+        # 6. SSD 模式收尾：清理暂存区 (终止时保留未回写的数据)
+        if self.prefetcher:
+            self.on_log(f"📥 [预读] 共预读 {self.prefetcher.staged_count} 个文件")
+            self.prefetcher.close()
+            self.stage.resize(self.prefetcher.budget)
+        if self.writeback:
+            if not self._is_running: self.writeback.stop()
+            self.writeback.close()
+            if self._is_running:
+                self.stage.cleanup()
+                self.on_log(f"✅ 回写完成，缓存已清理 ({self.copier.summary() or '无回写'})")
+            else:
+                self.on_log(f"⚠️ 任务终止，未回写数据保留在: {self.stage.root}")
+        elif self.stage:
+            self.stage.cleanup()
+        self.release_shared()
+
+        if self.remover:
+            if self.remover.pending:
+                self.on_log(f"🗑️ 等待 {self.remover.pending} 个源文件删除完成...")
+            self.remover.close()
+            self._poll_remover()
+            wiped = f" (删除前以{'全零' if self.wipe == 'zero' else '随机数据'}覆写)" if self.wipe else ""
+            self.on_log(f"🗑️ 已删除 {self.remover.removed} 个源文件{wiped}")
+
+        self._finish_metrics()
+        if self.tracer:
+            self.tracer.buffer.complete("finish", finish_start, time.perf_counter())
+            try:
+                path = self.tracer.write()
+                self.on_log(f"🧭 [追踪] 时间线已写入 {path} (可用 ui.perfetto.dev 或 chrome://tracing 打开)")
+            except OSError as e:
+                self.on_log(f"⚠️ [追踪] 时间线写入失败: {e}")
+        if self.profiler:
+            try:
+                paths = self.profiler.write()
+                if paths:
+                    self.on_log(f"🔬 [剖析] 结果已写入 {paths[0]}，报告: {paths[1]}")
+            except (OSError, ValueError) as e:
+                self.on_log(f"⚠️ [剖析] 结果合并失败: {e}")
+
+        if self.journal:
+            self.journal.close(STATUS_FINISHED if self._is_running else STATUS_STOPPED)
+        if self.events:
+            self.events.close(STATUS_FINISHED if self._is_running else STATUS_STOPPED)
+
+        if self.manager and self._own_manager:
+            self.manager.shutdown()
+
+        msg = "任务完成" if self._is_running else "已终止"
+        self.on_progress(msg, 100)
+        return self.results
+
+    def release_shared(self):
+        """归还可能与其他任务共用的内存预算与暂存盘预留 (含终止时已取消 / 未收集的任务)"""
+        if self.budget is not None:
+            for task in self.running.values():
+                self.budget.release((id(self), task))
+        if self.stage:
+            self.stage.release_all()
+
+    # ---------- 内部 ----------
+    def _recover(self, state):
+        """恢复上次中断的任务：回写已加密完成的暂存输出，清理未完成的残留 .part"""
+        self.skip = set(state.done)
+        recovered = 0
+        for src, (staged, dst) in state.staged_pending().items():
+            try:
+                if os.path.exists(staged):
+                    move_file(staged, dst)
+                elif not os.path.exists(dst):
+                    # 暂存输出已丢失：重新处理
+                    continue
+                # 回写已完成但未来得及记录，或刚刚补完回写
+                self.journal.done(src, dst)
+                self.skip.add(src)
+                recovered += 1
+            except OSError as e:
+                self.on_log(f"⚠️ [恢复] 暂存输出回写失败 {os.path.basename(src)}: {e}，将重新处理")
+
+        for src, (_, target) in state.planned.items():
+            if src in self.skip:
+                continue
+            for part in glob.glob(part_pattern(target)):
+                try: os.remove(part)
+                except OSError: pass
+        for root in state.stage_roots:
+            StagingArea(root, 0).cleanup()
+
+        self.journal.flush(force=True)
+        self.on_log(f"♻️ [恢复] 任务 {state.job_id}: 已完成 {len(state.done)} 个，"
+                    f"从暂存区回收 {recovered} 个，其余文件重新处理")
+
+    def _record_missing(self):
+        for f_path in self.scanner.poll_missing():
+            self._record(f_path, False, "文件不存在", log=False)
+
+    def _on_scan_done(self):
+        self.scanning = False
+        # 上次取出之后、扫描结束之前发现的不存在路径
+        self._record_missing()
+        self.on_log(f"--- 扫描完成: {self.planned_count} 个文件, {format_size(self.total_bytes)} "
+                    f"(并发: {self.controller.summary() or '无'}) ---")
+        if self.skipped:
+            self.on_log(f"⏭️ [恢复] 跳过 {self.skipped} 个已完成的文件")
+        if self.oversized:
+            self.on_log(f"⚠️ {self.oversized} 个文件超过暂存区容量，将直接写入目标目录")
+        if self.prefetcher:
+            if self.prefetcher.is_idle():
+                # 没有慢速源：预读空间归还给输出暂存
+                self.stage.resize(self.prefetcher.budget)
+                self.prefetcher.close()
+                self.prefetcher = None
+            else:
+                self.on_log(f"📥 [预读] 慢速源盘文件已提前顺序读入 SSD (预算 {format_size(self.prefetcher.budget)})")
+
+    def _preflight_ready(self):
+        """扫描完成后在后台线程执行解密预检 (非阻塞)，返回是否已可开始调度"""
+        if self.preflight_pending is None:
+            return True
+        if self._preflight_thread is None:
+            entries = list(self.preflight_pending.items())
+            reserved = self.resume_state.done.values() if self.resume_state else ()
+            self.on_progress(f"解密预检: 正在校验 {len(entries)} 个文件头...", 0)
+
+            def work():
+                start = time.perf_counter()
+                try:
+                    self._preflight_report = run_preflight(
+                        entries, self.key_bytes, lambda src: self._plan_target(src, self.common_base),
+                        collision=self.on_collision, reserved=[p for p in reserved if p])
+                except Exception as e:
+                    self.on_log(f"⚠️ [预检] 执行出错: {e}，跳过预检直接处理")
+                if self.tracer:
+                    self.tracer.buffer.complete("preflight", start, time.perf_counter(), args={"files": len(entries)})
+
+            self._preflight_thread = threading.Thread(target=work, name="Preflight", daemon=True)
+            self._preflight_thread.start()
+            return False
+        if self._preflight_thread.is_alive():
+            return False
+
+        entries, self.preflight_pending = self.preflight_pending, None
+        report = self._preflight_report
+        if report is None:
+            for f_path, size in entries.items():
+                self._add_file(f_path, size)
+            return True
+        if report.fatal:
+            self.on_log(f"⛔ [预检] {report.fatal}，已取消本批次 {len(entries)} 个文件")
+            for f_path in entries:
+                self._record(f_path, False, report.fatal, log=False)
+            return True
+
+        self.on_log(f"🔎 [预检] {len(entries)} 个文件头校验完成: {report.summary_text()}")
+        for f_path, err in report.bad.items():
+            self._record(f_path, False, f"预检未通过: {err}")
+        for f_path, name in report.renamed.items():
+            self.on_log(f"✏️ [预检] {os.path.basename(f_path)} 还原后重名，输出为 {name}")
+        for f_path, size in entries.items():
+            if f_path in report.targets:
+                self.resolved.add(f_path)
+                self._add_file(f_path, size, report.targets[f_path])
+        return True
+
+    def _add_file(self, f_path, size, final_target=None):
+        self.size_of_file[f_path] = size
+        self.processed_bytes_map[f_path] = 0
+        self.total_bytes += size
+        self.planned_count += 1
+        self._plan(f_path, size, final_target)
+
+    def _plan(self, f_path, size, final_target=None):
+        # final_target: 预检已确定的输出路径 (解密时为还原后的原名)
+        final_target = final_target or self._plan_target(f_path, self.common_base)
+
+        # 暂存模式：写入独立暂存槽位，完成后回写到 final_target 所在目录
+        if self.stage and self.stage.fits(size):
+            write_target = os.path.join(self.stage.new_slot(), os.path.basename(final_target))
+            task = (f_path, write_target, os.path.dirname(final_target))
+        else:
+            if self.stage: self.oversized += 1
+            task = (f_path, final_target, None)
+
+        self.task_of_file[f_path] = task
+        if self.journal: self.journal.plan(f_path, size, task[1])
+        read_side = f_path
+        if self.prefetcher:
+            src_dev, src_cls, src_name = self.controller.device_of(f_path)
+            if src_dev == self.stage_dev:
+                if src_dev not in self._same_dev_logged:
+                    self._same_dev_logged.add(src_dev)
+                    self.on_log(f"📥 [预读] 源盘 {src_name} 与暂存区为同一设备，不预读")
+            elif src_cls in SLOW_DEVICE_CLASSES and size <= self.prefetcher.budget:
+                self.prefetcher.add(task, f_path, size, src_dev)
+                # 工作进程实际从 SSD 读取，按暂存盘分组
+                read_side = self.prefetcher.root
+        self.controller.add_task(task, read_side, task[1])
+
+    def _admit(self, task):
+        # 源文件尚未预读到 SSD：等待预读线程 (预读因预算被后续副本占满而停滞时改为直接读源)
+        if self.prefetcher and self.prefetcher.peek(task) == PENDING and not self.prefetcher.bypass(task):
+            return False
+        size = self.size_of_file[task[0]]
+        # 暂存区容量：写满时暂缓启动，等待回写释放空间
+        if task[2] is not None and not self.stage.try_reserve(task, size):
+            return False
+        # 内存预算：缩小分块或推迟启动
+        chunk = self.budget.try_acquire((id(self), task), size)
+        if chunk is None:
+            if task[2] is not None: self.stage.release(task)
+            return False
+        self.chunk_of_task[task] = chunk
+        return True
+
+    def _on_task_done(self, task, future):
+        self.controller.task_done(task)
+        self.budget.release((id(self), task))
+        if self.prefetcher: self.prefetcher.discard(task)
+        try:
+            fp, success, msg, outp = future.result()
+        except Exception as e:
+            fp, success, msg, outp = task[0], False, f"异常: {e}", ""
+
+        if success and task[2] is not None:
+            # 暂存输出：交给回写流水线，完成后再计入结果
+            dst = os.path.join(task[2], os.path.basename(outp))
+            if self.journal: self.journal.staged(fp, outp, dst)
+            self.writeback.submit(task, outp, dst)
+            return
+
+        if task[2] is not None: self.stage.release(task)
+        self.direct_done_bytes += self.size_of_file[fp]
+        self.finished_count += 1
+        self._record(fp, success, outp if success else msg)
+
+    def _record(self, fp, success, detail, log=True):
+        if self.metrics: self.metrics.record_result(success)
+        if self.events:
+            started = self.started_at.pop(fp, None)
+            self.events.file(fp, success, detail, self.size_of_file.get(fp),
+                             None if started is None else time.time() - started)
+        if self.journal:
+            if success: self.journal.done(fp, detail)
+            else: self.journal.fail(fp, detail)
+        if success:
+            self.results["success"].append((fp, detail))
+            if log and self.log_results: self.on_log(f"✅ {os.path.basename(fp)}")
+            # 输出与源文件为同一路径时不能删除
+            if self.remover and os.path.normcase(os.path.abspath(fp)) != os.path.normcase(os.path.abspath(detail)):
+                self.remover.submit(fp)
+        else:
+            self.results["fail"].append((fp, detail))
+            if log and self.log_results: self.on_log(f"❌ {os.path.basename(fp)}: {detail}")
+        self.on_result(fp, success, detail)
+
+    def _report_progress(self):
+        # 扫描期间总量持续增长，进度只增不减
+        if self.total_bytes <= 0:
+            return
+        done = sum(self.processed_bytes_map.values())
+        units = done * self.enc_weight + (self.writeback_bytes + self.direct_done_bytes) * (1 - self.enc_weight)
+        self.last_pct = max(self.last_pct, min(int(units / self.total_bytes * 100), 99))
+        extra = [t for t in (f"扫描中: 已发现 {self.planned_count} 个文件" if self.scanning else "",
+                             self.budget.usage_text(),
+                             self.stage.usage_text() if self.stage else "",
+                             self.prefetcher.usage_text() if self.prefetcher else "",
+                             self.remover.usage_text() if self.remover else "") if t]
+        self.on_progress(f"正在处理... {self.last_pct}%" + "".join(f" | {t}" for t in extra), self.last_pct)
+
+    def _plan_target(self, f_path, common_base):
+        return plan_target(f_path, common_base, self.is_enc, self.custom_out,
+                           self.keep_structure, self.encrypt_dirname)
+
+    def _update_metrics(self):
+        self.metrics.set_gauges(workers_busy=self.controller.in_flight,
+                                stage_used_bytes=self.stage.used if self.stage else 0,
+                                stage_capacity_bytes=self.stage.capacity if self.stage else 0,
+                                memory_used_bytes=self.budget.used)
+        self.metrics.sample_capacity(self.controller.capacity)
+        now = time.monotonic()
+        if self.metrics_file and now - self._metrics_dumped >= METRICS_DUMP_INTERVAL:
+            self._metrics_dumped = now
+            self._dump_prometheus()
+
+    def _dump_prometheus(self):
+        try:
+            write_atomic(self.metrics_file, self.metrics.to_prometheus())
+        except OSError as e:
+            self.on_log(f"⚠️ [指标] 写入失败 {self.metrics_file}: {e}")
+            self.metrics_file = None
+
+    def _finish_metrics(self):
+        if not self.metrics:
+            return
+        self.metrics.set_gauges(workers_busy=0, stage_used_bytes=0, memory_used_bytes=0)
+        self.metrics.close()
+        if self.metrics.files["success"] or self.metrics.files["fail"]:
+            self.on_log(f"📊 [统计] {self.metrics.summary_text()}")
+        if self.metrics_file:
+            self._dump_prometheus()
+        if self.metrics_dir:
+            try:
+                self.on_log(f"📊 [统计] 批次汇总已写入 {write_summary(self.metrics_dir, self.metrics)}")
+            except OSError as e:
+                self.on_log(f"⚠️ [统计] 汇总写入失败: {e}")
+
+    def _poll_remover(self):
+        for path, err in self.remover.poll():
+            if err is not None:
+                self.on_log(f"⚠️ 源文件删除失败 {os.path.basename(path)}: {err}")
+
+    def _update_rate_share(self):
+        """整个任务的限速按在途文件数均分 (只在变化时写入共享值)"""
+        share = self.rate_limit / max(1, self.controller.in_flight) if self.rate_limit else 0.0
+        if share != self._share_sent:
+            self.rate_share.value = share
+            self._share_sent = share
+
+    def _timed_move(self, src, dst):
+        start = time.perf_counter()
+        try:
+            self.copier.move(src, dst, self._add_writeback_bytes)
+        finally:
+            end = time.perf_counter()
+            self.metrics.add_writeback(0, end - start)
+            if self.tracer:
+                self.tracer.buffer.complete("writeback", start, end, cat="writeback", args={"path": dst})
+
+    def _add_writeback_bytes(self, n):
+        """回写进度累加 (多个回写线程并发调用)"""
+        with self._wb_lock:
+            self.writeback_bytes += n
+        self.metrics.add_writeback(n)
@@ -0,0 +1,443 @@
+import os
+import json
+import time
+import uuid
+import random
+import socket
+import hashlib
+from collections import deque
+from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing.managers import SyncManager
+
+from config import (CLUSTER_TASK_FILES, CLUSTER_TASK_BYTES, CLUSTER_HEARTBEAT, CLUSTER_STALE,
+                    CLUSTER_POLL)
+from core.batch_runner import task_wrapper, plan_target, common_base_of, format_size, _ignore_sigint
+from core.journal import key_check
+from core.file_cipher import MSG_FENCED
+from core.scanner import ParallelScanner
+
+# 共享目录布局 (每个批次一个任务目录)：
+#   <队列目录>/<任务ID>/job.json              批次信息 (最后写入，出现即表示发布完成)
+#                      todo/<编号>.json        待处理任务 (一组文件)
+#                      claimed/<编号>@<节点>.json  已被某节点认领 (由 todo 原子重命名而来)
+#                      done/<编号>.json        完成记录 (逐文件结果)
+#                      nodes/<节点>            节点心跳 (mtime 由文件服务器更新)
+JOB_FILE = "job.json"
+TODO = "todo"
+CLAIMED = "claimed"
+DONE = "done"
+NODES = "nodes"
+
+
+# ================= 共享目录读写 =================
+def _write_json(path, data):
+    """先写临时文件再原子重命名：其他节点不会读到写了一半的记录"""
+    tmp = f"{path}.{uuid.uuid4().hex[:8]}.tmp"
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+def _read_json(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def _list_json(path):
+    try:
+        return [n for n in os.listdir(path) if n.endswith(".json")]
+    except OSError:
+        return []
+
+
+def list_jobs(queue_dir):
+    """列出队列目录中已发布的批次 [(任务目录, job.json 内容)]，按发布时间排序"""
+    jobs = []
+    try:
+        names = sorted(os.listdir(queue_dir))
+    except OSError:
+        return jobs
+    for name in names:
+        job_dir = os.path.join(queue_dir, name)
+        try:
+            jobs.append((job_dir, _read_json(os.path.join(job_dir, JOB_FILE))))
+        except (OSError, ValueError):
+            continue
+    return jobs
+
+
+def job_status(job_dir):
+    """统计批次进度 (读取所有完成记录)"""
+    meta = _read_json(os.path.join(job_dir, JOB_FILE))
+    success = fail = 0
+    for name in _list_json(os.path.join(job_dir, DONE)):
+        try:
+            for _, ok, _ in _read_json(os.path.join(job_dir, DONE, name))["results"]:
+                if ok: success += 1
+                else: fail += 1
+        except (OSError, ValueError, KeyError):
+            continue
+    claimed = _list_json(os.path.join(job_dir, CLAIMED))
+    todo = _list_json(os.path.join(job_dir, TODO))
+    try:
+        nodes = os.listdir(os.path.join(job_dir, NODES))
+    except OSError:
+        nodes = []
+    return {"id": meta["id"], "encrypt": meta["is_encrypt"], "tasks": meta["tasks"], "files": meta["files"],
+            "todo": len(todo), "claimed": len(claimed), "done": len(_list_json(os.path.join(job_dir, DONE))),
+            "success": success, "fail": fail, "nodes": sorted(nodes),
+            "finished": not todo and not claimed}
+
+
+# ================= 发布 =================
+def publish_job(queue_dir, files, key, is_encrypt, custom_out_dir=None, keep_structure=False,
+                encrypt_filename=False, encrypt_dirname=False, task_files=CLUSTER_TASK_FILES,
+                task_bytes=CLUSTER_TASK_BYTES, log=None):
+    """
+    扫描输入并把批次发布到共享队列目录，返回 (任务ID, 文件数)。
+    输出路径在发布时确定 (各节点需以相同路径挂载共享目录)；
+    加密文件名也在此时生成，任务被重新认领时重复处理会覆盖同一个输出，不会产生多余文件。
+    """
+    log = log or (lambda msg: None)
+    job_id = datetime.now().strftime("%Y%m%d_%H%M%S_") + uuid.uuid4().hex[:6]
+    job_dir = os.path.join(queue_dir, job_id)
+    for sub in (TODO, CLAIMED, DONE, NODES):
+        os.makedirs(os.path.join(job_dir, sub), exist_ok=True)
+
+    common_base = common_base_of(files) if keep_structure else ""
+    scanner = ParallelScanner(files).start()
+    tasks, batch, batch_bytes = 0, [], 0
+    count, total = 0, 0
+
+    def flush():
+        nonlocal tasks, batch, batch_bytes
+        if batch:
+            tasks += 1
+            _write_json(os.path.join(job_dir, TODO, f"{tasks:06d}.json"), {"files": batch})
+            batch, batch_bytes = [], 0
+
+    while not scanner.done:
+        entries = scanner.poll()
+        if not entries:
+            time.sleep(0.05)
+            continue
+        for src, size in entries:
+            target = plan_target(src, common_base, is_encrypt, custom_out_dir, keep_structure, encrypt_dirname)
+            if is_encrypt and encrypt_filename:
+                target = os.path.join(os.path.dirname(target), uuid.uuid4().hex[:12] + ".enc")
+            batch.append([src, size, target])
+            batch_bytes += size
+            count += 1
+            total += size
+            if len(batch) >= task_files or batch_bytes >= task_bytes:
+                flush()
+    flush()
+    scanner.join()
+    for path in scanner.poll_missing():
+        log(f"⚠️ 文件不存在: {path}")
+
+    _write_json(os.path.join(job_dir, JOB_FILE), {
+        "id": job_id, "created": time.time(), "is_encrypt": is_encrypt, "key_check": key_check(key),
+        "tasks": tasks, "files": count, "bytes": total, "out": custom_out_dir})
+    log(f"📤 [集群] 已发布批次 {job_id}: {count} 个文件 ({format_size(total)})，{tasks} 个任务")
+    return job_id, count
+
+
+# ================= 工作节点 =================
+class _Claim:
+    def __init__(self, job_dir, task_id, path, files):
+        self.job_dir = job_dir
+        self.task_id = task_id
+        self.path = path
+        self.remaining = len(files)
+        self.results = []
+        # 认领已被其他节点回收 (本节点曾被判定失联)：放弃其余文件，不写完成记录
+        self.lost = False
+
+
+class ClusterWorker:
+    """
+    集群工作节点：从共享目录认领任务，用本机进程池处理。
+    1. 认领：todo/<编号>.json 原子重命名为 claimed/<编号>@<节点>.json，重命名成功者获得任务
+    2. 心跳：定期更新 nodes/<节点> 的 mtime；以文件服务器时间比较，不受各主机时钟偏差影响
+    3. 回收：发现其他节点心跳超时，把它认领的任务重命名回 todo；
+       原节点若只是暂时停顿，写出每个输出前会发现认领文件已不在而放弃 (见 task_wrapper 的 fence)，
+       检查与重命名之间的竞争由各任务独立的临时文件兜底：最终输出总是某一次完整的处理结果
+    不依赖任何外部服务，吞吐随挂载共享目录的节点数增加。
+    """
+
+    def __init__(self, queue_dir, key, job_id=None, slots=None, node=None, stale=CLUSTER_STALE,
+                 exit_when_done=True, on_log=None, on_result=None, on_progress=None):
+        self.queue_dir = queue_dir
+        self.key = key
+        self.job_id = job_id
+        self.slots = max(1, slots or os.cpu_count() or 1)
+        self.node = node or f"{socket.gethostname()}-{os.getpid()}"
+        self.stale = stale
+        self.exit_when_done = exit_when_done
+        self.on_log = on_log or (lambda msg: None)
+        self.on_result = on_result or (lambda fp, success, detail: None)
+        self.on_progress = on_progress or (lambda text, pct: None)
+
+        self.results = {"success": [], "fail": []}
+        self.jobs = {}
+        self._rejected = set()
+        self._todo_cache = {}
+        self._claims = []
+        self._pending = deque()
+        self._running = {}
+        self._file_bytes = {}
+        self._bytes_done = 0
+        self._global_pct = 0
+        self._clock = (time.time(), time.monotonic())
+        self._is_running = True
+        self.stop_event = None
+
+    def stop(self):
+        self._is_running = False
+        if self.stop_event: self.stop_event.set()
+
+    @property
+    def is_running(self):
+        return self._is_running
+
+    def run(self):
+        self.key_bytes = hashlib.sha256(self.key.encode()).digest()
+        self._refresh_jobs()
+        if self.job_id and not self.jobs:
+            raise ValueError(f"集群任务不存在或密钥不一致: {self.job_id}")
+
+        manager = SyncManager()
+        manager.start(_ignore_sigint)
+        self.queue = manager.Queue()
+        self.stop_event = manager.Event()
+        self.pause_event = manager.Event()
+        self.pause_event.set()
+        if not self._is_running: self.stop_event.set()
+
+        self.on_log(f"🛰️ [集群] 节点 {self.node} 启动，{self.slots} 个处理核心")
+        last_hb = last_scan = 0
+        try:
+            with ProcessPoolExecutor(max_workers=self.slots, initializer=_ignore_sigint) as pool:
+                while self._is_running:
+                    now = time.monotonic()
+                    if now - last_hb >= CLUSTER_HEARTBEAT:
+                        self._heartbeat()
+                        self._reclaim_stale()
+                        last_hb = now
+
+                    for f in [f for f in self._running if f.done()]:
+                        self._on_file_done(self._running.pop(f), f)
+                    self._drain_progress()
+
+                    while len(self._running) < self.slots:
+                        if not self._pending and not self._claim_next():
+                            break
+                        claim, src, target = self._pending.popleft()
+                        if claim.lost:
+                            continue
+                        self._running[pool.submit(
+                            task_wrapper, src, target, self.key_bytes, self.jobs[claim.job_dir]["is_encrypt"],
+                            False, self.queue, self.stop_event, self.pause_event, fence=claim.path
+                        )] = (claim, src, target)
+
+                    self._report_progress()
+                    if self._running:
+                        time.sleep(0.05)
+                        continue
+                    # 本节点空闲：检查是否还有新批次 / 其他节点是否仍在处理
+                    if now - last_scan >= CLUSTER_POLL:
+                        self._refresh_jobs()
+                        last_scan = now
+                        if self.exit_when_done and self._all_finished():
+                            break
+                    time.sleep(CLUSTER_POLL)
+
+                if not self._is_running:
+                    self.stop_event.set()
+                for f in list(self._running):
+                    try: f.result()
+                    except Exception: pass
+        finally:
+            self._release_claims()
+            manager.shutdown()
+        self.on_progress("集群任务完成" if self._is_running else "已终止", 100)
+        return self.results
+
+    # ---------- 批次 ----------
+    def _refresh_jobs(self):
+        check = key_check(self.key)
+        for job_dir, meta in list_jobs(self.queue_dir):
+            if job_dir in self.jobs or job_dir in self._rejected:
+                continue
+            if self.job_id and meta["id"] != self.job_id:
+                continue
+            if meta.get("key_check") != check:
+                self._rejected.add(job_dir)
+                self.on_log(f"⚠️ [集群] 批次 {meta['id']} 的密钥与本节点不一致，已跳过")
+                continue
+            self.jobs[job_dir] = meta
+            self._touch(job_dir)
+
+    def _all_finished(self):
+        for job_dir in self.jobs:
+            if _list_json(os.path.join(job_dir, TODO)) or _list_json(os.path.join(job_dir, CLAIMED)):
+                return False
+        return not self._claims
+
+    # ---------- 认领 ----------
+    def _claim_next(self):
+        for job_dir in self.jobs:
+            names = self._todo_cache.get(job_dir)
+            if not names:
+                names = _list_json(os.path.join(job_dir, TODO))
+                # 随机顺序：多个节点同时认领时减少争抢同一个任务
+                random.shuffle(names)
+                self._todo_cache[job_dir] = names
+            while names:
+                name = names.pop()
+                task_id = name[:-5]
+                src = os.path.join(job_dir, TODO, name)
+                dst = os.path.join(job_dir, CLAIMED, f"{task_id}@{self.node}.json")
+                try:
+                    os.rename(src, dst)
+                except FileNotFoundError:
+                    # 已被其他节点认领 (NFS 重传时重命名可能已成功但报告失败)
+                    if not os.path.exists(dst): continue
+                except OSError:
+                    continue
+                try:
+                    files = _read_json(dst)["files"]
+                except (OSError, ValueError, KeyError) as e:
+                    self.on_log(f"❌ [集群] 任务文件损坏 {name}: {e}")
+                    continue
+                claim = _Claim(job_dir, task_id, dst, files)
+                self._claims.append(claim)
+                self._pending.extend((claim, src_path, target) for src_path, _, target in files)
+                if not files: self._complete(claim)
+                return True
+        return False
+
+    def _on_file_done(self, item, future):
+        claim, src, target = item
+        self._bytes_done += self._file_bytes.pop(src, 0)
+        try:
+            fp, success, msg, outp = future.result()
+        except Exception as e:
+            fp, success, msg, outp = src, False, f"异常: {e}", ""
+        if not self._is_running and not success:
+            # 终止导致的中断不算失败：任务整体归还队列
+            return
+        if claim.lost:
+            return
+        if not success and msg == MSG_FENCED:
+            claim.lost = True
+            self._claims.remove(claim)
+            self.on_log(f"♻️ [集群] 任务 {claim.task_id} 已被其他节点回收，本节点放弃处理")
+            return
+        detail = outp if success else msg
+        claim.results.append([fp, success, detail])
+        claim.remaining -= 1
+        if success:
+            self.results["success"].append((fp, detail))
+            self.on_log(f"✅ {os.path.basename(fp)}")
+        else:
+            self.results["fail"].append((fp, detail))
+            self.on_log(f"❌ {os.path.basename(fp)}: {detail}")
+        self.on_result(fp, success, detail)
+        if claim.remaining <= 0:
+            self._complete(claim)
+
+    def _complete(self, claim):
+        """写入完成记录并移除认领文件"""
+        _write_json(os.path.join(claim.job_dir, DONE, f"{claim.task_id}.json"),
+                    {"task": claim.task_id, "node": self.node, "at": time.time(), "results": claim.results})
+        for path in (claim.path, os.path.join(claim.job_dir, TODO, f"{claim.task_id}.json")):
+            # 认领曾被误判失联而重新入队时，一并移除，避免重复处理
+            try: os.remove(path)
+            except OSError: pass
+        self._claims.remove(claim)
+
+    def _release_claims(self):
+        """退出时归还未完成的任务 (已处理的文件会被其他节点重新处理，输出路径相同)"""
+        released = 0
+        for claim in self._claims:
+            try:
+                os.rename(claim.path, os.path.join(claim.job_dir, TODO, f"{claim.task_id}.json"))
+                released += 1
+            except OSError:
+                pass
+        self._claims = []
+        self._pending.clear()
+        if released:
+            self.on_log(f"↩️ [集群] 已归还 {released} 个未完成的任务")
+
+    # ---------- 心跳与回收 ----------
+    def _touch(self, job_dir):
+        path = os.path.join(job_dir, NODES, self.node)
+        try:
+            with open(path, 'a'):
+                pass
+            os.utime(path, None)
+            # 记录文件服务器时间，用于判断其他节点的心跳是否超时
+            self._clock = (os.stat(path).st_mtime, time.monotonic())
+        except OSError as e:
+            self.on_log(f"⚠️ [集群] 心跳写入失败: {e}")
+
+    def _heartbeat(self):
+        done = 0
+        for job_dir in self.jobs:
+            self._touch(job_dir)
+            done += len(_list_json(os.path.join(job_dir, DONE)))
+        # 整体进度按所有节点已完成的任务数计算 (随心跳更新)
+        total = sum(meta["tasks"] for meta in self.jobs.values())
+        self._global_pct = min(99, int(done / total * 100)) if total else 0
+
+    def _fs_now(self):
+        return self._clock[0] + (time.monotonic() - self._clock[1])
+
+    def _reclaim_stale(self):
+        now = self._fs_now()
+        for job_dir in self.jobs:
+            claimed_dir = os.path.join(job_dir, CLAIMED)
+            for name in _list_json(claimed_dir):
+                task_id, _, node = name[:-5].partition("@")
+                if node == self.node:
+                    continue
+                path = os.path.join(claimed_dir, name)
+                try:
+                    beat = os.path.join(job_dir, NODES, node)
+                    last = os.stat(beat if os.path.exists(beat) else path).st_mtime
+                except OSError:
+                    continue
+                if now - last <= self.stale:
+                    continue
+                try:
+                    if os.path.exists(os.path.join(job_dir, DONE, f"{task_id}.json")):
+                        os.remove(path)
+                    else:
+                        os.rename(path, os.path.join(job_dir, TODO, f"{task_id}.json"))
+                        self.on_log(f"♻️ [集群] 节点 {node} 心跳超时 ({now - last:.0f}s)，任务 {task_id} 重新入队")
+                except OSError:
+                    # 其他节点已先一步回收
+                    continue
+
+    # ---------- 进度 ----------
+    def _drain_progress(self):
+        try:
+            while not self.queue.empty():
+                msg_type, *data = self.queue.get_nowait()
+                if msg_type == "PROGRESS":
+                    fp, curr, _ = data
+                    self._file_bytes[fp] = curr
+        except Exception:
+            pass
+
+    def _report_progress(self):
+        done = len(self.results["success"]) + len(self.results["fail"])
+        processed = self._bytes_done + sum(self._file_bytes.values())
+        self.on_progress(f"[集群] 全部节点进度 {self._global_pct}% | 本节点已处理 {done} 个文件 "
+                         f"({format_size(processed)}) | 在途 {len(self._running)}", self._global_pct)
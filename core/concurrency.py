@@ -0,0 +1,296 @@
+import os
+import sys
+import time
+from collections import deque
+
+from config import DEVICE_CONCURRENCY, AIMD_WINDOW, AIMD_GAIN_RATIO, AIMD_DROP_RATIO
+
+# 网络文件系统类型 (Linux /proc/mounts)
+NETWORK_FS_TYPES = {"nfs", "nfs4", "cifs", "smb3", "smbfs", "ncpfs", "9p", "afs", "fuse.sshfs", "fuse.rclone"}
+MEMORY_FS_TYPES = {"tmpfs", "ramfs"}
+# 不预先提交的设备类别：进程池中任一进程空出都会启动排队的任务，多出的任务会与窗口内的任务同时读写同一块盘 (寻道抖动)
+SEEK_BOUND_CLASSES = {"HDD", "USB"}
+
+
+# ==========================================
+# 设备识别
+# ==========================================
+def _nearest_existing(path):
+    """向上查找第一个已存在的路径 (目标目录可能尚未创建)"""
+    path = os.path.abspath(path)
+    while not os.path.exists(path):
+        parent = os.path.dirname(path)
+        if parent == path:
+            break
+        path = parent
+    return path
+
+
+def _mount_fstype(path):
+    """根据 /proc/mounts 查找路径所在挂载点的文件系统类型"""
+    best, fstype = "", ""
+    try:
+        with open("/proc/mounts", "r") as f:
+            for line in f:
+                parts = line.split()
+                if len(parts) < 3: continue
+                mnt = parts[1].replace("\\040", " ")
+                if (path == mnt or path.startswith(mnt.rstrip("/") + "/")) and len(mnt) > len(best):
+                    best, fstype = mnt, parts[2]
+    except OSError:
+        pass
+    return fstype
+
+
+def _classify_linux(path, st_dev):
+    fstype = _mount_fstype(path)
+    if fstype in NETWORK_FS_TYPES:
+        return "NETWORK", fstype
+    if fstype in MEMORY_FS_TYPES:
+        return "RAM", fstype
+
+    major, minor = os.major(st_dev), os.minor(st_dev)
+    sys_path = f"/sys/dev/block/{major}:{minor}"
+    if not os.path.exists(sys_path):
+        return "UNKNOWN", fstype or f"{major}:{minor}"
+
+    real = os.path.realpath(sys_path)
+    # 分区的 queue 信息在上级磁盘目录中
+    disk_dir = real if os.path.exists(os.path.join(real, "queue")) else os.path.dirname(real)
+    name = os.path.basename(disk_dir)
+
+    if "/usb" in real:
+        return "USB", name
+    if name.startswith("nvme"):
+        return "NVME", name
+    try:
+        with open(os.path.join(disk_dir, "queue", "rotational"), "r") as f:
+            return ("HDD" if f.read().strip() == "1" else "SSD"), name
+    except OSError:
+        return "UNKNOWN", name
+
+
+def _classify_windows(path):
+    if path.startswith("\\\\"):
+        return "NETWORK", path.split("\\")[2] if len(path.split("\\")) > 2 else "UNC"
+    drive = os.path.splitdrive(path)[0]
+    try:
+        import ctypes
+        # DRIVE_REMOVABLE=2, DRIVE_REMOTE=4, DRIVE_RAMDISK=6
+        drive_type = ctypes.windll.kernel32.GetDriveTypeW(drive + "\\")
+        if drive_type == 4: return "NETWORK", drive
+        if drive_type == 2: return "USB", drive
+        if drive_type == 6: return "RAM", drive
+    except Exception:
+        pass
+    return "UNKNOWN", drive
+
+
+def classify_device(path):
+    """
+    识别路径所在设备。
+    返回: (st_dev, 设备类别, 设备名称)，类别取值见 config.DEVICE_CONCURRENCY
+    """
+    path = _nearest_existing(path)
+    try:
+        st_dev = os.stat(path).st_dev
+    except OSError:
+        return None, "UNKNOWN", "?"
+
+    if sys.platform.startswith("linux"):
+        dev_class, name = _classify_linux(path, st_dev)
+    elif os.name == "nt":
+        dev_class, name = _classify_windows(path)
+    else:
+        dev_class, name = "UNKNOWN", str(st_dev)
+    return st_dev, dev_class, name
+
+
+# ==========================================
+# 并发控制器
+# ==========================================
+class DeviceGroup:
+    """同一 (源设备, 目标设备) 组合的任务组，独立维护 AIMD 并发窗口"""
+
+    def __init__(self, key, label, initial, max_limit, src_class="UNKNOWN", dst_class="UNKNOWN"):
+        self.key = key
+        self.label = label
+        self.src_class = src_class
+        self.dst_class = dst_class
+        self.limit = initial
+        self.max_limit = max_limit
+        self.in_flight = 0
+        self.pending = deque()
+
+        self.window_start = time.time()
+        self.window_bytes = 0
+        self.window_saturated = True
+        self.last_rate = None
+        self.last_action = None
+
+
+class ConcurrencyController:
+    """
+    设备感知的自适应并发控制器。
+    1. 按源/目标设备 (st_dev) 对任务分组，初始并发取两端设备类别上限的较小值
+    2. 运行中按组统计吞吐 (bytes/s)，加性增 / 乘性减 (AIMD) 调整在途任务数
+    """
+
+    def __init__(self, max_total, log=None):
+        self.max_total = max(1, max_total)
+        # 外部配额 (多任务调度器按公平份额设置)，None 表示只受 max_total 限制
+        self.quota = None
+        self.log = log or (lambda msg: None)
+        self.groups = {}
+        self._order = []
+        self._rr = 0
+        self._task_group = {}
+        self._dev_cache = {}
+
+    # ---------- 分组 ----------
+    def device_of(self, path):
+        # 以最近的已存在目录为缓存键 (暂存槽位/输出目录可能尚未创建)
+        key = _nearest_existing(os.path.dirname(os.path.abspath(path)))
+        if key not in self._dev_cache:
+            self._dev_cache[key] = classify_device(key)
+        return self._dev_cache[key]
+
+    def _get_group(self, src_path, dst_path):
+        src_dev, src_cls, src_name = self.device_of(src_path)
+        dst_dev, dst_cls, dst_name = self.device_of(dst_path)
+        key = (src_dev, dst_dev)
+
+        group = self.groups.get(key)
+        if group is None:
+            src_init, src_max = DEVICE_CONCURRENCY.get(src_cls, DEVICE_CONCURRENCY["UNKNOWN"])
+            dst_init, dst_max = DEVICE_CONCURRENCY.get(dst_cls, DEVICE_CONCURRENCY["UNKNOWN"])
+            # 同一块盘既读又写，按单设备处理
+            max_limit = min(src_max, dst_max, self.max_total)
+            initial = min(src_init, dst_init, max_limit)
+            label = f"{src_name}({src_cls}) → {dst_name}({dst_cls})"
+
+            group = DeviceGroup(key, label, initial, max_limit, src_cls, dst_cls)
+            self.groups[key] = group
+            self._order.append(group)
+            self.log(f"⚙️ [并发控制] 设备组 {label}: 初始并发 {initial}, 上限 {max_limit}")
+        return group
+
+    def add_task(self, task, src_path, dst_path):
+        group = self._get_group(src_path, dst_path)
+        group.pending.append(task)
+        self._task_group[id(task)] = group
+        return group
+
+    def group_of(self, task):
+        return self._task_group.get(id(task))
+
+    # ---------- 调度 ----------
+    @property
+    def in_flight(self):
+        return sum(g.in_flight for g in self._order)
+
+    @property
+    def has_pending(self):
+        return any(g.pending for g in self._order)
+
+    @property
+    def total_limit(self):
+        return self.max_total if self.quota is None else min(self.max_total, self.quota)
+
+    @property
+    def capacity(self):
+        """当前最多可同时运行的任务数：有任务的各组并发窗口之和 (不超过总并发 / 配额)"""
+        return min(self.total_limit, sum(min(g.limit, g.in_flight + len(g.pending)) for g in self._order))
+
+    def pop_ready(self, admit=None, ahead=0):
+        """
+        按组轮询取出可立即启动的任务。
+        admit: 可选回调 admit(task) -> bool，返回 False 时该任务暂缓 (留在队首)
+        ahead: 总并发已满时每组可超出并发窗口预先提交的任务数 (进程池只有 max_total 个进程，
+               多出的任务在进程池队列中等待，避免工作进程在两轮调度之间空闲)；
+               HDD / U 盘所在的组不预先提交
+        """
+        ready = []
+        total = self.in_flight
+        limit = self.total_limit
+        if limit <= 0:
+            return ready
+        progressed = True
+        while progressed and total < limit + ahead:
+            progressed = False
+            for _ in range(len(self._order)):
+                group = self._order[self._rr % len(self._order)]
+                self._rr += 1
+                cap = group.limit
+                if total >= limit and not {group.src_class, group.dst_class} & SEEK_BOUND_CLASSES:
+                    cap += ahead
+                if not group.pending or group.in_flight >= cap:
+                    continue
+                task = group.pending[0]
+                if admit is not None and not admit(task):
+                    continue
+                group.pending.popleft()
+                group.in_flight += 1
+                total += 1
+                ready.append(task)
+                progressed = True
+                if total >= limit + ahead:
+                    break
+        return ready
+
+    def task_done(self, task):
+        group = self._task_group.pop(id(task), None)
+        if group:
+            group.in_flight = max(0, group.in_flight - 1)
+
+    # ---------- AIMD ----------
+    def record_bytes(self, task, nbytes):
+        group = self._task_group.get(id(task))
+        if group and nbytes > 0:
+            group.window_bytes += nbytes
+
+    def tick(self):
+        """周期调用：每个统计窗口结束时按吞吐调整各组并发"""
+        now = time.time()
+        for group in self._order:
+            # 窗口内任务数不足上限时吞吐不具参考性
+            if group.in_flight < group.limit or not group.pending:
+                group.window_saturated = False
+
+            elapsed = now - group.window_start
+            if elapsed < AIMD_WINDOW:
+                continue
+
+            rate = group.window_bytes / elapsed
+            if group.window_saturated and group.window_bytes > 0:
+                self._adjust(group, rate)
+
+            group.window_start = now
+            group.window_bytes = 0
+            group.window_saturated = True
+
+    def _adjust(self, group, rate):
+        old = group.limit
+        last = group.last_rate
+
+        if last is None or rate > last * AIMD_GAIN_RATIO:
+            # 吞吐仍在增长 (或首个窗口)：加性增，继续探测
+            if group.limit < group.max_limit:
+                group.limit += 1
+                group.last_action = "inc"
+        elif rate < last * AIMD_DROP_RATIO:
+            # 吞吐明显下降：乘性减
+            group.limit = max(1, group.limit // 2)
+            group.last_action = "dec"
+        elif group.last_action == "inc":
+            # 上次加并发没有带来收益：回退一步并保持
+            group.limit = max(1, group.limit - 1)
+            group.last_action = "hold"
+
+        group.last_rate = rate
+        if group.limit != old:
+            self.log(f"⚙️ [并发控制] {group.label}: 并发 {old} → {group.limit} "
+                     f"(吞吐 {rate / 1024 / 1024:.1f} MB/s)")
+
+    def summary(self):
+        return ", ".join(f"{g.label}={g.limit}" for g in self._order)
@@ -0,0 +1,187 @@
+import os
+import sys
+import errno
+import shutil
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from config import COPY_BLOCK, COPY_WORKERS
+
+# Linux FICLONE ioctl: 同一 btrfs/xfs/ocfs2 卷上的写时复制克隆 (reflink)
+FICLONE = 0x40049409
+
+# 这些错误表示当前拷贝方式不被支持，换下一种方式重试
+_FALLBACK_ERRNOS = {errno.EXDEV, errno.EINVAL, errno.ENOSYS, errno.EOPNOTSUPP, errno.ENOTTY,
+                    errno.EBADF, errno.EPERM, getattr(errno, "ENOTSUP", errno.EOPNOTSUPP)}
+
+
+class _CopyUnsupported(Exception):
+    pass
+
+
+def _reflink(fd_in, fd_out):
+    if not sys.platform.startswith("linux"):
+        raise _CopyUnsupported()
+    try:
+        import fcntl
+        fcntl.ioctl(fd_out, FICLONE, fd_in)
+    except (ImportError, OSError):
+        raise _CopyUnsupported()
+
+
+def _kernel_copy(fd_in, fd_out, size, on_bytes, should_stop, use_sendfile):
+    """copy_file_range / sendfile 内核态拷贝，数据不经过用户态缓冲"""
+    if use_sendfile:
+        if not hasattr(os, "sendfile") or not sys.platform.startswith("linux"):
+            raise _CopyUnsupported()
+    elif not hasattr(os, "copy_file_range"):
+        raise _CopyUnsupported()
+
+    offset = 0
+    while offset < size:
+        if should_stop and should_stop(): raise InterruptedError("STOP")
+        count = min(COPY_BLOCK, size - offset)
+        try:
+            if use_sendfile:
+                n = os.sendfile(fd_out, fd_in, offset, count)
+            else:
+                n = os.copy_file_range(fd_in, fd_out, count, offset, offset)
+        except OSError as e:
+            # 首块即失败说明该方式不可用，回退；中途失败是真正的 IO 错误
+            if offset == 0 and e.errno in _FALLBACK_ERRNOS:
+                raise _CopyUnsupported()
+            raise
+        if n == 0:
+            break
+        offset += n
+        if on_bytes: on_bytes(n)
+    if offset == 0 and size > 0:
+        raise _CopyUnsupported()
+
+
+def _buffered_copy(fd_in, fd_out, on_bytes, should_stop):
+    """通用回退：复用单个大缓冲区的 readinto 循环"""
+    buf = bytearray(COPY_BLOCK)
+    view = memoryview(buf)
+    os.lseek(fd_in, 0, os.SEEK_SET)
+    os.lseek(fd_out, 0, os.SEEK_SET)
+    os.ftruncate(fd_out, 0)
+    with open(fd_in, 'rb', buffering=0, closefd=False) as f_in:
+        while True:
+            if should_stop and should_stop(): raise InterruptedError("STOP")
+            n = f_in.readinto(buf)
+            if not n:
+                break
+            written = 0
+            while written < n:
+                written += os.write(fd_out, view[written:n])
+            if on_bytes: on_bytes(n)
+
+
+def copy_file(src, dst, on_bytes=None, should_stop=None):
+    """
+    复制单个文件并保留元数据。
+    依次尝试: reflink -> copy_file_range -> sendfile -> 缓冲复制
+    返回实际使用的方式名称
+    """
+    size = os.path.getsize(src)
+    fd_in = os.open(src, os.O_RDONLY | getattr(os, "O_BINARY", 0))
+    try:
+        fd_out = os.open(dst, os.O_WRONLY | os.O_CREAT | os.O_TRUNC | getattr(os, "O_BINARY", 0), 0o666)
+        try:
+            method = None
+            try:
+                _reflink(fd_in, fd_out)
+                if on_bytes: on_bytes(size)
+                method = "reflink"
+            except _CopyUnsupported:
+                pass
+
+            for name, use_sendfile in (("copy_file_range", False), ("sendfile", True)):
+                if method: break
+                try:
+                    _kernel_copy(fd_in, fd_out, size, on_bytes, should_stop, use_sendfile)
+                    method = name
+                except _CopyUnsupported:
+                    pass
+
+            if not method:
+                _buffered_copy(fd_in, fd_out, on_bytes, should_stop)
+                method = "buffered"
+        finally:
+            os.close(fd_out)
+    except BaseException:
+        try: os.remove(dst)
+        except OSError: pass
+        raise
+    finally:
+        os.close(fd_in)
+
+    # 元数据必须在删除源文件之前复制
+    shutil.copystat(src, dst)
+    return method
+
+
+def move_file(src, dst, on_bytes=None, should_stop=None):
+    """移动单个文件：同设备原子重命名，跨设备内核拷贝 + 复制元数据 + 删除源"""
+    dst_dir = os.path.dirname(dst)
+    if dst_dir: os.makedirs(dst_dir, exist_ok=True)
+    if os.path.isdir(dst):
+        shutil.rmtree(dst)
+
+    if os.stat(src).st_dev == os.stat(dst_dir or ".").st_dev:
+        size = os.path.getsize(src)
+        os.replace(src, dst)
+        if on_bytes: on_bytes(size)
+        return "rename"
+
+    method = copy_file(src, dst, on_bytes, should_stop)
+    os.remove(src)
+    return method
+
+
+class CopyEngine:
+    """
+    回写复制引擎。
+    文件与目录统一按文件粒度流式处理：目录树被展开为单个文件，
+    在线程池中并行移动，每个分块都上报进度，不存在无进度的长时间阻塞。
+    """
+
+    def __init__(self, workers=COPY_WORKERS, should_stop=None):
+        self.workers = max(1, workers)
+        self.should_stop = should_stop
+        self.methods = {}
+        self._lock = threading.Lock()
+
+    def _count(self, method):
+        with self._lock:
+            self.methods[method] = self.methods.get(method, 0) + 1
+
+    def move(self, src, dst, on_bytes=None):
+        if not os.path.isdir(src):
+            self._count(move_file(src, dst, on_bytes, self.should_stop))
+            return
+
+        # 目录：先建好目录骨架，再并行移动所有文件
+        if os.path.exists(dst) and not os.path.isdir(dst):
+            os.remove(dst)
+        jobs, dirs = [], []
+        for root, _, files in os.walk(src):
+            target_root = os.path.join(dst, os.path.relpath(root, src))
+            os.makedirs(target_root, exist_ok=True)
+            dirs.append((root, target_root))
+            for f in files:
+                jobs.append((os.path.join(root, f), os.path.join(target_root, f)))
+
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            futures = [pool.submit(move_file, s, d, on_bytes, self.should_stop) for s, d in jobs]
+            for fut in futures:
+                self._count(fut.result())
+
+        for root, target_root in reversed(dirs):
+            try: shutil.copystat(root, target_root)
+            except OSError: pass
+        shutil.rmtree(src, ignore_errors=True)
+
+    def summary(self):
+        return ", ".join(f"{k}={v}" for k, v in sorted(self.methods.items()))
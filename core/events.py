@@ -0,0 +1,274 @@
+import os
+import json
+import time
+import glob
+import fnmatch
+from datetime import datetime
+
+from config import DIRS, EVENTS_INDEX_BLOCK, EVENTS_FLUSH_INTERVAL
+
+EVENTS_PREFIX = "Events_"
+EVENTS_SUFFIX = ".jsonl"
+INDEX_SUFFIX = ".idx"
+
+RESULT_OK = "ok"
+RESULT_FAIL = "fail"
+
+
+class EventLog:
+    """
+    批次事件流 (JSON Lines，与文本日志并存)：每个文件的处理结果一条记录，
+    {"ts", "job", "op", "path", "bytes", "duration", "result", "out" / "error"}，
+    另有任务开始 / 结束记录 {"ts", "job", "event": "start" / "end", ...}。
+    每 EVENTS_INDEX_BLOCK 条记录在 .idx 中追加一条稀疏索引 (字节范围、时间范围、文件数 / 失败数)，
+    查询时只读取索引命中的数据块。
+    """
+
+    def __init__(self, events_dir, job, is_encrypt):
+        os.makedirs(events_dir, exist_ok=True)
+        self.job = job
+        self.op = "encrypt" if is_encrypt else "decrypt"
+        self.path = os.path.join(events_dir, f"{EVENTS_PREFIX}{job}{EVENTS_SUFFIX}")
+        # 二进制追加：偏移量即字节位置 (恢复任务继续写入同一文件)
+        self._fh = open(self.path, 'ab')
+        self._idx = open(self.path[:-len(EVENTS_SUFFIX)] + INDEX_SUFFIX, 'a', encoding='utf-8')
+        self.offset = self._fh.tell()
+        if self.offset:
+            # 上次写入中断留下的残行：补一个换行，避免与新记录粘连
+            with open(self.path, 'rb') as f:
+                f.seek(-1, os.SEEK_END)
+                if f.read(1) != b"\n":
+                    self._fh.write(b"\n")
+                    self.offset += 1
+        self._buf = []
+        self._index_buf = []
+        self._block = None
+        if self.offset:
+            self._index_tail()
+        self._last_flush = time.monotonic()
+        self._started = time.monotonic()
+        self.counts = {RESULT_OK: 0, RESULT_FAIL: 0}
+
+    def _index_tail(self):
+        """
+        恢复任务：崩溃前尚未写入索引的记录补建一个索引块。
+        新记录从文件末尾开始建块，不补建的话查询只读索引范围与最后一块之后，这部分会被跳过
+        """
+        _, tail = read_index(self.path)
+        if tail >= self.offset:
+            return
+        block = None
+        with open(self.path, 'rb') as f:
+            for rec in _read_range(f, tail, self.offset):
+                ts = rec.get("ts", 0)
+                if block is None:
+                    block = {"off": tail, "end": self.offset, "n": 0, "t0": ts, "t1": ts, "files": 0, "fail": 0}
+                block["n"] += 1
+                block["t0"] = min(block["t0"], ts)
+                block["t1"] = max(block["t1"], ts)
+                if "result" in rec:
+                    block["files"] += 1
+                    block["fail"] += rec["result"] == RESULT_FAIL
+        if block:
+            self._idx.write(json.dumps(block) + "\n")
+            self._idx.flush()
+
+    def _append(self, record):
+        line = (json.dumps(record, ensure_ascii=False) + "\n").encode('utf-8')
+        ts = record["ts"]
+        block = self._block
+        if block is None:
+            block = self._block = {"off": self.offset, "end": self.offset, "n": 0, "t0": ts, "t1": ts,
+                                   "files": 0, "fail": 0}
+        self._buf.append(line)
+        self.offset += len(line)
+        block["end"] = self.offset
+        block["n"] += 1
+        block["t1"] = ts
+        if "result" in record:
+            block["files"] += 1
+            block["fail"] += record["result"] == RESULT_FAIL
+        if block["n"] >= EVENTS_INDEX_BLOCK:
+            self._close_block()
+
+    def _close_block(self):
+        if self._block:
+            self._index_buf.append(json.dumps(self._block) + "\n")
+            self._block = None
+
+    # ---------- 记录 ----------
+    def start(self, files, options=None):
+        self._append({"ts": round(time.time(), 3), "job": self.job, "event": "start", "op": self.op,
+                      "inputs": len(files), "options": options or {}})
+        self.flush(force=True)
+
+    def file(self, path, success, detail, size=None, duration=None):
+        result = RESULT_OK if success else RESULT_FAIL
+        self.counts[result] += 1
+        record = {"ts": round(time.time(), 3), "job": self.job, "op": self.op, "path": path,
+                  "bytes": size, "duration": None if duration is None else round(duration, 4), "result": result}
+        record["out" if success else "error"] = detail
+        self._append(record)
+
+    def flush(self, force=False):
+        """每轮调度调用：至多每 EVENTS_FLUSH_INTERVAL 秒写出一次 (数据先于索引写出)"""
+        if not self._buf or (not force and time.monotonic() - self._last_flush < EVENTS_FLUSH_INTERVAL):
+            return
+        self._fh.write(b"".join(self._buf))
+        self._fh.flush()
+        self._buf.clear()
+        if self._index_buf:
+            self._idx.write("".join(self._index_buf))
+            self._idx.flush()
+            self._index_buf.clear()
+        self._last_flush = time.monotonic()
+
+    def close(self, status):
+        self._append({"ts": round(time.time(), 3), "job": self.job, "event": "end", "status": status,
+                      "success": self.counts[RESULT_OK], "fail": self.counts[RESULT_FAIL],
+                      "elapsed": round(time.monotonic() - self._started, 3)})
+        self._close_block()
+        self.flush(force=True)
+        self._fh.close()
+        self._idx.close()
+
+
+# ================= 查询 =================
+def parse_time(text):
+    """
+    时间参数 -> 时间戳：'2026-10-18 22:00' / '2026-10-18T22:00:05' / '2026-10-18'，
+    或相对当前时间的 '30m' / '12h' / '2d'。
+    """
+    text = text.strip()
+    units = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+    if text[-1:].lower() in units and text[:-1].replace(".", "", 1).isdigit():
+        return time.time() - float(text[:-1]) * units[text[-1].lower()]
+    for fmt in ("%Y-%m-%d %H:%M:%S", "%Y-%m-%dT%H:%M:%S", "%Y-%m-%d %H:%M", "%Y-%m-%dT%H:%M", "%Y-%m-%d"):
+        try:
+            return datetime.strptime(text, fmt).timestamp()
+        except ValueError:
+            continue
+    raise ValueError(f"无法识别的时间: {text}")
+
+
+def event_logs(events_dir=None, job=None):
+    """[(任务 ID, 事件文件路径)]，按任务 ID (即开始时间) 排序；job 支持通配符"""
+    events_dir = events_dir or DIRS["EVENTS"]
+    logs = []
+    for path in sorted(glob.glob(os.path.join(events_dir, f"{EVENTS_PREFIX}*{EVENTS_SUFFIX}"))):
+        job_id = os.path.basename(path)[len(EVENTS_PREFIX):-len(EVENTS_SUFFIX)]
+        if job is None or fnmatch.fnmatchcase(job_id, job):
+            logs.append((job_id, path))
+    return logs
+
+
+def read_index(path):
+    """读取事件文件的稀疏索引：返回 (数据块列表, 未建索引部分的起始偏移)"""
+    blocks = []
+    try:
+        with open(path[:-len(EVENTS_SUFFIX)] + INDEX_SUFFIX, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    blocks.append(json.loads(line))
+                except ValueError:
+                    break  # 写入中断的残行
+    except OSError:
+        pass
+    return blocks, (blocks[-1]["end"] if blocks else 0)
+
+
+def _block_matches(block, status, since, until):
+    if since is not None and block["t1"] < since:
+        return False
+    if until is not None and block["t0"] > until:
+        return False
+    if status == RESULT_FAIL and not block["fail"]:
+        return False
+    if status == RESULT_OK and block["fail"] >= block["files"]:
+        return False
+    return True
+
+
+def _read_range(f, start, end=None):
+    f.seek(start)
+    pos = start
+    for line in f:
+        pos += len(line)
+        if not line.endswith(b"\n"):
+            return  # 仍在写入的末行
+        try:
+            yield json.loads(line)
+        except ValueError:
+            pass
+        if end is not None and pos >= end:
+            return
+
+
+def query(events_dir=None, job=None, status=None, since=None, until=None, path=None, include_jobs=False):
+    """
+    流式查询事件 (生成器，不整体载入文件)：
+    job 任务 ID (支持通配符)、status "ok"/"fail"、since/until 时间戳、path 路径通配符；
+    include_jobs=True 时同时返回任务开始 / 结束记录。
+    """
+    for _, log_path in event_logs(events_dir, job):
+        blocks, tail = read_index(log_path)
+        ranges = [(b["off"], b["end"]) for b in blocks if _block_matches(b, status, since, until)]
+        ranges.append((tail, None))
+        try:
+            f = open(log_path, 'rb')
+        except OSError:
+            continue
+        with f:
+            for start, end in ranges:
+                for rec in _read_range(f, start, end):
+                    ts = rec.get("ts", 0)
+                    if (since is not None and ts < since) or (until is not None and ts > until):
+                        continue
+                    if "event" in rec:
+                        if include_jobs and status is None and path is None:
+                            yield rec
+                        continue
+                    if status and rec.get("result") != status:
+                        continue
+                    if path and not fnmatch.fnmatchcase(rec.get("path", ""), path):
+                        continue
+                    yield rec
+
+
+def _last_record(f):
+    """文件最后一条完整记录 (从末尾读取，不扫描整个文件)"""
+    size = f.seek(0, os.SEEK_END)
+    f.seek(max(0, size - 64 * 1024))
+    lines = [line for line in f.read().split(b"\n")[:-1] if line]
+    try:
+        return json.loads(lines[-1]) if lines else None
+    except ValueError:
+        return None
+
+
+def job_summaries(events_dir=None, job=None):
+    """各任务概况：文件数 / 失败数由索引累计，只读取首行、未建索引的尾部与最后一条记录"""
+    for job_id, log_path in event_logs(events_dir, job):
+        blocks, tail = read_index(log_path)
+        summary = {"job": job_id, "path": log_path, "op": None, "start": None, "end": None, "status": None,
+                   "files": sum(b["files"] for b in blocks), "fail": sum(b["fail"] for b in blocks)}
+        try:
+            with open(log_path, 'rb') as f:
+                first = f.readline()
+                if first.endswith(b"\n"):
+                    rec = json.loads(first)
+                    summary["op"] = rec.get("op")
+                    summary["start"] = rec.get("ts")
+                for rec in _read_range(f, tail):
+                    if "result" in rec:
+                        summary["files"] += 1
+                        summary["fail"] += rec["result"] == RESULT_FAIL
+                last = _last_record(f)
+        except (OSError, ValueError):
+            continue
+        if last:
+            summary["end"] = last.get("ts")
+            # 最后一条不是结束记录：任务仍在运行或异常中断
+            if last.get("event") == "end":
+                summary["status"] = last.get("status")
+        yield summary
@@ -1,4 +1,6 @@
 import os
+import glob
+import time
 import struct
 import uuid
 import shutil
@@ -6,21 +8,116 @@ from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
 from cryptography.hazmat.backends import default_backend
 from cryptography.hazmat.primitives import padding
 
+from config import CHUNK_SIZES
+
+PART_SUFFIX = ".part"
+# controller.is_fenced() 为真时放弃输出返回的消息 (集群认领已被其他节点回收)
+MSG_FENCED = "认领已失效"
+
+# 独占创建 (已存在时失败)；权限 0666 由进程 umask 裁剪，与直接 open 创建的文件一致
+_PART_FLAGS = os.O_CREAT | os.O_EXCL | os.O_WRONLY | getattr(os, "O_BINARY", 0)
+
+
+def part_pattern(target_path):
+    """目标文件对应的临时文件通配符 (glob，用于清理中断任务的残留)"""
+    return glob.escape(target_path) + ".*" + PART_SUFFIX
+
 
 class FileCipherEngine:
+    # 每个分块在循环中同时存活的缓冲份数：读入块 + 填充副本 + 密文输出
+    BUFFERS_PER_CHUNK = 3
 
-    def _get_smart_chunk_size(self, file_size):
-        """根据文件大小智能调整分块大小"""
+    @staticmethod
+    def _get_smart_chunk_size(file_size, max_chunk=None):
+        """根据文件大小智能调整分块大小 (max_chunk 为内存预算授予的上限)"""
         if file_size < 100 * 1024 * 1024:
-            return 1 * 1024 * 1024
+            chunk = CHUNK_SIZES["MEDIUM"]
         elif file_size < 2 * 1024 * 1024 * 1024:
-            return 10 * 1024 * 1024
+            chunk = CHUNK_SIZES["LARGE"]
         else:
-            return 64 * 1024 * 1024
+            chunk = CHUNK_SIZES["HUGE"]
+        if max_chunk:
+            chunk = max(min(chunk, max_chunk), CHUNK_SIZES["SMALL"])
+        return chunk
+
+    @staticmethod
+    def estimate_buffer_bytes(chunk_size):
+        """估算单个任务的在途缓冲内存"""
+        return chunk_size * FileCipherEngine.BUFFERS_PER_CHUNK
+
+    @staticmethod
+    def read_header(file_path, key_bytes):
+        """
+        只读取并解析加密文件头 (不解密内容)。
+        返回 (原文件名, 原文件大小)；文件头损坏或密钥错误时抛出 ValueError
+        """
+        with open(file_path, 'rb') as f_in:
+            iv = f_in.read(16)
+            name_len_bytes = f_in.read(4)
+            if len(iv) < 16 or len(name_len_bytes) < 4:
+                raise ValueError("文件头损坏")
+            name_len = struct.unpack('>I', name_len_bytes)[0]
+            if name_len == 0 or name_len % 16 or name_len > 4096:
+                raise ValueError("文件头损坏(Len)")
+            enc_fname_data = f_in.read(name_len)
+            size_bytes = f_in.read(8)
+            if len(enc_fname_data) < name_len or len(size_bytes) < 8:
+                raise ValueError("文件头损坏")
+
+        try:
+            name_dec = Cipher(algorithms.AES(key_bytes), modes.CBC(iv), backend=default_backend()).decryptor()
+            name_unpad = padding.PKCS7(128).unpadder()
+            dec_name_bytes = name_dec.update(enc_fname_data) + name_dec.finalize()
+            orig_name = (name_unpad.update(dec_name_bytes) + name_unpad.finalize()).decode('utf-8')
+        except ValueError:
+            raise ValueError("密钥错误")
+        if not orig_name or os.sep in orig_name or (os.altsep and os.altsep in orig_name):
+            raise ValueError("密钥错误")
+        return orig_name, struct.unpack('>Q', size_bytes)[0]
+
+    @staticmethod
+    def _create_part(target_path):
+        """
+        在目标目录创建本任务独占的临时文件 <目标名>.<随机>.part，返回 (路径, 写入句柄)。
+        多个任务写同一目标 (监视模式重复触发 / 集群重新认领) 时互不截断对方的数据。
+        """
+        while True:
+            part_path = f"{target_path}.{uuid.uuid4().hex[:12]}{PART_SUFFIX}"
+            try:
+                fd = os.open(part_path, _PART_FLAGS, 0o666)
+                break
+            except FileExistsError:
+                continue
+        try:
+            return part_path, os.fdopen(fd, 'wb')
+        except BaseException:
+            os.close(fd)
+            os.remove(part_path)
+            raise
+
+    def _commit_part(self, part_path, final_out_path, controller):
+        """
+        临时文件原子重命名为最终输出，返回是否已提交。
+        controller.is_fenced() 为真 (本节点的认领已被回收，其他节点会重新处理) 时丢弃临时文件，不覆盖输出。
+        """
+        fenced = getattr(controller, "is_fenced", None)
+        if fenced and fenced():
+            self._remove_part(part_path)
+            return False
+        os.replace(part_path, final_out_path)
+        return True
+
+    @staticmethod
+    def _remove_part(part_path):
+        if part_path and os.path.exists(part_path):
+            try: os.remove(part_path)
+            except: pass
 
     def process_file_direct(self, file_path, target_path, key_bytes, is_encrypt, encrypt_filename=False, callback=None,
-                            controller=None):
+                            controller=None, chunk_size=None, keep_target_name=False, probe=None):
         final_out_path = target_path
+        # 先写入同目录下的临时 .part 文件，完成后原子重命名：崩溃残留的只会是 .part，不会被误认为完整输出
+        part_path = None
 
         try:
             if not os.path.exists(file_path):
@@ -31,7 +128,13 @@ class FileCipherEngine:
                 os.makedirs(target_dir, exist_ok=True)
 
             file_size = os.path.getsize(file_path)
-            chunk_size = self._get_smart_chunk_size(file_size)
+            chunk_size = self._get_smart_chunk_size(file_size, chunk_size)
+            # 可选的限速钩子 (令牌桶)，与停止/挂起检查一起在读写循环中调用；
+            # chunk_limit() 返回当前的单次读取上限 (运行中开启限速后改用小块，None 表示不限)
+            throttle = getattr(controller, "throttle", None)
+            chunk_limit = getattr(controller, "chunk_limit", None)
+            # probe.span(阶段, 开始, 结束, 字节数)：读取 / 加解密 / 写入分阶段计时 (core.metrics.FileStats)
+            clock = time.perf_counter
 
             # ================= 加密模式 =================
             if is_encrypt:
@@ -56,7 +159,8 @@ class FileCipherEngine:
                 enc_fname_data = name_enc.update(name_pad.update(fname_bytes)) + name_enc.update(
                     name_pad.finalize()) + name_enc.finalize()
 
-                with open(file_path, 'rb') as f_in, open(final_out_path, 'wb') as f_out:
+                part_path, f_out = self._create_part(target_path)
+                with f_out, open(file_path, 'rb') as f_in:
                     # 写入文件头: IV(16) + NameLen(4) + EncNameBytes(...) + OriginSize(8)
                     f_out.write(iv)
                     f_out.write(struct.pack('>I', len(enc_fname_data)))
@@ -69,16 +173,27 @@ class FileCipherEngine:
                             if controller.is_stop_requested(): raise InterruptedError("STOP")
                             controller.wait_if_paused()
 
-                        chunk = f_in.read(chunk_size)
+                        t0 = clock()
+                        chunk = f_in.read(min(chunk_size, chunk_limit() or chunk_size) if chunk_limit else chunk_size)
+                        if probe: probe.span("read", t0, clock(), len(chunk))
                         if not chunk:
                             final = encryptor.update(padder.finalize()) + encryptor.finalize()
                             f_out.write(final)
                             break
 
-                        f_out.write(encryptor.update(padder.update(chunk)))
+                        if throttle: throttle(len(chunk))
+                        t1 = clock()
+                        data = encryptor.update(padder.update(chunk))
+                        t2 = clock()
+                        f_out.write(data)
+                        if probe:
+                            probe.span("cipher", t1, t2, len(chunk))
+                            probe.span("write", t2, clock(), len(data))
                         processed += len(chunk)
                         if callback: callback(processed, file_size)
 
+                if not self._commit_part(part_path, final_out_path, controller):
+                    return False, MSG_FENCED, ""
                 return True, "加密成功", final_out_path
 
             # ================= 解密模式 =================
@@ -107,7 +222,9 @@ class FileCipherEngine:
                             return False, "密钥错误", ""
 
                         # 【核心】忽略传入的 target_path 文件名，强制恢复原名
-                        final_out_path = os.path.join(target_dir, orig_name)
+                        # (预检已解决重名时 keep_target_name=True，使用预检确定的文件名)
+                        if not keep_target_name:
+                            final_out_path = os.path.join(target_dir, orig_name)
 
                         # 4. 读取原始大小 (跳过)
                         f_in.read(8)
@@ -123,37 +240,50 @@ class FileCipherEngine:
                         if data_size <= 0: data_size = 1
 
                         processed = 0
-                        with open(final_out_path, 'wb') as f_out:
+                        part_path, f_out = self._create_part(target_path)
+                        with f_out:
                             while True:
                                 if controller:
                                     if controller.is_stop_requested(): raise InterruptedError("STOP")
                                     controller.wait_if_paused()
 
-                                chunk = f_in.read(chunk_size)
+                                t0 = clock()
+                                chunk = f_in.read(min(chunk_size, chunk_limit() or chunk_size)
+                                                  if chunk_limit else chunk_size)
+                                if probe: probe.span("read", t0, clock(), len(chunk))
                                 if not chunk:
                                     final = unpadder.update(decryptor.finalize()) + unpadder.finalize()
                                     f_out.write(final)
                                     break
 
-                                f_out.write(unpadder.update(decryptor.update(chunk)))
+                                if throttle: throttle(len(chunk))
+                                t1 = clock()
+                                data = unpadder.update(decryptor.update(chunk))
+                                t2 = clock()
+                                f_out.write(data)
+                                if probe:
+                                    probe.span("cipher", t1, t2, len(chunk))
+                                    probe.span("write", t2, clock(), len(data))
                                 processed += len(chunk)
                                 if callback: callback(processed, data_size)
 
                     except ValueError:
+                        self._remove_part(part_path)
                         return False, "数据损坏或填充错误", ""
+                    except InterruptedError:
+                        raise
                     except Exception as e:
+                        self._remove_part(part_path)
                         return False, f"解密异常: {str(e)}", ""
 
+                if not self._commit_part(part_path, final_out_path, controller):
+                    return False, MSG_FENCED, ""
                 return True, "解密成功", final_out_path
 
         except InterruptedError:
-            if os.path.exists(final_out_path):
-                try: os.remove(final_out_path)
-                except: pass
+            self._remove_part(part_path)
             return False, "用户停止", ""
 
         except Exception as e:
-            if os.path.exists(final_out_path):
-                try: os.remove(final_out_path)
-                except: pass
+            self._remove_part(part_path)
             return False, str(e), ""
\ No newline at end of file
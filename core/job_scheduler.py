@@ -0,0 +1,304 @@
+import os
+import itertools
+import threading
+
+from config import JOB_PRIORITY_WEIGHTS, MEMORY_BUDGET
+
+# 加密引擎与多进程模块延迟到首次提交任务时导入 (界面启动时不加载，见 preload)
+
+QUEUED = "QUEUED"
+STARTING = "STARTING"
+RUNNING = "RUNNING"
+DRAINING = "DRAINING"
+DONE = "DONE"
+
+
+class Job:
+    """调度器中的一个批处理任务 (各自的密钥与选项)"""
+
+    def __init__(self, job_id, name, priority, runner, on_finished=None):
+        self.id = job_id
+        self.name = name
+        self.priority = priority if priority in JOB_PRIORITY_WEIGHTS else "NORMAL"
+        self.weight = JOB_PRIORITY_WEIGHTS[self.priority]
+        self.runner = runner
+        self.on_finished = on_finished or (lambda results: None)
+
+        self.state = QUEUED
+        self.paused = False
+        self.quota = 0
+        # 有待启动任务但用不满配额 (暂存/内存/预读限制)，多出的份额让给其他任务
+        self.blocked = False
+        self.results = None
+        # setup() 在独立线程中执行 (扫描 / 任务日志 / 暂存区准备不阻塞调度线程)
+        self.setup_thread = None
+        self.setup_error = None
+        # 共用的暂存盘总账 (JobScheduler._stage_pools 的键)
+        self.stage_key = None
+
+    @property
+    def in_flight(self):
+        return self.runner.controller.in_flight if self.state in (RUNNING, DRAINING) else 0
+
+    @property
+    def wants_more(self):
+        if self.state in (QUEUED, STARTING):
+            return True
+        return self.state == RUNNING and self.runner.controller.has_pending and not self.blocked
+
+    def __repr__(self):
+        return f"#{self.id} {self.name}"
+
+
+class JobScheduler:
+    """
+    多任务调度器：多个批处理任务共用一个进程池。
+    1. 各任务按优先级权重加权公平分配进程池槽位 (water-filling)，用不满的份额让给其他任务
+    2. 不抢占已开始的文件：高优先级任务提交后，低优先级任务的文件处理完即让出槽位
+    3. 支持单个任务的挂起 / 继续 / 终止，挂起任务不占用槽位
+    4. 各任务共用一份内存预算，使用同一块 SSD 暂存的任务共用该盘的容量总账
+    """
+    POLL_INTERVAL = 0.05
+
+    def __init__(self, slots=None, log=None):
+        # 与单任务一致：按 CPU 数配置，SSD 模式至少 4 个 (各任务自身的 max_total 仍按模式限制)
+        self.slots = max(1, slots or max(os.cpu_count() or 1, 4))
+        self.log = log or (lambda msg: None)
+        self.jobs = []
+
+        self._incoming = []
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._closed = False
+        self._thread = None
+        self._manager = None
+        # 缓冲内存预算按进程池槽位均分 (首次提交任务时创建)；暂存盘总账: st_dev -> [StagingArea, 使用中的任务数]
+        self.budget = None
+        self._stage_pools = {}
+
+    # ---------- 对外接口 (任意线程调用) ----------
+    def submit(self, files, key, is_encrypt, priority="NORMAL", name=None, on_finished=None, **options):
+        """提交批处理任务，返回 Job；options 同 BatchRunner (含 on_progress/on_log/on_result 回调)"""
+        self._ensure_started()
+        from core.batch_runner import BatchRunner
+        from core.memory_budget import MemoryBudget
+        with self._lock:
+            if self.budget is None:
+                self.budget = MemoryBudget(MEMORY_BUDGET, self.slots)
+        # 单独指定内存预算的任务按自身预算运行
+        if options.get("memory_budget") is None:
+            options["budget"] = self.budget
+        stage_key = None
+        if options.get("use_ssd") and options.get("ssd_dir"):
+            stage_key, options["stage_pool"] = self._acquire_stage_pool(options["ssd_dir"])
+        runner = BatchRunner(files, key, is_encrypt, manager=self._manager, **options)
+        # 进程池多开了一倍进程，超出配额预先提交的任务会立即执行而不是排队：槽位只按配额分配
+        runner.submit_ahead = 0
+        with self._lock:
+            job_id = next(self._ids)
+            job = Job(job_id, name or f"{'加密' if is_encrypt else '解密'}任务{job_id}", priority, runner, on_finished)
+            job.stage_key = stage_key
+            self._incoming.append(job)
+        self._wake.set()
+        return job
+
+    def pause(self, job):
+        job.paused = True
+        job.runner.pause()
+
+    def resume(self, job):
+        job.paused = False
+        job.runner.resume()
+
+    def stop(self, job):
+        if job.paused: self.resume(job)
+        job.runner.stop()
+
+    def set_rate_limit(self, job, bytes_per_sec):
+        """运行中调整任务限速 (0/None 取消)"""
+        job.runner.set_rate_limit(bytes_per_sec)
+
+    def active_jobs(self):
+        with self._lock:
+            return [j for j in self.jobs + self._incoming if j.state != DONE]
+
+    def close(self):
+        """终止所有任务并关闭进程池"""
+        for job in self.active_jobs():
+            self.stop(job)
+        self._closed = True
+        self._wake.set()
+        if self._thread:
+            self._thread.join()
+            self._thread = None
+
+    # ---------- 共用资源 ----------
+    def _acquire_stage_pool(self, ssd_dir):
+        """同一块暂存盘上的任务共用一个容量总账，返回 (键, 总账)；无法访问时返回 (None, None)"""
+        from core.staging import StagingArea
+        try:
+            dev = os.stat(ssd_dir).st_dev
+        except OSError:
+            return None, None
+        with self._lock:
+            entry = self._stage_pools.get(dev)
+            if entry is None:
+                try:
+                    entry = self._stage_pools[dev] = [StagingArea.for_device(ssd_dir), 0]
+                except OSError:
+                    return None, None
+            entry[1] += 1
+            return dev, entry[0]
+
+    def _release_stage_pool(self, key):
+        """最后一个使用者结束时丢弃总账 (下次按当时的剩余空间重新建立)"""
+        if key is None:
+            return
+        with self._lock:
+            entry = self._stage_pools.get(key)
+            if entry is not None:
+                entry[1] -= 1
+                if entry[1] <= 0:
+                    del self._stage_pools[key]
+
+    # ---------- 调度线程 ----------
+    def _ensure_started(self):
+        with self._lock:
+            if self._thread is not None:
+                return
+            # 通信 Manager 由所有任务共用，只启动一次
+            if self._manager is None:
+                from multiprocessing.managers import SyncManager
+                from core.batch_runner import _ignore_sigint
+                self._manager = SyncManager()
+                self._manager.start(_ignore_sigint)
+            self._closed = False
+            self._thread = threading.Thread(target=self._loop, name="JobScheduler", daemon=True)
+            self._thread.start()
+
+    def _loop(self):
+        from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+        from core.batch_runner import _ignore_sigint
+        # 进程数多于槽位：挂起任务的文件会阻塞所在进程，不能因此耗尽进程池
+        with ProcessPoolExecutor(max_workers=self.slots * 2, initializer=_ignore_sigint) as pool:
+            while True:
+                with self._lock:
+                    self.jobs.extend(self._incoming)
+                    self._incoming.clear()
+                    jobs = list(self.jobs)
+                if not jobs:
+                    if self._closed:
+                        break
+                    self._wake.wait()
+                    self._wake.clear()
+                    continue
+
+                self._assign_quotas(jobs)
+                # 高优先级任务先补充任务，同一轮内优先拿到空出的槽位
+                for job in sorted(jobs, key=lambda j: (-j.weight, j.id)):
+                    self._step(job, pool)
+
+                with self._lock:
+                    self.jobs = [j for j in self.jobs if j.state != DONE]
+                # 任一任务的文件处理完即进入下一轮补充槽位；没有在途文件时等待新任务 / setup 完成或定时轮询
+                running = [f for j in jobs if j.state in (RUNNING, DRAINING) for f in j.runner.running if not f.done()]
+                if running:
+                    wait(running, timeout=self.POLL_INTERVAL, return_when=FIRST_COMPLETED)
+                elif self._wake.wait(self.POLL_INTERVAL):
+                    self._wake.clear()
+
+        self._manager.shutdown()
+        self._manager = None
+
+    def _setup(self, job):
+        try:
+            job.runner.setup()
+        except Exception as e:
+            job.setup_error = e
+        finally:
+            self._wake.set()
+
+    def _step(self, job, pool):
+        runner = job.runner
+        try:
+            if job.state == QUEUED:
+                job.state = STARTING
+                job.setup_thread = threading.Thread(target=self._setup, args=(job,),
+                                                    name=f"JobSetup-{job.id}", daemon=True)
+                job.setup_thread.start()
+
+            if job.state == STARTING:
+                if job.setup_thread.is_alive():
+                    return
+                if job.setup_error is not None:
+                    raise job.setup_error
+                job.state = RUNNING
+                runner.on_log(f"📋 [调度] 任务 {job} 开始 (优先级 {job.priority})")
+
+            if job.state == RUNNING:
+                runner.controller.quota = 0 if job.paused else job.quota
+                if runner.step(pool):
+                    job.blocked = runner.controller.has_pending and runner.controller.in_flight < job.quota
+                else:
+                    job.state = DRAINING
+
+            if job.state == DRAINING and runner.drain():
+                job.results = runner.finish()
+                self._done(job)
+        except Exception as e:
+            # 单个任务出错不影响其他任务
+            runner.on_log(f"❌ [调度] 任务 {job} 异常终止: {e}")
+            runner.stop()
+            runner.release_shared()
+            job.results = runner.results
+            self._done(job)
+
+    def _done(self, job):
+        job.state = DONE
+        self._release_stage_pool(job.stage_key)
+        job.on_finished(job.results)
+
+    def _assign_quotas(self, jobs):
+        """加权注水分配：需求有限的任务先按实际需求满足，剩余槽位按权重分给其余任务"""
+        remaining = self.slots
+        todo = []
+        for job in jobs:
+            job.quota = 0
+            if job.paused or job.state == DONE:
+                continue
+            if job.state == DRAINING:
+                remaining -= job.in_flight
+                continue
+            todo.append(job)
+        remaining = max(remaining, 0)
+
+        caps = {job.id: float("inf") if job.wants_more else job.in_flight for job in todo}
+        while todo:
+            total_w = sum(j.weight for j in todo)
+            fixed = [j for j in todo if caps[j.id] <= remaining * j.weight / total_w]
+            if not fixed:
+                break
+            for j in fixed:
+                j.quota = caps[j.id]
+                remaining -= j.quota
+                todo.remove(j)
+
+        if todo:
+            total_w = sum(j.weight for j in todo)
+            # 槽位够分时每个任务至少 1 个：按权重取整可能让低优先级任务在整个运行期间拿不到槽位
+            base = 1 if remaining >= len(todo) else 0
+            share = remaining - base * len(todo)
+            for j in todo:
+                j.quota = base + int(share * j.weight / total_w)
+            # 取整剩下的槽位优先给高权重任务
+            leftover = remaining - sum(j.quota for j in todo)
+            for j in sorted(todo, key=lambda j: (-j.weight, j.id))[:leftover]:
+                j.quota += 1
+
+
+def preload():
+    """预先导入加密引擎与多进程模块 (界面显示后在后台线程调用，首次提交任务时无需再等待)"""
+    import concurrent.futures.process
+    import multiprocessing.managers
+    import core.batch_runner
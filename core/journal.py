@@ -0,0 +1,303 @@
+import os
+import json
+import time
+import uuid
+import hashlib
+from datetime import datetime
+
+from config import DIRS, JOURNAL_FSYNC_INTERVAL, JOURNAL_KEEP
+
+JOURNAL_VERSION = 1
+JOURNAL_SUFFIX = ".jsonl"
+LOCK_SUFFIX = ".lock"
+
+# 结束状态：finished 正常完成 / stopped 用户终止 / abandoned 放弃恢复
+STATUS_FINISHED = "finished"
+STATUS_STOPPED = "stopped"
+STATUS_ABANDONED = "abandoned"
+
+# 可序列化、恢复时需要原样还原的 BatchRunner 选项
+JOURNAL_OPTIONS = ("encrypt_filename", "custom_out_dir", "keep_structure", "encrypt_dirname",
+                   "use_ssd", "ssd_dir", "memory_budget", "base_dir", "preflight", "on_collision",
+                   "nice", "io_priority", "rate_limit", "delete_source", "wipe")
+
+
+def key_check(key):
+    """密钥校验值 (不可逆，恢复时确认密码一致；日志中不保存密钥本身)"""
+    inner = hashlib.sha256(key.encode()).digest()
+    return hashlib.sha256(b"journal-key-check:" + inner).hexdigest()[:16]
+
+
+class JobLock:
+    """
+    任务运行期间持有的独占锁 (日志旁的 Job_<ID>.lock，flock / msvcrt)。
+    进程退出或崩溃时由系统释放；其他进程 (CLI / 定时任务 / 界面) 据此判断任务仍在运行，不提供恢复。
+    """
+
+    def __init__(self, journal_path):
+        self.path = journal_path[:-len(JOURNAL_SUFFIX)] + LOCK_SUFFIX
+        self._fh = None
+
+    def acquire(self):
+        fh = open(self.path, 'a+b')
+        try:
+            fh.seek(0)
+            if os.name == "nt":
+                import msvcrt
+                msvcrt.locking(fh.fileno(), msvcrt.LK_NBLCK, 1)
+            else:
+                import fcntl
+                fcntl.flock(fh.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            fh.close()
+            return False
+        self._fh = fh
+        return True
+
+    def release(self):
+        if self._fh is None:
+            return
+        try:
+            if os.name == "nt":
+                import msvcrt
+                self._fh.seek(0)
+                msvcrt.locking(self._fh.fileno(), msvcrt.LK_UNLCK, 1)
+        except OSError:
+            pass
+        self._fh.close()
+        self._fh = None
+
+
+def is_running(journal_path):
+    """日志对应的任务是否正被某个进程执行 (锁被占用)"""
+    lock = JobLock(journal_path)
+    try:
+        if not lock.acquire():
+            return True
+    except OSError:
+        return False
+    lock.release()
+    return False
+
+
+class BatchJournal:
+    """
+    批处理日志 (追加写入的 JSON Lines)。
+    记录计划任务、暂存输出与完成结果；每轮调度刷新一次，
+    至多每 JOURNAL_FSYNC_INTERVAL 秒 fsync 一次，主机掉电最多丢失这段时间内的记录。
+    """
+
+    def __init__(self, path, job_id):
+        self.path = path
+        self.job_id = job_id
+        self.lock = JobLock(path)
+        if not self.lock.acquire():
+            raise RuntimeError(f"任务 {job_id} 正在其他进程中运行")
+        try:
+            self._fh = open(path, 'a', encoding='utf-8')
+        except OSError:
+            self.lock.release()
+            raise
+        self._last_sync = time.monotonic()
+        self._dirty = False
+
+    @classmethod
+    def create(cls, journal_dir, files, key, is_encrypt, options):
+        os.makedirs(journal_dir, exist_ok=True)
+        job_id = datetime.now().strftime("%Y%m%d_%H%M%S_") + uuid.uuid4().hex[:6]
+        journal = cls(os.path.join(journal_dir, f"Job_{job_id}{JOURNAL_SUFFIX}"), job_id)
+        journal.write({"t": "job", "v": JOURNAL_VERSION, "id": job_id, "created": time.time(),
+                       "is_encrypt": is_encrypt, "files": list(files), "key_check": key_check(key),
+                       "options": {k: options.get(k) for k in JOURNAL_OPTIONS}})
+        journal.flush(force=True)
+        return journal
+
+    @classmethod
+    def reopen(cls, state):
+        """继续写入未完成任务的日志"""
+        journal = cls(state.path, state.job_id)
+        journal.write({"t": "resume", "at": time.time()})
+        journal.flush(force=True)
+        return journal
+
+    # ---------- 记录 ----------
+    def write(self, record):
+        self._fh.write(json.dumps(record, ensure_ascii=False) + "\n")
+        self._dirty = True
+
+    def plan(self, src, size, target):
+        self.write({"t": "plan", "src": src, "size": size, "target": target})
+
+    def stage(self, root):
+        self.write({"t": "stage", "root": root})
+
+    def staged(self, src, staged, dst):
+        self.write({"t": "staged", "src": src, "staged": staged, "dst": dst})
+
+    def done(self, src, out):
+        self.write({"t": "done", "src": src, "out": out})
+
+    def fail(self, src, err):
+        self.write({"t": "fail", "src": src, "err": err})
+
+    def flush(self, force=False):
+        if not self._dirty or self._fh.closed:
+            return
+        self._fh.flush()
+        now = time.monotonic()
+        if force or now - self._last_sync >= JOURNAL_FSYNC_INTERVAL:
+            try: os.fsync(self._fh.fileno())
+            except OSError: pass
+            self._last_sync = now
+            self._dirty = False
+
+    def close(self, status):
+        if self._fh.closed:
+            return
+        self.write({"t": "end", "status": status, "at": time.time()})
+        self.flush(force=True)
+        self._fh.close()
+        self.lock.release()
+
+
+class JournalState:
+    """从日志文件重建的任务状态"""
+
+    def __init__(self, path):
+        self.path = path
+        self.job_id = None
+        self.created = 0
+        self.is_encrypt = True
+        self.files = []
+        self.options = {}
+        self.key_check = None
+        self.status = None
+        # 用户在启动提示中选择了稍后处理：不再每次启动都提示 (恢复后清除)
+        self.deferred = False
+        self.stage_roots = []
+        self.planned = {}
+        self.staged = {}
+        self.done = {}
+        self.failed = {}
+
+    @classmethod
+    def load(cls, path):
+        state = cls(path)
+        with open(path, 'r', encoding='utf-8', errors='replace') as f:
+            for line in f:
+                try:
+                    rec = json.loads(line)
+                except ValueError:
+                    # 崩溃时最后一行可能只写了一半
+                    continue
+                state._apply(rec)
+        if state.job_id is None:
+            raise ValueError(f"无效的任务日志: {path}")
+        return state
+
+    def _apply(self, rec):
+        t = rec.get("t")
+        if t == "job":
+            self.job_id = rec["id"]
+            self.created = rec.get("created", 0)
+            self.is_encrypt = rec["is_encrypt"]
+            self.files = rec["files"]
+            self.options = rec.get("options", {})
+            self.key_check = rec.get("key_check")
+        elif t == "plan":
+            self.planned[rec["src"]] = (rec["size"], rec["target"])
+        elif t == "stage":
+            self.stage_roots.append(rec["root"])
+        elif t == "staged":
+            self.staged[rec["src"]] = (rec["staged"], rec["dst"])
+        elif t == "done":
+            self.done[rec["src"]] = rec["out"]
+            self.failed.pop(rec["src"], None)
+        elif t == "fail":
+            self.failed[rec["src"]] = rec["err"]
+        elif t == "resume":
+            self.status = None
+            self.deferred = False
+        elif t == "defer":
+            self.deferred = True
+        elif t == "end":
+            self.status = rec["status"]
+
+    @property
+    def resumable(self):
+        return self.status in (None, STATUS_STOPPED)
+
+    def check_key(self, key):
+        return self.key_check is None or key_check(key) == self.key_check
+
+    @property
+    def remaining_count(self):
+        return len([s for s in self.planned if s not in self.done])
+
+    def summary_text(self):
+        mode = "加密" if self.is_encrypt else "解密"
+        when = datetime.fromtimestamp(self.created).strftime("%Y-%m-%d %H:%M:%S") if self.created else "?"
+        state = "已终止" if self.status == STATUS_STOPPED else "异常中断"
+        return (f"{mode}任务 {self.job_id} ({when}, {state}): "
+                f"已完成 {len(self.done)} / 已计划 {len(self.planned)}，待回写 {len(self.staged_pending())}")
+
+    def staged_pending(self):
+        """已加密到暂存区但尚未确认回写完成的文件"""
+        return {s: v for s, v in self.staged.items() if s not in self.done}
+
+    @property
+    def running(self):
+        return is_running(self.path)
+
+    def mark(self, status):
+        """直接在日志末尾追加结束状态 (放弃恢复时使用)"""
+        self._append({"t": "end", "status": status, "at": time.time()})
+        self.status = status
+
+    def defer(self):
+        """记录用户暂不恢复：启动时不再提示，仍可通过 cli.py resume 恢复"""
+        self._append({"t": "defer", "at": time.time()})
+        self.deferred = True
+
+    def _append(self, record):
+        with open(self.path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(record) + "\n")
+
+
+def _journal_files(journal_dir):
+    try:
+        names = [n for n in os.listdir(journal_dir) if n.startswith("Job_") and n.endswith(JOURNAL_SUFFIX)]
+    except OSError:
+        return []
+    return [os.path.join(journal_dir, n) for n in sorted(names)]
+
+
+def find_unfinished(journal_dir=None):
+    """列出可恢复的任务 (异常中断或用户终止)；仍在其他进程中运行的任务不列出"""
+    states = []
+    for path in _journal_files(journal_dir or DIRS["JOURNAL"]):
+        try:
+            state = JournalState.load(path)
+        except (OSError, ValueError, KeyError):
+            continue
+        if state.resumable and not state.running:
+            states.append(state)
+    return states
+
+
+def prune_finished(journal_dir=None, keep=JOURNAL_KEEP):
+    """只保留最近 keep 个已结束的日志"""
+    finished = []
+    for path in _journal_files(journal_dir or DIRS["JOURNAL"]):
+        try:
+            with open(path, 'rb') as f:
+                f.seek(max(0, os.path.getsize(path) - 4096))
+                tail = f.read().decode('utf-8', 'replace').strip().splitlines()
+            if tail and '"t": "end"' in tail[-1] and STATUS_STOPPED not in tail[-1]:
+                finished.append(path)
+        except OSError:
+            continue
+    for path in finished[:-keep] if keep else finished:
+        for p in (path, path[:-len(JOURNAL_SUFFIX)] + LOCK_SUFFIX):
+            try: os.remove(p)
+            except OSError: pass
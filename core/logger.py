@@ -2,9 +2,13 @@ import logging
 import logging.handlers
 import os
 import sys
+import time
+import queue
+import atexit
+import threading
 # import colorama  <-- 删除了这行顶层的引用
 from datetime import datetime
-from config import DIRS
+from config import DIRS, LOG_FLUSH_INTERVAL, LOG_FLUSH_LEVEL, LOG_QUEUE_BATCH
 
 # ==========================================
 # 颜色引擎初始化 (安全降级模式)
@@ -64,6 +68,7 @@ class LogFormatter(logging.Formatter):
     def format(self, record):
         # 1. 保存原始信息，防止被修改
         original_levelname = record.levelname
+        original_msg = record.msg
 
         # 2. 如果需要颜色，修饰 levelname
         if self.use_color:
@@ -77,13 +82,107 @@ class LogFormatter(logging.Formatter):
         # 3. 调用父类格式化
         formatted_msg = super().format(record)
 
-        # 4. 恢复原始 levelname (防止污染其他 handler)
+        # 4. 恢复原始 levelname / msg (防止污染其他 handler)
         record.levelname = original_levelname
+        record.msg = original_msg
 
         return formatted_msg
 
 
+LEVELS = {
+    "info": logging.INFO,
+    "warning": logging.WARNING,
+    "error": logging.ERROR,
+    "debug": logging.DEBUG,
+    "critical": logging.CRITICAL
+}
+
+
+class _DeferredFlush:
+    """emit 后不立即 flush (StreamHandler 默认每条都 flush)，由监听线程按策略统一 sync()"""
+
+    def flush(self):
+        pass
+
+    def sync(self):
+        super().flush()
+
+
+class BufferedFileHandler(_DeferredFlush, logging.handlers.RotatingFileHandler):
+    pass
+
+
+class BufferedStreamHandler(_DeferredFlush, logging.StreamHandler):
+    pass
+
+
+class _PassThroughQueueHandler(logging.handlers.QueueHandler):
+    """调用方线程只把 record 放入队列 (同进程内无需序列化，格式化全部交给监听线程)"""
+
+    def prepare(self, record):
+        return record
+
+
+class BatchingQueueListener(logging.handlers.QueueListener):
+    """
+    后台日志线程：一次取出队列中积压的所有记录连续写入，
+    按刷新策略 sync：距上次刷新超过 flush_interval，或出现 flush_level 及以上级别的记录时立即刷新。
+    """
+
+    def __init__(self, log_queue, *handlers, flush_interval=LOG_FLUSH_INTERVAL, flush_level=logging.ERROR):
+        super().__init__(log_queue, *handlers, respect_handler_level=True)
+        self.flush_interval = flush_interval
+        self.flush_level = flush_level
+
+    def _sync(self):
+        for h in self.handlers:
+            try:
+                if isinstance(h, _DeferredFlush): h.sync()
+                else: h.flush()
+            except Exception:
+                pass
+
+    def _monitor(self):
+        q = self.queue
+        dirty = False
+        last_flush = time.monotonic()
+        while True:
+            timeout = max(0.0, self.flush_interval - (time.monotonic() - last_flush)) if dirty else None
+            try:
+                batch = [q.get(timeout=timeout)]
+            except queue.Empty:
+                batch = []
+            while len(batch) < LOG_QUEUE_BATCH:
+                try:
+                    batch.append(q.get_nowait())
+                except queue.Empty:
+                    break
+
+            stop = False
+            urgent = False
+            for record in batch:
+                if record is self._sentinel:
+                    stop = True
+                    continue
+                self.handle(record)
+                dirty = True
+                urgent = urgent or record.levelno >= self.flush_level
+
+            now = time.monotonic()
+            if dirty and (stop or urgent or now - last_flush >= self.flush_interval):
+                self._sync()
+                dirty = False
+                last_flush = now
+            if stop:
+                return
+
+
 class LoggerService:
+    """
+    运行日志服务 (单例)。
+    log() 只把记录放入内存队列，不做格式化与 I/O，可在界面线程 / 调度热路径中调用；
+    文件与控制台输出由后台 BatchingQueueListener 线程批量完成。
+    """
     _instance = None
 
     def __new__(cls, *args, **kwargs):
@@ -100,13 +199,21 @@ class LoggerService:
         self.logger.setLevel(logging.INFO)
         self.logger.propagate = False
         self.handlers_setup = False
+        self.listener = None
+        self.log_file = None
+        self.flush_interval = LOG_FLUSH_INTERVAL
+        self.flush_level = LEVELS.get(LOG_FLUSH_LEVEL, logging.ERROR)
+        self._setup_lock = threading.Lock()
         self._initialized = True
 
     def _setup_handlers(self):
-        """懒加载：配置控制台和文件处理器"""
-        if self.handlers_setup:
-            return
+        """懒加载：配置控制台和文件处理器，并启动后台写日志线程"""
+        with self._setup_lock:
+            if self.handlers_setup:
+                return
+            self._create_handlers()
 
+    def _create_handlers(self):
         try:
             # 1. 确保日志目录
             log_dir = DIRS["LOGS"]
@@ -118,12 +225,13 @@ class LoggerService:
             timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
             log_filename = f"Encrypt_{timestamp}.log"
             log_file = os.path.join(log_dir, log_filename)
+            self.log_file = os.path.abspath(log_file)
 
             # --- Handler A: 文件 (带轮转，最大 10MB，保留 5 个备份) ---
             # 注意：由于文件名包含秒级时间戳，每次重启程序都会生成新文件。
             # RotatingFileHandler 在这里主要防止单次运行日志过大 (超过10MB会切分)。
             # delay=False 确保立即创建文件，避免权限问题延后暴露
-            file_handler = logging.handlers.RotatingFileHandler(
+            file_handler = BufferedFileHandler(
                 log_file,
                 maxBytes=10 * 1024 * 1024,  # 10 MB
                 backupCount=5,
@@ -135,15 +243,20 @@ class LoggerService:
             file_handler.setFormatter(LogFormatter(use_color=False))
 
             # --- Handler B: 控制台 (尝试使用颜色) ---
-            console_handler = logging.StreamHandler(sys.stdout)
+            console_handler = BufferedStreamHandler(sys.stdout)
             console_handler.setLevel(logging.INFO)
             console_handler.setFormatter(LogFormatter(use_color=True))
 
+            # --- 后台线程：格式化 + 批量写入 ---
+            self.listener = BatchingQueueListener(queue.SimpleQueue(), file_handler, console_handler,
+                                                  flush_interval=self.flush_interval,
+                                                  flush_level=self.flush_level)
+            self.listener.start()
+            atexit.register(self.shutdown)
+
             # 清除旧的 handlers
             self.logger.handlers.clear()
-
-            self.logger.addHandler(file_handler)
-            self.logger.addHandler(console_handler)
+            self.logger.addHandler(_PassThroughQueueHandler(self.listener.queue))
 
             self.handlers_setup = True
 
@@ -154,22 +267,27 @@ class LoggerService:
         except Exception as e:
             print(f"❌ [CRITICAL] 无法初始化日志系统: {e}")
 
+    def set_flush_policy(self, interval=None, level=None):
+        """
+        调整刷新策略：interval 最长刷新间隔 (秒，0 为每批写入后立即刷新)，
+        level 立即刷新的最低级别 ("info" 等同于每条都刷新)。
+        """
+        if interval is not None:
+            self.flush_interval = max(0.0, interval)
+        if level is not None:
+            self.flush_level = LEVELS.get(level.lower(), logging.ERROR)
+        if self.listener:
+            self.listener.flush_interval = self.flush_interval
+            self.listener.flush_level = self.flush_level
+
     def log(self, message, level="info"):
         """
-        兼容旧代码的 wrapper 方法。
+        兼容旧代码的 wrapper 方法 (非阻塞，只入队)。
         """
         if not self.handlers_setup:
             self._setup_handlers()
 
-        lvl_map = {
-            "info": logging.INFO,
-            "warning": logging.WARNING,
-            "error": logging.ERROR,
-            "debug": logging.DEBUG,
-            "critical": logging.CRITICAL
-        }
-
-        log_level = lvl_map.get(level.lower(), logging.INFO)
+        log_level = LEVELS.get(level.lower(), logging.INFO)
 
         # 使用 stacklevel=2 确保日志显示的行号是调用 log() 的地方
         if sys.version_info >= (3, 8):
@@ -177,10 +295,19 @@ class LoggerService:
         else:
             self.logger.log(log_level, message)
 
-        # 强制刷新
-        for h in self.logger.handlers:
-            h.flush()
+    def shutdown(self):
+        """停止后台线程并写出所有积压日志 (程序退出时自动调用)"""
+        listener, self.listener = self.listener, None
+        if listener is None:
+            return
+        listener.stop()
+        for h in listener.handlers:
+            try: h.close()
+            except Exception: pass
+        # 之后的日志直接丢弃而不是阻塞
+        self.logger.handlers.clear()
+        self.logger.addHandler(logging.NullHandler())
 
 
 # 全局单例
-sys_logger = LoggerService()
\ No newline at end of file
+sys_logger = LoggerService()
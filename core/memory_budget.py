@@ -0,0 +1,68 @@
+import threading
+
+from config import CHUNK_SIZES
+from core.file_cipher import FileCipherEngine
+
+
+def _fmt_mb(n):
+    return f"{n / 1024 / 1024:.0f}MB"
+
+
+class MemoryBudget:
+    """
+    全局在途缓冲内存预算。
+    调度器在任务启动前按分块大小预留内存，引擎按授予的分块大小运行；
+    预算不足时先缩小分块，仍不足则推迟任务启动，保证总占用不超过上限。
+    """
+
+    def __init__(self, limit_bytes, max_tasks=1):
+        self.limit = max(int(limit_bytes), 0)
+        self.max_tasks = max(1, max_tasks)
+        self.used = 0
+        self.peak = 0
+        self._grants = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def cost_of(chunk_size, file_size):
+        """单个任务的缓冲占用估算 (小文件按实际大小计)"""
+        return FileCipherEngine.estimate_buffer_bytes(min(chunk_size, max(file_size, 16)))
+
+    def try_acquire(self, token, file_size):
+        """
+        尝试为任务预留缓冲。
+        返回授予的分块大小；预算不足需推迟时返回 None。
+        """
+        min_chunk = CHUNK_SIZES["SMALL"]
+        chunk = FileCipherEngine._get_smart_chunk_size(file_size)
+
+        with self._lock:
+            if self.limit <= 0:
+                self._grants[token] = 0
+                return chunk
+
+            # 公平份额：避免首个大文件独占预算
+            share = self.limit // self.max_tasks
+            free = self.limit - self.used
+            while chunk > min_chunk and self.cost_of(chunk, file_size) > min(share, free):
+                chunk //= 2
+            chunk = max(chunk, min_chunk)
+
+            cost = self.cost_of(chunk, file_size)
+            # 没有任何在途任务时必须放行，否则预算过小会永久阻塞
+            if cost > free and self.used > 0:
+                return None
+
+            self._grants[token] = cost
+            self.used += cost
+            self.peak = max(self.peak, self.used)
+            return chunk
+
+    def release(self, token):
+        with self._lock:
+            self.used -= self._grants.pop(token, 0)
+
+    def usage_text(self):
+        if self.limit <= 0:
+            return ""
+        return f"缓冲 {_fmt_mb(self.used)}/{_fmt_mb(self.limit)}"
@@ -0,0 +1,270 @@
+import os
+import json
+import time
+import bisect
+import threading
+
+from config import BOTTLENECK_IDLE_UTILIZATION
+
+# 文件处理的三个阶段 (引擎读写循环内计时)
+STAGES = ("read", "cipher", "write")
+STAGE_NAMES = {"read": "读取", "cipher": "加解密", "write": "写入", "writeback": "回写",
+               "idle": "调度 (工作进程空闲)"}
+
+# 耗时直方图分桶 (秒)
+TIME_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 300)
+METRIC_PREFIX = "encfs"
+
+
+class Histogram:
+    """固定分桶直方图 (Prometheus 累计分桶语义)"""
+
+    def __init__(self, buckets=TIME_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q):
+        """按分桶上界估算分位数 (超出最大分桶时返回最大分桶值)"""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for i, c in enumerate(self.counts):
+            seen += c
+            if seen >= rank:
+                break
+        return self.buckets[min(i, len(self.buckets) - 1)]
+
+    def to_dict(self):
+        return {"count": self.count, "sum": round(self.sum, 6),
+                "p50": self.quantile(0.5), "p95": self.quantile(0.95)}
+
+
+class FileStats:
+    """
+    单个文件的分阶段计时与字节数。
+    作为 probe 传给 FileCipherEngine.process_file_direct，由读写循环调用 span()。
+    """
+
+    def __init__(self):
+        self.seconds = dict.fromkeys(STAGES, 0.0)
+        self.bytes = dict.fromkeys(STAGES, 0)
+
+    def span(self, stage, start, end, nbytes=0):
+        self.seconds[stage] += end - start
+        self.bytes[stage] += nbytes
+
+    def to_dict(self):
+        return {"seconds": self.seconds, "bytes": self.bytes}
+
+
+class BatchMetrics:
+    """
+    批次运行指标：计数器 / 直方图 / 仪表 (线程安全)。
+    snapshot() 为实时快照，to_prometheus() 为 Prometheus 文本格式，summary() 为批次结束时的汇总。
+    """
+
+    def __init__(self, job, workers):
+        self.job = job
+        self.workers = workers
+        self.started = time.time()
+        self.finished = None
+        self._lock = threading.Lock()
+
+        self.stage_seconds = dict.fromkeys(STAGES, 0.0)
+        self.stage_bytes = dict.fromkeys(STAGES, 0)
+        self.files = {"success": 0, "fail": 0}
+        self.busy_seconds = 0.0
+        # 可用并发 (各设备组并发窗口之和) 对时间的积分：利用率的分母
+        self.capacity_seconds = 0.0
+        self._capacity_sample = None
+        self.writeback_bytes = 0
+        self.writeback_seconds = 0.0
+
+        self.file_seconds = Histogram()
+        self.queue_wait = Histogram()
+        self.stage_hist = {s: Histogram() for s in STAGES}
+
+        self.gauges = {"workers_busy": 0, "workers_total": workers, "stage_used_bytes": 0,
+                       "stage_capacity_bytes": 0, "memory_used_bytes": 0, "writeback_rate_bytes": 0.0}
+        self._wb_sample = (time.monotonic(), 0)
+
+    # ---------- 记录 ----------
+    def record_file(self, stats, wall):
+        """工作进程发回的单文件计时 (stats 为 FileStats.to_dict())"""
+        with self._lock:
+            for s in STAGES:
+                sec = stats["seconds"].get(s, 0.0)
+                self.stage_seconds[s] += sec
+                self.stage_bytes[s] += stats["bytes"].get(s, 0)
+                self.stage_hist[s].observe(sec)
+            self.file_seconds.observe(wall)
+            self.busy_seconds += wall
+
+    def record_result(self, success):
+        with self._lock:
+            self.files["success" if success else "fail"] += 1
+
+    def record_queue_wait(self, seconds):
+        with self._lock:
+            self.queue_wait.observe(max(0.0, seconds))
+
+    def add_writeback(self, nbytes, seconds=0.0):
+        with self._lock:
+            self.writeback_bytes += nbytes
+            self.writeback_seconds += seconds
+
+    def set_gauges(self, **values):
+        with self._lock:
+            self.gauges.update(values)
+            # 回写速率：每秒采样一次
+            now = time.monotonic()
+            last_t, last_b = self._wb_sample
+            if now - last_t >= 1.0:
+                self.gauges["writeback_rate_bytes"] = (self.writeback_bytes - last_b) / (now - last_t)
+                self._wb_sample = (now, self.writeback_bytes)
+
+    def sample_capacity(self, capacity):
+        """每轮调度调用：记录当前可用并发 (上一次采样的值持续到本次)"""
+        now = time.monotonic()
+        with self._lock:
+            if self._capacity_sample:
+                last_t, last_n = self._capacity_sample
+                self.capacity_seconds += (now - last_t) * last_n
+            self._capacity_sample = (now, capacity)
+
+    def close(self):
+        self.finished = time.time()
+        if self._capacity_sample:
+            self.sample_capacity(0)
+
+    # ---------- 导出 ----------
+    def elapsed(self):
+        return (self.finished or time.time()) - self.started
+
+    def utilization(self):
+        """
+        工作进程忙碌时间占比：各文件处理耗时之和 / 可用并发的时间积分
+        (慢速盘的设备组只允许 1~4 个并发，按进程数计算会把受限于磁盘的批次误判为空闲)；
+        未采样时按批次耗时 × 进程数计算
+        """
+        if self.capacity_seconds > 0:
+            return self.busy_seconds / self.capacity_seconds
+        elapsed = self.elapsed()
+        return self.busy_seconds / (elapsed * self.workers) if elapsed > 0 else 0.0
+
+    def bottleneck(self):
+        """
+        三个阶段中累计耗时最长的一个 (SSD 回写明显更慢时归为回写)；
+        利用率低于 BOTTLENECK_IDLE_UTILIZATION 时为 "idle"：并发窗口内的工作进程多数时间在等待分派，瓶颈在调度
+        """
+        if self.busy_seconds and self.utilization() < BOTTLENECK_IDLE_UTILIZATION:
+            return "idle"
+        totals = dict(self.stage_seconds)
+        if self.writeback_seconds:
+            totals["writeback"] = self.writeback_seconds
+        if not any(totals.values()):
+            return None
+        return max(totals, key=totals.get)
+
+    def snapshot(self):
+        with self._lock:
+            elapsed = self.elapsed()
+            return {
+                "job": self.job,
+                "elapsed": round(elapsed, 3),
+                "files": dict(self.files),
+                "stages": {s: {"seconds": round(self.stage_seconds[s], 6), "bytes": self.stage_bytes[s],
+                               "rate": self.stage_bytes[s] / self.stage_seconds[s] if self.stage_seconds[s] else 0.0,
+                               "per_file": self.stage_hist[s].to_dict()} for s in STAGES},
+                "file_seconds": self.file_seconds.to_dict(),
+                "queue_wait": self.queue_wait.to_dict(),
+                "utilization": round(self.utilization(), 4),
+                "writeback": {"bytes": self.writeback_bytes, "seconds": round(self.writeback_seconds, 6)},
+                "gauges": dict(self.gauges),
+            }
+
+    def summary(self):
+        """批次结束后的 JSON 汇总"""
+        snap = self.snapshot()
+        snap["started"] = self.started
+        snap["finished"] = self.finished
+        snap["bottleneck"] = self.bottleneck()
+        return snap
+
+    def summary_text(self):
+        snap = self.snapshot()
+        parts = [f"{STAGE_NAMES[s]} {snap['stages'][s]['seconds']:.1f}s" for s in STAGES]
+        if self.writeback_seconds:
+            parts.append(f"回写 {self.writeback_seconds:.1f}s")
+        neck = self.bottleneck()
+        tail = f"，瓶颈: {STAGE_NAMES[neck]}" if neck else ""
+        return (f"{' / '.join(parts)}，核心利用率 {snap['utilization'] * 100:.0f}%，"
+                f"排队 p95 {snap['queue_wait']['p95']}s{tail}")
+
+    def to_prometheus(self):
+        with self._lock:
+            label = f'job="{self.job}"'
+            lines = []
+
+            def metric(name, kind, help_text, samples):
+                full = f"{METRIC_PREFIX}_{name}"
+                lines.append(f"# HELP {full} {help_text}")
+                lines.append(f"# TYPE {full} {kind}")
+                for extra, value in samples:
+                    labels = ",".join(x for x in (label, extra) if x)
+                    lines.append(f"{full}{{{labels}}} {value}")
+
+            def histogram(name, help_text, series):
+                full = f"{METRIC_PREFIX}_{name}"
+                lines.append(f"# HELP {full} {help_text}")
+                lines.append(f"# TYPE {full} histogram")
+                for extra, hist in series:
+                    base = ",".join(x for x in (label, extra) if x)
+                    seen = 0
+                    for bound, c in zip(hist.buckets, hist.counts):
+                        seen += c
+                        lines.append(f'{full}_bucket{{{base},le="{bound}"}} {seen}')
+                    lines.append(f'{full}_bucket{{{base},le="+Inf"}} {hist.count}')
+                    lines.append(f"{full}_sum{{{base}}} {hist.sum}")
+                    lines.append(f"{full}_count{{{base}}} {hist.count}")
+
+            metric("stage_bytes_total", "counter", "Bytes processed per stage",
+                   [(f'stage="{s}"', self.stage_bytes[s]) for s in STAGES])
+            metric("stage_seconds_total", "counter", "Seconds spent per stage",
+                   [(f'stage="{s}"', self.stage_seconds[s]) for s in STAGES])
+            metric("files_total", "counter", "Files finished by result",
+                   [(f'result="{k}"', v) for k, v in self.files.items()])
+            metric("worker_busy_seconds_total", "counter", "Summed wall time of file tasks",
+                   [("", self.busy_seconds)])
+            metric("writeback_bytes_total", "counter", "Bytes copied from SSD staging to destination",
+                   [("", self.writeback_bytes)])
+            for name, value in self.gauges.items():
+                metric(name, "gauge", name.replace("_", " "), [("", value)])
+            histogram("file_seconds", "Wall time per file", [("", self.file_seconds)])
+            histogram("queue_wait_seconds", "Time from submit to worker start", [("", self.queue_wait)])
+            histogram("file_stage_seconds", "Per-file seconds per stage",
+                      [(f'stage="{s}"', self.stage_hist[s]) for s in STAGES])
+            return "\n".join(lines) + "\n"
+
+
+def write_atomic(path, text):
+    """先写临时文件再重命名 (node exporter 不会读到写了一半的文件)"""
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp = path + ".tmp"
+    with open(tmp, 'w', encoding='utf-8') as f:
+        f.write(text)
+    os.replace(tmp, path)
+
+
+def write_summary(metrics_dir, metrics):
+    path = os.path.join(metrics_dir, f"Batch_{metrics.job}.json")
+    write_atomic(path, json.dumps(metrics.summary(), ensure_ascii=False, indent=2))
+    return path
@@ -0,0 +1,94 @@
+import sys
+from array import array
+
+
+class CompactPathStore:
+    """
+    紧凑的路径列表存储 (任务队列用)。
+    所有路径按 UTF-8 拼接在一个 bytearray 中，行边界记录在 array 偏移表里；
+    去重用 {hash: 行号} 校验，每个路径只占其字节长度 + 少量索引开销，
+    远小于每行一个 QListWidgetItem / Python str 对象。
+    """
+
+    def __init__(self):
+        self._data = bytearray()
+        self._ends = array('Q')
+        self._index = {}
+        self._overflow = {}
+
+    def __len__(self):
+        return len(self._ends)
+
+    def __getitem__(self, row):
+        start = self._ends[row - 1] if row > 0 else 0
+        return self._data[start:self._ends[row]].decode('utf-8', 'surrogateescape')
+
+    def __iter__(self):
+        start = 0
+        data = self._data
+        for end in self._ends:
+            yield data[start:end].decode('utf-8', 'surrogateescape')
+            start = end
+
+    def __contains__(self, path):
+        return self._find(path) is not None
+
+    def _find(self, path):
+        row = self._index.get(hash(path))
+        if row is None:
+            return None
+        if self[row] == path:
+            return row
+        return self._overflow.get(path)
+
+    def add(self, path):
+        """追加路径，已存在时返回 False"""
+        h = hash(path)
+        row = self._index.get(h)
+        if row is not None:
+            if self[row] == path or path in self._overflow:
+                return False
+        self._data += path.encode('utf-8', 'surrogateescape')
+        new_row = len(self._ends)
+        self._ends.append(len(self._data))
+        if row is None:
+            self._index[h] = new_row
+        else:
+            # 哈希碰撞 (极少)：单独记录
+            self._overflow[path] = new_row
+        return True
+
+    def extend(self, paths):
+        """批量追加，返回实际新增的数量"""
+        added = 0
+        for p in paths:
+            if self.add(p):
+                added += 1
+        return added
+
+    def remove_rows(self, rows):
+        """删除指定行 (重建存储，O(n))"""
+        drop = set(rows)
+        kept = [p for i, p in enumerate(self) if i not in drop]
+        self.clear()
+        self.extend(kept)
+
+    def clear(self):
+        self._data = bytearray()
+        self._ends = array('Q')
+        self._index = {}
+        self._overflow = {}
+
+    def to_list(self):
+        return list(self)
+
+    def memory_bytes(self):
+        """
+        近似内存占用：路径字节 + 偏移表 + 去重索引 (dict 本身及其中的哈希 / 行号 int 对象)。
+        百万级路径时索引是最大的一块 (约 100 B/路径)；逐项统计为 O(n)，不要在热路径上调用
+        """
+        total = sys.getsizeof(self._data) + sys.getsizeof(self._ends)
+        for index in (self._index, self._overflow):
+            total += sys.getsizeof(index)
+            total += sum(sys.getsizeof(k) + sys.getsizeof(v) for k, v in index.items())
+        return total
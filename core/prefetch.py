@@ -0,0 +1,211 @@
+import os
+import shutil
+import threading
+from collections import deque
+
+from config import PREFETCH_BLOCK, PREFETCH_LOOKAHEAD
+
+# 需要预读的慢速设备类别 (见 core.concurrency.classify_device)
+SLOW_DEVICE_CLASSES = {"HDD", "USB", "NETWORK"}
+
+READY = "READY"
+PENDING = "PENDING"
+DIRECT = "DIRECT"
+
+
+class _Item:
+    __slots__ = ("token", "src", "size", "device", "state", "staged", "error", "in_use")
+
+    def __init__(self, token, src, size, device=None):
+        self.token = token
+        self.src = src
+        self.size = size
+        self.device = device
+        self.state = PENDING
+        self.staged = None
+        self.error = None
+        self.in_use = False
+
+
+def sequential_copy(src, dst, block_size=PREFETCH_BLOCK, should_stop=None):
+    """大块顺序读写复制 (无缓冲 IO + 复用单个缓冲区)"""
+    buf = bytearray(block_size)
+    view = memoryview(buf)
+    with open(src, 'rb', buffering=0) as f_in, open(dst, 'wb', buffering=0) as f_out:
+        if hasattr(os, "posix_fadvise"):
+            try: os.posix_fadvise(f_in.fileno(), 0, 0, os.POSIX_FADV_SEQUENTIAL)
+            except OSError: pass
+        while True:
+            if should_stop and should_stop(): raise InterruptedError("STOP")
+            n = f_in.readinto(buf)
+            if not n:
+                break
+            f_out.write(view[:n])
+
+
+class SourcePrefetcher:
+    """
+    源文件预读：把慢速设备 (HDD/U盘/网络共享) 上即将处理的文件提前复制到 SSD 暂存区。
+    1. 每个慢速设备只有一个预读线程，按任务顺序大块顺序读，避免多路寻道交错
+    2. 每个设备最多领先工作进程 PREFETCH_LOOKAHEAD 个文件，各设备平分预读空间预算
+       (设备尚无副本时可单独占用剩余预算，以便预读超过份额的大文件)
+    3. 工作进程处理完后删除暂存副本并归还预算
+    4. 预读因预算不足停滞、且没有正在使用副本的任务可归还预算时，由 bypass() 改为直接读源
+    """
+
+    def __init__(self, root, budget_bytes, lookahead=PREFETCH_LOOKAHEAD, log=None):
+        self.root = root
+        self.budget = max(int(budget_bytes), 0)
+        self.lookahead = max(1, lookahead)
+        self.log = log or (lambda msg: None)
+        self.used = 0
+        self.staged_count = 0
+
+        self._items = {}
+        self._queues = {}
+        self._dev_used = {}
+        self._dev_ready = {}
+        self._blocked = set()
+        self._in_use = 0
+        self._threads = []
+        self._seq = 0
+        self._stopped = False
+        self._cond = threading.Condition()
+
+    def add(self, token, src, size, device_key):
+        """登记待预读任务 (按调度顺序调用)；超过预算的大文件直接读源"""
+        item = _Item(token, src, size, device_key)
+        with self._cond:
+            self._items[token] = item
+            if size > self.budget:
+                item.state = DIRECT
+                return
+            if device_key not in self._queues:
+                self._queues[device_key] = deque()
+                self._dev_used[device_key] = 0
+                self._dev_ready[device_key] = 0
+                t = threading.Thread(target=self._loop, args=(device_key,),
+                                     name=f"Prefetch-{len(self._threads)}", daemon=True)
+                self._threads.append(t)
+                t.start()
+            self._queues[device_key].append(item)
+            self._cond.notify_all()
+
+    def is_idle(self):
+        """没有任何需要预读的文件"""
+        return not self._queues
+
+    def peek(self, token):
+        """查询预读状态: READY (可读暂存副本) / PENDING (等待预读) / DIRECT (直接读源)"""
+        item = self._items.get(token)
+        return item.state if item else DIRECT
+
+    def read_path(self, token):
+        """提交任务时调用：返回工作进程的读取路径 (READY 的副本记为使用中)"""
+        with self._cond:
+            item = self._items.get(token)
+            if item and item.state == READY:
+                if not item.in_use:
+                    item.in_use = True
+                    self._in_use += 1
+                return item.staged
+        return item.src if item else None
+
+    def bypass(self, token):
+        """
+        等待预读的任务能否改为直接读源：该文件排在所属设备队首且因预算不足停滞，
+        同时没有正在处理的预读任务 (预算只会被排在它后面、无法启动的副本占着)。
+        成功时返回 True，该文件不再预读。
+        """
+        with self._cond:
+            item = self._items.get(token)
+            if not item or item.state != PENDING or self._in_use:
+                return False
+            q = self._queues.get(item.device)
+            if not q or q[0] is not item or item.device not in self._blocked:
+                return False
+            q.popleft()
+            item.state = DIRECT
+            self._blocked.discard(item.device)
+            self._cond.notify_all()
+        self.log(f"⚠️ [预读] 预读空间被后续文件占满，{os.path.basename(item.src)} 改为直接读取")
+        return True
+
+    def discard(self, token):
+        """任务处理完毕：删除暂存副本，归还预算"""
+        with self._cond:
+            item = self._items.pop(token, None)
+            if not item or item.state != READY:
+                return
+            self.used -= item.size
+            self._dev_used[item.device] -= item.size
+            self._dev_ready[item.device] -= 1
+            if item.in_use:
+                self._in_use -= 1
+            self._cond.notify_all()
+        if item.staged:
+            shutil.rmtree(os.path.dirname(item.staged), ignore_errors=True)
+
+    def _loop(self, device_key):
+        q = self._queues[device_key]
+        while True:
+            with self._cond:
+                # 等待：有待预读文件 + 本设备领先数量未超限 + 预算充足
+                while not self._stopped:
+                    # 已取消的任务 (直接读源或已终止) 不再预读
+                    while q and q[0].token not in self._items:
+                        q.popleft()
+                    if q and self._dev_ready[device_key] < self.lookahead:
+                        if self._fits(device_key, q[0].size):
+                            self._blocked.discard(device_key)
+                            break
+                        self._blocked.add(device_key)
+                    else:
+                        self._blocked.discard(device_key)
+                    self._cond.wait(0.5)
+                if self._stopped:
+                    return
+                item = q.popleft()
+                self.used += item.size
+                self._dev_used[device_key] += item.size
+                self._seq += 1
+                slot = os.path.join(self.root, f"{self._seq:08d}")
+
+            staged = os.path.join(slot, os.path.basename(item.src))
+            try:
+                os.makedirs(slot, exist_ok=True)
+                sequential_copy(item.src, staged, should_stop=lambda: self._stopped)
+                with self._cond:
+                    item.staged = staged
+                    item.state = READY
+                    self._dev_ready[device_key] += 1
+                    self.staged_count += 1
+                    self._cond.notify_all()
+            except Exception as e:
+                shutil.rmtree(slot, ignore_errors=True)
+                with self._cond:
+                    self.used -= item.size
+                    self._dev_used[device_key] -= item.size
+                    item.error = str(e)
+                    item.state = DIRECT
+                    self._cond.notify_all()
+                if not self._stopped:
+                    self.log(f"⚠️ [预读] {os.path.basename(item.src)} 预读失败，改为直接读取: {e}")
+
+    def _fits(self, device_key, size):
+        """总预算之内，且不超过本设备的份额 (本设备没有副本时不受份额限制)"""
+        if self.used + size > self.budget:
+            return False
+        used = self._dev_used[device_key]
+        return not used or used + size <= self.budget // len(self._queues)
+
+    def usage_text(self):
+        return f"预读 {self.used / 1024 / 1024:.0f}MB/{self.budget / 1024 / 1024:.0f}MB"
+
+    def close(self):
+        with self._cond:
+            self._stopped = True
+            self._cond.notify_all()
+        for t in self._threads:
+            t.join()
+        shutil.rmtree(self.root, ignore_errors=True)
@@ -0,0 +1,130 @@
+import os
+import shutil
+from concurrent.futures import ThreadPoolExecutor
+
+from config import PREFLIGHT_SAMPLE, PREFLIGHT_WORKERS, PREFLIGHT_COLLISION
+from core.file_cipher import FileCipherEngine
+
+# 每个输出文件按 4KB 余量估算 (文件系统块对齐)
+_FILE_OVERHEAD = 4096
+
+
+class PreflightReport:
+    """解密预检结果"""
+
+    def __init__(self):
+        self.fatal = None       # 整批无法执行的原因 (密钥错误 / 空间不足)
+        self.targets = {}       # src -> 最终输出路径 (已解决重名)
+        self.bad = {}           # src -> 失败原因 (文件头损坏 / 密钥不符 / 重名跳过)
+        self.renamed = {}       # src -> 自动改名后的文件名
+        self.existing = 0       # 将覆盖磁盘上已存在文件的数量
+        self.space = []         # [(目录, 需要字节, 可用字节)]
+
+    def summary_text(self):
+        parts = [f"可处理 {len(self.targets)}"]
+        if self.bad: parts.append(f"跳过 {len(self.bad)}")
+        if self.renamed: parts.append(f"重名改名 {len(self.renamed)}")
+        if self.existing: parts.append(f"覆盖已有文件 {self.existing}")
+        return ", ".join(parts)
+
+
+def _read(entry, key_bytes):
+    try:
+        return FileCipherEngine.read_header(entry[0], key_bytes), None
+    except (OSError, ValueError) as e:
+        return None, str(e)
+
+
+def _nearest_dir(path):
+    while path and not os.path.isdir(path):
+        parent = os.path.dirname(path)
+        if parent == path: break
+        path = parent
+    return path or "."
+
+
+def _unique_name(final, taken):
+    """在同目录下生成不重名的文件名: name (2).ext"""
+    base, ext = os.path.splitext(final)
+    n = 2
+    while True:
+        candidate = f"{base} ({n}){ext}"
+        if os.path.normcase(candidate) not in taken and not os.path.exists(candidate):
+            return candidate
+        n += 1
+
+
+def run_preflight(entries, key_bytes, target_of, collision=PREFLIGHT_COLLISION, reserved=(),
+                  sample=PREFLIGHT_SAMPLE, workers=PREFLIGHT_WORKERS):
+    """
+    解密预检：并行读取所有文件头 (不读内容)。
+    entries: [(src, size)]；target_of(src) 返回按目录规则计算的输出路径 (取其目录)
+    reserved: 本任务已输出的路径 (恢复任务时不能被后续文件覆盖)
+    1. 抽样验证密钥，全部失败则整批终止
+    2. 还原每个文件的原名与输出路径，检测批内重名
+    3. 按目标磁盘汇总所需空间并与剩余空间比较
+    """
+    report = PreflightReport()
+    if not entries:
+        return report
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        # 1. 均匀抽样验证密钥
+        step = max(1, len(entries) // max(1, sample))
+        sampled = entries[::step][:sample]
+        sample_results = list(pool.map(lambda e: _read(e, key_bytes), sampled))
+        if all(err == "密钥错误" for _, err in sample_results):
+            report.fatal = f"密钥错误 (抽样 {len(sampled)} 个文件均无法解密)"
+            return report
+
+        # 2. 读取其余文件头
+        done = {e[0]: r for e, r in zip(sampled, sample_results)}
+        rest = [e for e in entries if e[0] not in done]
+        for e, r in zip(rest, pool.map(lambda e: _read(e, key_bytes), rest)):
+            done[e[0]] = r
+
+    taken = {os.path.normcase(p) for p in reserved}
+    need_by_dir = {}
+    for src, _ in entries:
+        header, err = done[src]
+        if header is None:
+            report.bad[src] = err
+            continue
+        orig_name, orig_size = header
+        final = os.path.join(os.path.dirname(target_of(src)), orig_name)
+        key = os.path.normcase(final)
+
+        if key in taken:
+            if collision != "rename":
+                report.bad[src] = f"还原后与同批文件重名: {orig_name}"
+                continue
+            final = _unique_name(final, taken)
+            key = os.path.normcase(final)
+            report.renamed[src] = os.path.basename(final)
+        elif os.path.exists(final):
+            report.existing += 1
+
+        taken.add(key)
+        report.targets[src] = final
+        out_dir = _nearest_dir(os.path.dirname(final))
+        need_by_dir[out_dir] = need_by_dir.get(out_dir, 0) + orig_size + _FILE_OVERHEAD
+
+    # 3. 按设备汇总空间需求 (同一设备上的多个目录合并计算)
+    by_dev = {}
+    for d, need in need_by_dir.items():
+        try:
+            dev = os.stat(d).st_dev
+        except OSError:
+            continue
+        first_dir, total = by_dev.get(dev, (d, 0))
+        by_dev[dev] = (first_dir, total + need)
+    for d, need in by_dev.values():
+        try:
+            free = shutil.disk_usage(d).free
+        except OSError:
+            continue
+        report.space.append((d, need, free))
+        if need > free and report.fatal is None:
+            report.fatal = (f"目标磁盘空间不足: {d} 需要 {need / 1024 / 1024:.0f}MB，"
+                            f"可用 {free / 1024 / 1024:.0f}MB")
+    return report
@@ -0,0 +1,156 @@
+import os
+import io
+import json
+import glob
+import shutil
+import pstats
+import cProfile
+
+from config import PROFILE_TOP, PROFILE_ALLOC_TOP
+
+PROF_SUFFIX = ".prof"
+ALLOC_SUFFIX = ".alloc.json"
+# 剖析工具自身的分配不计入报告
+_OWN_FILES = ("cProfile.py", "pstats.py", "tracemalloc.py", "profiling.py")
+
+
+class WorkerProfiler:
+    """
+    工作进程的性能剖析 (每个进程一个，跨文件累计)。
+    run() 在 cProfile 下执行一个文件的处理；memory=True 时同时用 tracemalloc 记录分配，
+    在进程内存占用最高的时刻 (数据块写出时，缓冲仍在) 保存分配最多的代码行。
+    每个文件结束后 flush() 覆盖写入 parts 目录下本进程的累计结果。
+    """
+
+    def __init__(self, parts_dir, memory=False):
+        self.pid = os.getpid()
+        self.parts_dir = parts_dir
+        self.memory = memory
+        self.profile = cProfile.Profile()
+        self.files = 0
+        self.peak = 0
+        self.top = []
+        if memory:
+            import tracemalloc
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+
+    def run(self, func):
+        """必须在实际执行 func 的线程中调用 (cProfile 只统计当前线程)"""
+        self.profile.enable()
+        try:
+            return func()
+        finally:
+            self.profile.disable()
+            self.files += 1
+
+    def span(self, stage, start, end, nbytes=0):
+        """引擎 probe 接口：写出数据块时检查是否出现新的内存峰值"""
+        if not self.memory or stage != "write":
+            return
+        import tracemalloc
+        current = tracemalloc.get_traced_memory()[0]
+        # 峰值增长超过 10% 才重新抓取 (快照开销较大)
+        if current <= self.peak * 1.1:
+            return
+        self.peak = current
+        # 抓取快照期间暂停 cProfile，避免剖析结果被快照本身淹没
+        self.profile.disable()
+        try:
+            stats = tracemalloc.take_snapshot().statistics("lineno")
+            self.top = [(f"{s.traceback[0].filename}:{s.traceback[0].lineno}", s.size, s.count)
+                        for s in stats if not s.traceback[0].filename.endswith(_OWN_FILES)][:PROFILE_ALLOC_TOP]
+        finally:
+            self.profile.enable()
+
+    def flush(self):
+        base = os.path.join(self.parts_dir, str(self.pid))
+        self.profile.dump_stats(base + PROF_SUFFIX)
+        if self.memory:
+            with open(base + ALLOC_SUFFIX, 'w', encoding='utf-8') as f:
+                json.dump({"pid": self.pid, "files": self.files, "peak": self.peak, "top": self.top}, f)
+
+
+_worker_profiler = None
+
+
+def worker_profiler(parts_dir, memory=False):
+    """当前工作进程的剖析器 (进程池复用进程，按 pid 与目录判断是否需要新建)"""
+    global _worker_profiler
+    p = _worker_profiler
+    if p is None or p.pid != os.getpid() or p.parts_dir != parts_dir:
+        _worker_profiler = p = WorkerProfiler(parts_dir, memory)
+    return p
+
+
+def _mb(n):
+    return f"{n / 1024 / 1024:.1f}MB"
+
+
+class BatchProfiler:
+    """
+    批次剖析结果汇总 (主进程)：工作进程的结果写入 parts 目录，
+    批次结束时 write() 合并为 Profile_<job>.pstats (可用 snakeviz / pstats 打开)
+    与可读的文本报告 Profile_<job>.txt (耗时排行 + 内存分配排行)。
+    """
+
+    def __init__(self, profile_dir, job, memory=False):
+        self.profile_dir = profile_dir
+        self.job = job
+        self.memory = memory
+        self.parts_dir = os.path.join(profile_dir, f"{job}.parts")
+        os.makedirs(self.parts_dir, exist_ok=True)
+
+    def write(self):
+        """合并各进程结果，返回 (pstats 路径, 报告路径)；没有任何结果时返回 None"""
+        profs = sorted(glob.glob(os.path.join(self.parts_dir, "*" + PROF_SUFFIX)))
+        if not profs:
+            shutil.rmtree(self.parts_dir, ignore_errors=True)
+            return None
+
+        stats = pstats.Stats(profs[0])
+        for p in profs[1:]:
+            stats.add(p)
+        pstats_path = os.path.join(self.profile_dir, f"Profile_{self.job}.pstats")
+        stats.dump_stats(pstats_path)
+
+        out = io.StringIO()
+        out.write(f"任务 {self.job}：合并 {len(profs)} 个工作进程的剖析结果\n\n")
+        for key, title in (("cumulative", "累计耗时"), ("tottime", "自身耗时")):
+            out.write(f"===== 按{title}排序 (前 {PROFILE_TOP}) =====\n")
+            stats.stream = out
+            stats.sort_stats(key).print_stats(PROFILE_TOP)
+        if self.memory:
+            out.write(self._alloc_report())
+
+        report_path = os.path.join(self.profile_dir, f"Profile_{self.job}.txt")
+        with open(report_path, 'w', encoding='utf-8') as f:
+            f.write(out.getvalue())
+        shutil.rmtree(self.parts_dir, ignore_errors=True)
+        return pstats_path, report_path
+
+    def _alloc_report(self):
+        workers = []
+        for path in sorted(glob.glob(os.path.join(self.parts_dir, "*" + ALLOC_SUFFIX))):
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    workers.append(json.load(f))
+            except (OSError, ValueError):
+                continue
+        lines = ["===== 内存分配 (tracemalloc，各工作进程峰值时刻) =====\n"]
+        if not workers:
+            return lines[0] + "无数据\n"
+        for w in sorted(workers, key=lambda w: -w["peak"]):
+            lines.append(f"工作进程 {w['pid']}: 处理 {w['files']} 个文件，峰值 {_mb(w['peak'])}\n")
+
+        # 合并：同一代码行在各进程峰值时刻的分配取最大值
+        merged = {}
+        for w in workers:
+            for where, size, count in w["top"]:
+                old = merged.get(where)
+                if old is None or size > old[0]:
+                    merged[where] = (size, count)
+        lines.append(f"\n{'大小':>10}  {'块数':>8}  位置\n")
+        for where, (size, count) in sorted(merged.items(), key=lambda kv: -kv[1][0])[:PROFILE_ALLOC_TOP]:
+            lines.append(f"{_mb(size):>10}  {count:>8}  {where}\n")
+        return "".join(lines)
@@ -0,0 +1,133 @@
+import os
+import sys
+import time
+import platform
+import threading
+
+from config import QOS_IO_CLASSES, QOS_RATE_REFRESH, QOS_BURST
+
+# Linux ioprio_set 系统调用号 (按架构)
+_IOPRIO_SYSCALL = {"x86_64": 251, "amd64": 251, "i386": 289, "i686": 289,
+                   "aarch64": 30, "arm64": 30, "armv7l": 314}
+_IOPRIO_WHO_PROCESS = 1
+_IOPRIO_CLASS_SHIFT = 13
+# Windows: 线程进入后台模式 (同时降低 CPU 与 I/O 优先级)
+_THREAD_MODE_BACKGROUND_BEGIN = 0x00010000
+
+
+def _set_ioprio_linux(io_class):
+    import ctypes
+    import ctypes.util
+    nr = _IOPRIO_SYSCALL.get(platform.machine().lower())
+    if nr is None:
+        raise OSError("当前架构不支持 ioprio_set")
+    cls, level = QOS_IO_CLASSES[io_class]
+    libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+    # who=0: 当前线程 (Linux 的 I/O 优先级按线程生效)
+    if libc.syscall(nr, _IOPRIO_WHO_PROCESS, 0, (cls << _IOPRIO_CLASS_SHIFT) | level) != 0:
+        raise OSError(ctypes.get_errno(), "ioprio_set 失败")
+
+
+def apply_thread_priority(nice=0, io_class=None):
+    """
+    降低当前线程的 CPU / I/O 优先级 (尽力而为，不支持时忽略)。
+    Linux 下 nice 与 ioprio 都按线程生效，线程结束即失效，不影响进程池中的其他任务。
+    """
+    if sys.platform.startswith("linux"):
+        if nice:
+            # who=0 在 Linux 上只作用于当前线程；只调低不调高 (调高需要特权)
+            try:
+                if os.getpriority(os.PRIO_PROCESS, 0) < min(19, nice):
+                    os.setpriority(os.PRIO_PROCESS, 0, min(19, nice))
+            except OSError: pass
+        if io_class in QOS_IO_CLASSES:
+            try: _set_ioprio_linux(io_class)
+            except (OSError, AttributeError): pass
+    elif os.name == "nt" and (nice or io_class):
+        try:
+            import ctypes
+            kernel32 = ctypes.windll.kernel32
+            kernel32.SetThreadPriority(kernel32.GetCurrentThread(), _THREAD_MODE_BACKGROUND_BEGIN)
+        except Exception:
+            pass
+
+
+def qos_supported():
+    """当前平台能否按任务 (线程) 降低优先级"""
+    return sys.platform.startswith("linux") or os.name == "nt"
+
+
+def run_with_priority(func, nice=0, io_class=None):
+    """
+    在降低优先级的独立线程中执行 func 并返回其结果。
+    进程池工作进程由多个任务共用，无特权时 nice 只能调高不能调回，
+    因此不修改工作进程本身，改为每个文件一个短生命周期线程。
+    """
+    if not nice and not io_class:
+        return func()
+
+    box = {}
+
+    def target():
+        apply_thread_priority(nice, io_class)
+        try:
+            box["result"] = func()
+        except BaseException as e:
+            box["error"] = e
+
+    t = threading.Thread(target=target, name="QoSWorker")
+    t.start()
+    t.join()
+    if "error" in box:
+        raise box["error"]
+    return box["result"]
+
+
+class RateLimiter:
+    """
+    令牌桶限速 (在工作进程的读写循环中调用 consume)。
+    rate_of() 返回当前允许的速率 (bytes/s，0 或 None 为不限)，每 QOS_RATE_REFRESH 秒重新读取，
+    因此运行中调整限速无需重启任务；等待期间定期检查 should_stop 以便及时终止。
+    """
+
+    def __init__(self, rate_of, should_stop=None):
+        self.rate_of = rate_of
+        self.should_stop = should_stop or (lambda: False)
+        self.rate = 0
+        self.tokens = 0.0
+        self._last = time.monotonic()
+        self._checked = 0.0
+
+    def _refresh(self, now):
+        if now - self._checked >= QOS_RATE_REFRESH:
+            self._checked = now
+            try:
+                self.rate = self.rate_of() or 0
+            except Exception:
+                self.rate = 0
+
+    def _fill(self, now):
+        self.tokens = min(self.tokens + (now - self._last) * self.rate, self.rate * QOS_BURST)
+        self._last = now
+
+    def consume(self, nbytes):
+        now = time.monotonic()
+        self._refresh(now)
+        if not self.rate:
+            self.tokens = 0.0
+            self._last = now
+            return
+        self._fill(now)
+        self.tokens -= nbytes
+        # 令牌不足：分段睡眠直到补足 (限速被调高或取消时提前结束)
+        while self.tokens < 0:
+            if self.should_stop(): raise InterruptedError("STOP")
+            time.sleep(min(-self.tokens / self.rate, QOS_RATE_REFRESH))
+            now = time.monotonic()
+            self._refresh(now)
+            if not self.rate:
+                self.tokens = 0.0
+                self._last = now
+                return
+            self.tokens += (now - self._last) * self.rate
+            self._last = now
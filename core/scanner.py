@@ -0,0 +1,188 @@
+import os
+import queue
+import threading
+from collections import OrderedDict
+
+from config import SCAN_WORKERS, SCAN_BATCH
+
+# 同目录请求文件数不超过该值时逐个 stat，更多时整目录 scandir 一次取回
+_SCANDIR_THRESHOLD = 4
+
+
+class ParallelScanner:
+    """
+    流式并行扫描器 (生产者)。
+    输入可混合文件与目录：文件按所在目录分组，用 os.scandir 一次取回属性；
+    目录递归展开，子目录作为新任务并行扫描。
+    结果按批次 (list of (path, size)) 放入队列，调度器边扫描边启动任务。
+    """
+
+    def __init__(self, paths, workers=SCAN_WORKERS, batch_size=SCAN_BATCH, with_size=True):
+        self.workers = max(1, workers)
+        # with_size=False 时只枚举路径 (size 恒为 0)，省去逐文件 stat
+        self.with_size = with_size
+        self.batch_size = max(1, batch_size)
+        self.found_files = 0
+        self.found_bytes = 0
+        self.missing = []
+
+        self._out = queue.Queue()
+        self._work = queue.Queue()
+        self._lock = threading.Lock()
+        self._outstanding = 0
+        self._stopped = False
+        self._threads = []
+        self._finished = threading.Event()
+
+        self._missing_read = 0
+
+        groups = OrderedDict()
+        for p in paths:
+            p = os.path.normpath(p)
+            groups.setdefault(os.path.dirname(p), []).append(os.path.basename(p))
+        for parent, names in groups.items():
+            self._put_work(("files", parent, names))
+
+    # ---------- 生命周期 ----------
+    def start(self):
+        if self._outstanding == 0:
+            self._finished.set()
+            return self
+        # 先建好全部线程再启动：首个线程可能在其余线程启动前就扫完，结束信号须按总数发送
+        self._threads = [threading.Thread(target=self._loop, name=f"Scanner-{i}", daemon=True)
+                         for i in range(self.workers)]
+        for t in self._threads:
+            t.start()
+        return self
+
+    def stop(self):
+        self._stopped = True
+
+    def join(self, timeout=None):
+        """等待扫描线程全部退出 (扫描完成或 stop() 后调用)"""
+        for t in self._threads:
+            t.join(timeout)
+
+    @property
+    def done(self):
+        """扫描已全部完成且结果已被取走"""
+        return self._finished.is_set() and self._out.empty()
+
+    def poll(self):
+        """取出已发现的文件 (非阻塞)，返回 [(path, size), ...]"""
+        entries = []
+        while True:
+            try:
+                entries.extend(self._out.get_nowait())
+            except queue.Empty:
+                break
+        return entries
+
+    def poll_missing(self):
+        """取出新发现的不存在路径"""
+        with self._lock:
+            new = self.missing[self._missing_read:]
+            self._missing_read += len(new)
+        return new
+
+    # ---------- 内部 ----------
+    def _put_work(self, item):
+        with self._lock:
+            self._outstanding += 1
+        self._work.put(item)
+
+    def _add_missing(self, paths):
+        if paths:
+            with self._lock:
+                self.missing.extend(paths)
+
+    def _emit(self, batch):
+        if batch:
+            with self._lock:
+                self.found_files += len(batch)
+                self.found_bytes += sum(s for _, s in batch)
+            self._out.put(batch)
+
+    def _loop(self):
+        while True:
+            item = self._work.get()
+            if item is None:
+                return
+            try:
+                if not self._stopped:
+                    if item[0] == "files":
+                        self._scan_files(item[1], item[2])
+                    else:
+                        self._scan_tree(item[1])
+            finally:
+                with self._lock:
+                    self._outstanding -= 1
+                    last = self._outstanding == 0
+                if last:
+                    self._finished.set()
+                    for _ in range(self.workers):
+                        self._work.put(None)
+
+    def _scan_files(self, parent, names):
+        batch = []
+        if len(names) <= _SCANDIR_THRESHOLD:
+            for name in names:
+                path = os.path.join(parent, name)
+                try:
+                    if os.path.isdir(path):
+                        self._put_work(("tree", path))
+                    elif self.with_size:
+                        batch.append((path, os.path.getsize(path)))
+                    elif os.path.exists(path):
+                        batch.append((path, 0))
+                    else:
+                        self._add_missing([path])
+                except OSError:
+                    self._add_missing([path])
+            self._emit(batch)
+            return
+
+        wanted = set(names)
+        try:
+            with os.scandir(parent or ".") as it:
+                for entry in it:
+                    if entry.name not in wanted:
+                        continue
+                    wanted.discard(entry.name)
+                    path = os.path.join(parent, entry.name)
+                    try:
+                        if entry.is_dir():
+                            self._put_work(("tree", path))
+                            continue
+                        batch.append((path, entry.stat().st_size if self.with_size else 0))
+                    except OSError:
+                        self._add_missing([path])
+                        continue
+                    if len(batch) >= self.batch_size:
+                        self._emit(batch)
+                        batch = []
+        except OSError:
+            pass
+        self._emit(batch)
+        self._add_missing([os.path.join(parent, n) for n in wanted])
+
+    def _scan_tree(self, root):
+        batch = []
+        try:
+            with os.scandir(root) as it:
+                for entry in it:
+                    if self._stopped: break
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            self._put_work(("tree", entry.path))
+                        elif entry.is_file():
+                            size = entry.stat().st_size if self.with_size else 0
+                            batch.append((os.path.normpath(entry.path), size))
+                    except OSError:
+                        continue
+                    if len(batch) >= self.batch_size:
+                        self._emit(batch)
+                        batch = []
+        except OSError:
+            self._add_missing([root])
+        self._emit(batch)
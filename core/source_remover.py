@@ -0,0 +1,82 @@
+import os
+import queue
+import threading
+
+from config import REMOVE_WORKERS, WIPE_BLOCK, WIPE_MODES
+
+
+def wipe_file(path, mode="zero", block=WIPE_BLOCK):
+    """
+    按原大小覆写文件内容并落盘 (删除前调用)。
+    注意：SSD 磨损均衡、写时复制文件系统 (btrfs/ZFS/APFS) 与快照下，
+    原数据块可能不会被真正覆盖，此时只能降低而非消除恢复的可能。
+    """
+    size = os.path.getsize(path)
+    zeros = bytes(min(block, size)) if mode != "random" else None
+    with open(path, 'r+b', buffering=0) as f:
+        written = 0
+        while written < size:
+            n = min(block, size - written)
+            f.write(os.urandom(n) if zeros is None else zeros[:n])
+            written += n
+        os.fsync(f.fileno())
+
+
+class SourceRemover:
+    """
+    源文件删除流水线：文件处理成功后立即交给后台线程删除 (可选先覆写)，
+    多线程并行，不阻塞调度线程与界面线程。结果通过 poll() 取回。
+    """
+
+    def __init__(self, wipe=None, workers=REMOVE_WORKERS):
+        self.wipe = wipe if wipe in WIPE_MODES else None
+        self.results = queue.Queue()
+        self._jobs = queue.Queue()
+        self._threads = []
+        self.pending = 0
+        self.removed = 0
+        for i in range(max(1, workers)):
+            t = threading.Thread(target=self._loop, name=f"SourceRemover-{i}", daemon=True)
+            t.start()
+            self._threads.append(t)
+
+    def submit(self, path):
+        self.pending += 1
+        self._jobs.put(path)
+
+    def _loop(self):
+        while True:
+            path = self._jobs.get()
+            if path is None:
+                return
+            try:
+                if self.wipe: wipe_file(path, self.wipe)
+                os.remove(path)
+                self.results.put((path, None))
+            except FileNotFoundError:
+                # 已被删除 (例如恢复任务时重复提交)
+                self.results.put((path, None))
+            except Exception as e:
+                self.results.put((path, str(e)))
+
+    def poll(self):
+        """取出已完成的删除 [(path, err)]，err 为空表示成功"""
+        done = []
+        while True:
+            try:
+                done.append(self.results.get_nowait())
+            except queue.Empty:
+                break
+        self.pending -= len(done)
+        self.removed += len([1 for _, err in done if err is None])
+        return done
+
+    def usage_text(self):
+        return f"已删除源文件 {self.removed}" + (f" (排队 {self.pending})" if self.pending else "")
+
+    def close(self):
+        """等待所有删除完成"""
+        for _ in self._threads:
+            self._jobs.put(None)
+        for t in self._threads:
+            t.join()
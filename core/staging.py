@@ -0,0 +1,160 @@
+import os
+import queue
+import shutil
+import threading
+
+from config import SSD_STAGE_RESERVE
+
+STAGE_DIR_NAME = "_SSD_ENCRYPT_STAGE_TEMP"
+# 加密输出 = 原大小 + IV/文件名头/填充，按 4KB 余量估算
+STAGE_OVERHEAD = 4096
+
+
+class StagingArea:
+    """
+    SSD 暂存区容量记账。
+    任务启动前按预估输出大小预留空间，回写完成后释放；
+    预留失败时调度器暂停启动新任务 (等待回写腾出空间)，而不是写满磁盘报错。
+    pool: 多个任务共用同一块暂存盘时的总账 (由 JobScheduler 按设备创建的 StagingArea)，
+          预留须同时满足本任务与总账的剩余容量。
+    """
+
+    def __init__(self, root, capacity, pool=None):
+        self.root = root
+        self.capacity = max(int(capacity), 0)
+        self.pool = pool
+        self.used = 0
+        self.peak = 0
+        self._seq = 0
+        self._reserved = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def create(cls, stage_root, probe_dir, pool=None):
+        """清理并重建暂存区，容量 = 剩余空间 - 安全余量 (共用总账时取总账容量)"""
+        if os.path.exists(stage_root): shutil.rmtree(stage_root, ignore_errors=True)
+        os.makedirs(stage_root, exist_ok=True)
+        if pool is not None:
+            return cls(stage_root, pool.capacity, pool)
+        usage = shutil.disk_usage(probe_dir)
+        return cls(stage_root, usage.free - SSD_STAGE_RESERVE)
+
+    @classmethod
+    def for_device(cls, probe_dir):
+        """多任务共用的暂存盘总账 (只记账，不创建目录)"""
+        return cls(probe_dir, shutil.disk_usage(probe_dir).free - SSD_STAGE_RESERVE)
+
+    @staticmethod
+    def estimate(file_size):
+        return file_size + STAGE_OVERHEAD
+
+    def fits(self, file_size):
+        """单个文件能否放入暂存区 (放不下的文件直接写目标盘)"""
+        return self.estimate(file_size) <= self.capacity
+
+    def try_reserve(self, token, file_size):
+        need = self.estimate(file_size)
+        with self._lock:
+            if self.used + need > self.capacity:
+                return False
+            if self.pool is not None and not self.pool.try_reserve((self.root, token), file_size):
+                return False
+            self._reserved[token] = need
+            self.used += need
+            self.peak = max(self.peak, self.used)
+            return True
+
+    def release(self, token):
+        with self._lock:
+            self.used -= self._reserved.pop(token, 0)
+        if self.pool is not None:
+            self.pool.release((self.root, token))
+
+    def release_all(self):
+        """任务结束：归还本任务在总账中的全部预留"""
+        with self._lock:
+            tokens = list(self._reserved)
+        for token in tokens:
+            self.release(token)
+
+    def resize(self, delta):
+        """调整容量 (划出 / 归还预读空间)，共用总账时同样调整总账"""
+        with self._lock:
+            self.capacity += delta
+        if self.pool is not None:
+            self.pool.resize(delta)
+
+    def new_slot(self):
+        """为单个任务分配独立的暂存子目录，避免同名文件互相覆盖"""
+        with self._lock:
+            self._seq += 1
+            return os.path.join(self.root, f"{self._seq:08d}")
+
+    def usage_text(self):
+        return f"暂存 {self.used / 1024 / 1024:.0f}MB/{self.capacity / 1024 / 1024:.0f}MB"
+
+    def cleanup(self):
+        shutil.rmtree(self.root, ignore_errors=True)
+        # 各任务的暂存子目录都清理后，顺带移除公共的暂存区目录
+        parent = os.path.dirname(self.root)
+        if os.path.basename(parent) == STAGE_DIR_NAME:
+            try: os.rmdir(parent)
+            except OSError: pass
+
+
+class WriteBackPipeline:
+    """
+    回写流水线：后台线程把已完成的暂存输出逐个搬回最终目录，
+    与仍在进行的加密任务并发执行。完成结果通过 results 队列交给调度线程。
+    """
+
+    def __init__(self, mover, workers=1):
+        self.mover = mover
+        self.results = queue.Queue()
+        self._jobs = queue.Queue()
+        self._stopped = threading.Event()
+        self._threads = []
+        self.pending = 0
+        for i in range(max(1, workers)):
+            t = threading.Thread(target=self._loop, name=f"WriteBack-{i}", daemon=True)
+            t.start()
+            self._threads.append(t)
+
+    def submit(self, token, src, dst):
+        self.pending += 1
+        self._jobs.put((token, src, dst))
+
+    def _loop(self):
+        while True:
+            job = self._jobs.get()
+            if job is None:
+                return
+            token, src, dst = job
+            if self._stopped.is_set():
+                self.results.put((token, src, dst, "用户停止"))
+                continue
+            try:
+                self.mover(src, dst)
+                self.results.put((token, src, dst, None))
+            except Exception as e:
+                self.results.put((token, src, dst, str(e)))
+
+    def poll(self):
+        """取出已完成的回写 (调度线程调用)"""
+        done = []
+        while True:
+            try:
+                done.append(self.results.get_nowait())
+            except queue.Empty:
+                break
+        self.pending -= len(done)
+        return done
+
+    def stop(self):
+        self._stopped.set()
+
+    def close(self):
+        for _ in self._threads:
+            self._jobs.put(None)
+        for t in self._threads:
+            t.join()
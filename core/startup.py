@@ -0,0 +1,89 @@
+import sys
+import time
+import threading
+
+from config import STARTUP_PROFILE_TOP
+
+
+class _TimedLoader:
+    """包装模块的 loader：执行模块代码前换回原 loader，只统计 exec_module 的耗时"""
+
+    def __init__(self, loader, profiler):
+        self._loader = loader
+        self._profiler = profiler
+
+    def __getattr__(self, name):
+        return getattr(self._loader, name)
+
+    def create_module(self, spec):
+        return self._loader.create_module(spec)
+
+    def exec_module(self, module):
+        spec = module.__spec__
+        spec.loader = self._loader
+        module.__loader__ = self._loader
+        self._profiler._enter(spec.name)
+        try:
+            self._loader.exec_module(module)
+        finally:
+            self._profiler._leave(spec.name)
+
+
+class ImportProfiler:
+    """
+    记录每个模块的导入耗时 (效果同 python -X importtime，打包后的程序同样可用)。
+    install() 后新导入的模块计入 records：[(模块名, 自身耗时, 累计耗时, 嵌套深度)]，按导入完成顺序。
+    """
+
+    def __init__(self):
+        self.records = []
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+    def install(self):
+        sys.meta_path.insert(0, self)
+        return self
+
+    def uninstall(self):
+        if self in sys.meta_path:
+            sys.meta_path.remove(self)
+
+    # ---------- meta path 接口 ----------
+    def find_spec(self, name, path=None, target=None):
+        for finder in sys.meta_path:
+            if finder is self or not hasattr(finder, "find_spec"):
+                continue
+            spec = finder.find_spec(name, path, target)
+            if spec is None:
+                continue
+            if spec.loader is not None and hasattr(spec.loader, "exec_module"):
+                spec.loader = _TimedLoader(spec.loader, self)
+            return spec
+        return None
+
+    def _enter(self, name):
+        stack = getattr(self._local, "stack", None)
+        if stack is None:
+            stack = self._local.stack = []
+        # [模块名, 开始时间, 子模块累计耗时]
+        stack.append([name, time.perf_counter(), 0.0])
+
+    def _leave(self, name):
+        stack = self._local.stack
+        _, start, children = stack.pop()
+        total = time.perf_counter() - start
+        if stack:
+            stack[-1][2] += total
+        with self._lock:
+            self.records.append((name, total - children, total, len(stack)))
+
+    # ---------- 报告 ----------
+    def report(self, top=STARTUP_PROFILE_TOP):
+        """文本报告：按累计耗时列出前 top 个模块 (缩进表示由哪个模块导入)"""
+        records = list(self.records)
+        total = sum(r[2] for r in records if r[3] == 0)
+        lines = [f"模块导入: 共 {len(records)} 个，合计 {total * 1000:.1f} ms\n",
+                 f"{'累计(ms)':>10} {'自身(ms)':>10}  模块\n"]
+        for name, own, cumulative, depth in sorted(records, key=lambda r: -r[2])[:top]:
+            lines.append(f"{cumulative * 1000:>10.1f} {own * 1000:>10.1f}  {'  ' * min(depth, 8)}{name}\n")
+        return "".join(lines)
@@ -0,0 +1,140 @@
+import os
+import json
+import glob
+import shutil
+import threading
+
+from config import TRACE_MAX_EVENTS
+from core.metrics import write_atomic
+
+# 时间轴统一使用 time.perf_counter()：Linux / Windows / macOS 上均为系统级单调时钟，
+# 各工作进程的时间戳可直接对齐到同一条时间轴上。
+PART_SUFFIX = ".jsonl"
+
+
+def _us(t):
+    return int(t * 1_000_000)
+
+
+class SpanBuffer:
+    """
+    单进程的追踪事件缓冲 (Chrome trace event 格式)。
+    只追加不加锁 (list.append 在 GIL 下是原子的)，超过上限后丢弃并计数。
+    tid: 固定线程号 (工作进程每个文件可能换线程，统一记在进程号下)；为空时记录实际线程。
+    """
+
+    def __init__(self, pid=None, tid=None, limit=TRACE_MAX_EVENTS):
+        self.pid = pid or os.getpid()
+        self.tid = tid
+        self.limit = limit
+        self.events = []
+        self.dropped = 0
+        self.threads = {}
+
+    def _thread(self):
+        if self.tid is not None:
+            return self.tid
+        tid = threading.get_native_id()
+        if tid not in self.threads:
+            self.threads[tid] = threading.current_thread().name
+        return tid
+
+    def _add(self, event):
+        if len(self.events) >= self.limit:
+            self.dropped += 1
+            return
+        self.events.append(event)
+
+    def complete(self, name, start, end, cat="batch", args=None):
+        """已结束的区间 (start / end 为 perf_counter 秒)"""
+        event = {"name": name, "cat": cat, "ph": "X", "ts": _us(start), "dur": max(0, _us(end) - _us(start)),
+                 "pid": self.pid, "tid": self._thread()}
+        if args: event["args"] = args
+        self._add(event)
+
+    def instant(self, name, t, cat="batch", args=None):
+        event = {"name": name, "cat": cat, "ph": "i", "s": "t", "ts": _us(t), "pid": self.pid, "tid": self._thread()}
+        if args: event["args"] = args
+        self._add(event)
+
+    def counter(self, name, t, **values):
+        self._add({"name": name, "ph": "C", "ts": _us(t), "pid": self.pid, "args": values})
+
+    def span(self, stage, start, end, nbytes=0):
+        """引擎 probe 接口：每个数据块的 读取 / 加解密 / 写入"""
+        self.complete(stage, start, end, cat="chunk", args={"bytes": nbytes})
+
+    def flush(self, parts_dir):
+        """追加写入 parts_dir/<pid>.jsonl 并清空 (工作进程每处理完一个文件调用一次)"""
+        if not self.events:
+            return
+        events, self.events = self.events, []
+        with open(os.path.join(parts_dir, f"{self.pid}{PART_SUFFIX}"), 'a', encoding='utf-8') as f:
+            f.write("".join(json.dumps(e, ensure_ascii=False) + "\n" for e in events))
+
+
+class TeeProbe:
+    """同时把 probe 计时交给多个接收者 (指标统计 + 追踪)"""
+
+    def __init__(self, *probes):
+        self.probes = probes
+
+    def span(self, stage, start, end, nbytes=0):
+        for p in self.probes:
+            p.span(stage, start, end, nbytes)
+
+
+_process_buffer = None
+
+
+def process_buffer():
+    """当前工作进程的缓冲 (进程池复用进程，按 pid 判断是否为 fork 继承来的旧缓冲)"""
+    global _process_buffer
+    if _process_buffer is None or _process_buffer.pid != os.getpid():
+        _process_buffer = SpanBuffer(tid=os.getpid())
+    return _process_buffer
+
+
+class BatchTracer:
+    """
+    批次执行时间线 (主进程)。
+    主进程的调度循环 / 回写 / 预检记录在自身缓冲中；工作进程写入 parts 目录下各自的文件，
+    批次结束时 write() 合并为一个 Chrome / Perfetto 可直接打开的 JSON。
+    """
+
+    def __init__(self, trace_dir, job):
+        self.trace_dir = trace_dir
+        self.job = job
+        self.parts_dir = os.path.join(trace_dir, f"{job}.parts")
+        os.makedirs(self.parts_dir, exist_ok=True)
+        self.buffer = SpanBuffer()
+
+    def write(self):
+        """合并所有进程的事件并写入 Trace_<job>.json，返回路径"""
+        events = list(self.buffer.events)
+        worker_pids = []
+        for part in sorted(glob.glob(os.path.join(self.parts_dir, "*" + PART_SUFFIX))):
+            try:
+                with open(part, 'r', encoding='utf-8') as f:
+                    lines = [json.loads(line) for line in f if line.strip()]
+            except (OSError, ValueError):
+                continue
+            if lines:
+                worker_pids.append(lines[0]["pid"])
+                events.extend(lines)
+
+        meta = [{"name": "process_name", "ph": "M", "pid": self.buffer.pid, "args": {"name": f"调度 {self.job}"}},
+                {"name": "process_sort_index", "ph": "M", "pid": self.buffer.pid, "args": {"sort_index": 0}}]
+        for tid, name in self.buffer.threads.items():
+            meta.append({"name": "thread_name", "ph": "M", "pid": self.buffer.pid, "tid": tid, "args": {"name": name}})
+        for i, pid in enumerate(sorted(worker_pids), 1):
+            meta.append({"name": "process_name", "ph": "M", "pid": pid, "args": {"name": f"工作进程 {pid}"}})
+            meta.append({"name": "process_sort_index", "ph": "M", "pid": pid, "args": {"sort_index": i}})
+            meta.append({"name": "thread_name", "ph": "M", "pid": pid, "tid": pid, "args": {"name": "文件处理"}})
+
+        path = os.path.join(self.trace_dir, f"Trace_{self.job}.json")
+        write_atomic(path, json.dumps({"traceEvents": meta + events, "displayTimeUnit": "ms",
+                                       "otherData": {"job": self.job, "dropped": self.buffer.dropped}},
+                                      ensure_ascii=False))
+        shutil.rmtree(self.parts_dir, ignore_errors=True)
+        return path
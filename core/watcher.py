@@ -0,0 +1,457 @@
+import os
+import sys
+import json
+import time
+import hashlib
+import errno
+import select
+import struct
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing.managers import SyncManager
+
+from config import (DIRS, WATCH_SETTLE, WATCH_POLL_INTERVAL, WATCH_RESCAN_INTERVAL, WATCH_MAX_BATCH,
+                    WATCH_IGNORE_SUFFIXES)
+from core.metrics import write_atomic
+
+# ================= inotify 常量 (linux/inotify.h) =================
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE_SELF = 0x00000400
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+
+_WATCH_MASK = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE | IN_DELETE_SELF
+_EVENT_HEADER = struct.Struct("iIII")
+
+# 后端上报的事件类型
+EV_WRITE = "WRITE"          # 文件被创建/写入 (可能尚未写完)
+EV_CLOSED = "CLOSED"        # 文件写完关闭或被移入
+EV_DIR = "DIR"              # 新目录 (需要补充监视并枚举其中已有文件)
+EV_OVERFLOW = "OVERFLOW"    # 事件队列溢出，需要一次重新核对
+
+
+class _InotifyBackend:
+    """Linux inotify：空闲时阻塞在 select 上，零轮询开销"""
+
+    def __init__(self):
+        import ctypes
+        import ctypes.util
+        self._libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        self._ctypes = ctypes
+        self.fd = self._libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 失败")
+        self._dirs = {}
+
+    def add_dir(self, path):
+        wd = self._libc.inotify_add_watch(self.fd, os.fsencode(path), _WATCH_MASK)
+        if wd < 0:
+            err = self._ctypes.get_errno()
+            # 目录已被删除属于正常竞争
+            if err != errno.ENOENT:
+                raise OSError(err, f"inotify_add_watch 失败: {path}")
+            return
+        self._dirs[wd] = path
+
+    def read(self, timeout):
+        try:
+            readable, _, _ = select.select([self.fd], [], [], timeout)
+        except InterruptedError:
+            return []
+        if not readable:
+            return []
+        try:
+            data = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return []
+
+        events = []
+        offset = 0
+        while offset + _EVENT_HEADER.size <= len(data):
+            wd, mask, _, length = _EVENT_HEADER.unpack_from(data, offset)
+            offset += _EVENT_HEADER.size
+            name = os.fsdecode(data[offset:offset + length].rstrip(b"\0"))
+            offset += length
+
+            if mask & IN_Q_OVERFLOW:
+                events.append((EV_OVERFLOW, None))
+                continue
+            if mask & (IN_IGNORED | IN_DELETE_SELF):
+                self._dirs.pop(wd, None)
+                continue
+            parent = self._dirs.get(wd)
+            if parent is None or not name:
+                continue
+            path = os.path.join(parent, name)
+            if mask & IN_ISDIR:
+                if mask & (IN_CREATE | IN_MOVED_TO):
+                    events.append((EV_DIR, path))
+            elif mask & (IN_CLOSE_WRITE | IN_MOVED_TO):
+                events.append((EV_CLOSED, path))
+            else:
+                events.append((EV_WRITE, path))
+        return events
+
+    def close(self):
+        if self.fd >= 0:
+            os.close(self.fd)
+            self.fd = -1
+
+
+class _PollingBackend:
+    """
+    通用轮询回退：每轮只对比各目录的 mtime，变化的目录才重新 scandir；
+    原地改写不改变目录 mtime，每 rescan 秒再逐个核对已知文件的 (大小, 修改时间)。
+    """
+
+    def __init__(self, interval=WATCH_POLL_INTERVAL, rescan=WATCH_RESCAN_INTERVAL):
+        self.interval = interval
+        self.rescan = rescan
+        self._dirs = {}
+        self._files = {}
+        self._last_rescan = time.monotonic()
+        self._wake = threading.Event()
+
+    def add_dir(self, path):
+        try:
+            self._dirs[path] = os.stat(path).st_mtime_ns
+        except OSError:
+            return
+        # 记录当前内容作为基线 (新目录中的文件由 watcher 自行枚举)
+        for entry in self._scan(path):
+            if not entry.is_dir(follow_symlinks=False):
+                self._files[entry.path] = self._sig(entry)
+
+    @staticmethod
+    def _scan(path):
+        try:
+            with os.scandir(path) as it:
+                return list(it)
+        except OSError:
+            return []
+
+    @staticmethod
+    def _sig(entry):
+        try:
+            st = entry.stat()
+            return (st.st_size, st.st_mtime_ns)
+        except OSError:
+            return None
+
+    def read(self, timeout):
+        self._wake.wait(min(timeout, self.interval))
+        events = []
+        for path, mtime in list(self._dirs.items()):
+            try:
+                cur = os.stat(path).st_mtime_ns
+            except OSError:
+                self._dirs.pop(path, None)
+                continue
+            if cur == mtime:
+                continue
+            self._dirs[path] = cur
+            for entry in self._scan(path):
+                if entry.is_dir(follow_symlinks=False):
+                    if entry.path not in self._dirs:
+                        events.append((EV_DIR, entry.path))
+                    continue
+                sig = self._sig(entry)
+                if sig is not None and self._files.get(entry.path) != sig:
+                    self._files[entry.path] = sig
+                    events.append((EV_WRITE, entry.path))
+        if time.monotonic() - self._last_rescan >= self.rescan:
+            self._last_rescan = time.monotonic()
+            events.extend(self._check_files())
+        return events
+
+    def _check_files(self):
+        """核对已知文件：原地覆盖 / 追加写入的文件所在目录 mtime 不变"""
+        events = []
+        for path, sig in list(self._files.items()):
+            try:
+                st = os.stat(path)
+            except OSError:
+                self._files.pop(path, None)
+                continue
+            cur = (st.st_size, st.st_mtime_ns)
+            if cur != sig:
+                self._files[path] = cur
+                events.append((EV_WRITE, path))
+        return events
+
+    def close(self):
+        self._wake.set()
+
+
+class FolderWatcher:
+    """
+    目录监视器：发现新增/修改的文件，等待写入稳定后按批交出。
+    1. 优先使用 inotify (Linux)，其他平台或初始化失败时回退为轮询 (目录 mtime + 定期核对已知文件)
+    2. 文件在 settle 秒内没有新的写入事件且大小/修改时间不变，才视为写完
+    3. 已处理文件记录签名，事件溢出时只重新核对，不会重复处理未变化的文件
+    """
+
+    def __init__(self, root, settle=WATCH_SETTLE, ignore_dirs=(), log=None, force_polling=False):
+        self.root = os.path.abspath(root)
+        self.settle = settle
+        self.ignore_dirs = [os.path.abspath(d) for d in ignore_dirs if d]
+        self.log = log or (lambda msg: None)
+        self.backend = None
+        self.force_polling = force_polling
+
+        # path -> [到期时间, 签名]；签名为 None 表示以事件静默为准
+        self._pending = {}
+        self._done = {}
+        self._ready_sig = {}
+
+    # ---------- 生命周期 ----------
+    def start(self, initial=False):
+        """建立监视；initial=True 时把目录中已有的文件也作为待处理"""
+        if not self.force_polling and sys.platform.startswith("linux"):
+            try:
+                self.backend = _InotifyBackend()
+            except (OSError, AttributeError) as e:
+                self.log(f"⚠️ [监视] inotify 不可用 ({e})，改用轮询")
+        if self.backend is None:
+            self.backend = _PollingBackend()
+
+        mode = "inotify" if isinstance(self.backend, _InotifyBackend) else "轮询"
+        count = self._add_tree(self.root, mark_pending=initial)
+        self.log(f"👀 [监视] {self.root} ({mode}, {count} 个目录)")
+        return self
+
+    def close(self):
+        if self.backend:
+            self.backend.close()
+
+    # ---------- 查询 ----------
+    def poll(self, timeout=1.0, limit=WATCH_MAX_BATCH):
+        """等待事件 (最多 timeout 秒)，返回已写入稳定的文件列表"""
+        now = time.monotonic()
+        if self._pending:
+            nearest = min(p[0] for p in self._pending.values())
+            timeout = max(0.0, min(timeout, nearest - now))
+
+        for kind, path in self.backend.read(timeout):
+            if kind == EV_OVERFLOW:
+                self.log("⚠️ [监视] 事件队列溢出，重新核对目录")
+                self._add_tree(self.root, mark_pending=True)
+            elif kind == EV_DIR:
+                if not self._ignored(path):
+                    self._add_tree(path, mark_pending=True)
+            elif not self._ignored(path):
+                self._touch(path, closed=kind == EV_CLOSED)
+
+        return self._collect_ready(limit)
+
+    @property
+    def pending_count(self):
+        return len(self._pending)
+
+    def mark_done(self, path):
+        """文件处理成功：记录其签名，未再变化前不会重复处理"""
+        sig = self._ready_sig.pop(path, None)
+        if sig is not None:
+            self._done[path] = sig
+
+    def forget(self, path):
+        self._ready_sig.pop(path, None)
+
+    def done_sig(self, path):
+        return self._done.get(path)
+
+    def restore_done(self, signatures):
+        """载入上次运行已处理文件的签名 (未变化的文件在 initial 扫描时跳过)"""
+        self._done.update(signatures)
+
+    # ---------- 内部 ----------
+    def _ignored(self, path):
+        name = os.path.basename(path)
+        if name.startswith(".") or name.endswith(WATCH_IGNORE_SUFFIXES):
+            return True
+        for d in self.ignore_dirs:
+            if path == d or path.startswith(d + os.sep):
+                return True
+        return False
+
+    def _touch(self, path, closed=False, sig=None):
+        # 写入关闭后只需短暂确认，仍在写入则重新计时
+        delay = self.settle / 4 if closed else self.settle
+        self._pending[path] = [time.monotonic() + delay, sig]
+
+    def _add_tree(self, top, mark_pending):
+        """为 top 及其子目录建立监视；mark_pending 时把其中的文件加入待定"""
+        count = 0
+        stack = [top]
+        while stack:
+            d = stack.pop()
+            if self._ignored(d) and d != self.root:
+                continue
+            self.backend.add_dir(d)
+            count += 1
+            try:
+                with os.scandir(d) as it:
+                    for entry in it:
+                        if entry.is_dir(follow_symlinks=False):
+                            stack.append(entry.path)
+                        elif mark_pending and not self._ignored(entry.path):
+                            self._touch(entry.path, sig=_PollingBackend._sig(entry))
+            except OSError:
+                continue
+        return count
+
+    def _collect_ready(self, limit):
+        now = time.monotonic()
+        ready = []
+        for path, entry in list(self._pending.items()):
+            if entry[0] > now:
+                continue
+            try:
+                st = os.stat(path)
+            except OSError:
+                # 已被删除或移走
+                del self._pending[path]
+                continue
+            sig = (st.st_size, st.st_mtime_ns)
+            if entry[1] is not None and entry[1] != sig:
+                # 静默期内仍有变化：继续等待
+                self._pending[path] = [now + self.settle, sig]
+                continue
+            del self._pending[path]
+            if self._done.get(path) == sig:
+                continue
+            self._ready_sig[path] = sig
+            ready.append(path)
+            if len(ready) >= limit:
+                break
+        return ready
+
+
+class WatchService:
+    """
+    监视模式守护：把 src 中写入稳定的文件按微批次加密到 out (保持目录结构)。
+    所有批次共用同一个进程池和通信 Manager，避免每批重新启动工作进程。
+    源文件修改后重新加密时，删除上次的输出 (加密文件名每次随机生成，不删除会留下多份旧版本)。
+    源文件 -> 输出路径与已处理签名保存在任务日志目录的 Watch_<目录对>.json 中，重启后继续沿用。
+    """
+
+    def __init__(self, src, out, key, settle=WATCH_SETTLE, initial=False, force_polling=False,
+                 on_log=None, on_result=None, on_progress=None, state_dir=None, **options):
+        self.src = os.path.abspath(src)
+        self.out = os.path.abspath(out)
+        self.key = key
+        self.initial = initial
+        self.options = options
+        self.on_log = on_log or (lambda msg: None)
+        self.on_result = on_result or (lambda fp, success, detail: None)
+        self.on_progress = on_progress or (lambda text, pct: None)
+
+        # 输出目录位于监视目录内时必须排除，否则会循环加密自己的输出
+        self.watcher = FolderWatcher(self.src, settle=settle, ignore_dirs=[self.out],
+                                     log=self.on_log, force_polling=force_polling)
+        self.batches = 0
+        self.processed = 0
+        self.failed = 0
+        # 源文件 -> 最近一次的输出路径
+        self.outputs = {}
+        # 不放在输出目录：解密整个输出目录时会被当作待解密文件
+        pair = hashlib.sha1(f"{self.src}\n{self.out}".encode('utf-8')).hexdigest()[:16]
+        self.state_path = os.path.join(state_dir or DIRS["JOURNAL"], f"Watch_{pair}.json")
+        self._runner = None
+        self._stopped = threading.Event()
+
+    def stop(self):
+        self._stopped.set()
+        runner = self._runner
+        if runner:
+            runner.stop()
+
+    @property
+    def stopped(self):
+        return self._stopped.is_set()
+
+    def run(self):
+        from core.batch_runner import BatchRunner, _ignore_sigint
+
+        os.makedirs(self.out, exist_ok=True)
+        self._load_state()
+        self.watcher.start(initial=self.initial)
+
+        manager = SyncManager()
+        manager.start(_ignore_sigint)
+        max_workers = os.cpu_count() or 1
+        try:
+            with ProcessPoolExecutor(max_workers=max_workers, initializer=_ignore_sigint) as pool:
+                while not self.stopped:
+                    ready = self.watcher.poll()
+                    if not ready:
+                        continue
+                    self._run_batch(BatchRunner, ready, manager, pool)
+        finally:
+            self.watcher.close()
+            manager.shutdown()
+        self.on_log(f"--- 监视结束: {self.batches} 个批次, 成功 {self.processed}, 失败 {self.failed} ---")
+
+    def _load_state(self):
+        try:
+            with open(self.state_path, 'r', encoding='utf-8') as f:
+                files = json.load(f).get("files", {})
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError, AttributeError) as e:
+            self.on_log(f"⚠️ [监视] 状态文件无法读取，按首次运行处理 {self.state_path}: {e}")
+            return
+        self.outputs.update((src, rec["out"]) for src, rec in files.items() if rec.get("out"))
+        self.watcher.restore_done({src: tuple(rec["sig"]) for src, rec in files.items() if rec.get("sig")})
+
+    def _save_state(self):
+        files = {}
+        for src, out in self.outputs.items():
+            sig = self.watcher.done_sig(src)
+            files[src] = {"out": out, "sig": list(sig) if sig else None}
+        try:
+            write_atomic(self.state_path, json.dumps({"files": files}, ensure_ascii=False))
+        except OSError as e:
+            self.on_log(f"⚠️ [监视] 状态文件写入失败 {self.state_path}: {e}")
+
+    def _replace_output(self, src, out):
+        previous = self.outputs.get(src)
+        self.outputs[src] = out
+        if previous and previous != out:
+            try:
+                os.remove(previous)
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                self.on_log(f"⚠️ [监视] 旧版本输出删除失败 {previous}: {e}")
+
+    def _run_batch(self, runner_cls, files, manager, pool):
+        self.batches += 1
+        self.on_log(f"📦 [监视] 批次 #{self.batches}: {len(files)} 个文件")
+
+        def on_result(fp, success, detail):
+            if success:
+                self.processed += 1
+                self.watcher.mark_done(fp)
+                self._replace_output(fp, detail)
+            else:
+                self.failed += 1
+                self.watcher.forget(fp)
+            self.on_result(fp, success, detail)
+
+        self._runner = runner_cls(files, self.key, True,
+                                  custom_out_dir=self.out, keep_structure=True, base_dir=self.src,
+                                  manager=manager,
+                                  on_log=self.on_log, on_result=on_result, on_progress=self.on_progress,
+                                  **self.options)
+        if self.stopped:
+            self._runner.stop()
+        self._runner.run(pool)
+        self._runner = None
+        self._save_state()
@@ -1,48 +1,133 @@
+import time
+_START = time.perf_counter()  # 启动计时起点 (--startup-profile)
+
 import sys
 import os
 import ctypes
+import threading
 import multiprocessing
 from PySide6.QtWidgets import QApplication
-from PySide6.QtCore import QThread
+from PySide6.QtCore import QTimer
 from PySide6.QtGui import QIcon
 
-from config import init_directories, BASE_DIR
-from ui.splash import IntroScreen
-from ui.main_window import MainWindow
+from config import init_directories, BASE_DIR, DIRS, STARTUP_SPLASH_DELAY
+
+# 依次导入的模块与启动画面上的提示 (界面主模块最后导入，前面的步骤拆分进度)
+LOAD_STEPS = (
+    ("core.logger", "LOADING LOGGER..."),
+    ("core.journal", "LOADING KERNEL..."),
+    ("ui.queue_model", "LOADING KERNEL..."),
+    ("ui.log_view", "STARTING UI..."),
+    ("ui.main_window", "STARTING UI..."),
+)
+
+
+class StartupLoader:
+    """
+    按 LOAD_STEPS 逐步导入界面模块，每步之间处理事件，启动画面进度取自实际完成的步骤。
+    加载超过 STARTUP_SPLASH_DELAY 秒才显示启动画面，更快时直接显示主窗口。
+    (Qt 模块的导入不能放到后台线程：PySide6 的枚举 / 签名是惰性初始化的，并非线程安全)
+    """
+
+    def __init__(self, app, phases):
+        self.app = app
+        self.phases = phases
+        self.splash = None
+
+    def run(self):
+        import importlib
+        start = time.perf_counter()
+        for i, (name, text) in enumerate(LOAD_STEPS):
+            if self.splash is None and time.perf_counter() - start >= STARTUP_SPLASH_DELAY:
+                self.show_splash()
+            if self.splash:
+                self.splash.update_progress(int(i / len(LOAD_STEPS) * 90), text)
+                self.app.processEvents()
+            importlib.import_module(name)
+        self.phases.append(("导入界面模块", time.perf_counter() - start))
+
+    def show_splash(self):
+        from ui.splash import IntroScreen
+        self.splash = IntroScreen()
+        self.splash.show()
+        self.app.processEvents()
+
+    def finish(self, window):
+        if self.splash:
+            self.splash.update_progress(100, "READY")
+            self.splash.finish(window)
+
+
+def report_startup(profiler, phases):
+    """输出启动耗时报告 (控制台 + Logs/Profile/Startup_<时间>.txt)"""
+    lines = ["===== 启动耗时 =====\n"]
+    for name, seconds in phases:
+        lines.append(f"{seconds * 1000:>10.1f} ms  {name}\n")
+    lines.append("\n" + profiler.report())
+    text = "".join(lines)
+    print(text, flush=True)
+    try:
+        os.makedirs(DIRS["PROFILE"], exist_ok=True)
+        path = os.path.join(DIRS["PROFILE"], f"Startup_{time.strftime('%Y%m%d_%H%M%S')}.txt")
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(text)
+        print(f"报告已写入 {path}", flush=True)
+    except OSError:
+        pass
+
 
 def main():
     # 1. Windows 多进程打包必须
     multiprocessing.freeze_support()
 
+    profile = "--startup-profile" in sys.argv
+    argv = [a for a in sys.argv if a != "--startup-profile"]
+    profiler = None
+    phases = [("解释器与 Qt 基础模块", time.perf_counter() - _START)]
+    if profile:
+        from core.startup import ImportProfiler
+        profiler = ImportProfiler().install()
+
     # 2. 提示 Windows 这是一个独立的应用程序
     try:
         myappid = 'security.fileengine.cipher.1.0'
         ctypes.windll.shell32.SetCurrentProcessExplicitAppUserModelID(myappid)
-    except ImportError:
+    except (ImportError, AttributeError):
         pass
 
+    mark = time.perf_counter()
     init_directories()
-    app = QApplication(sys.argv)
+    app = QApplication(argv)
 
     # 3. 设置全局应用图标
     icon_path = os.path.join(BASE_DIR, "fileenc.ico")
     if os.path.exists(icon_path):
         app.setWindowIcon(QIcon(icon_path))
+    phases.append(("创建 QApplication", time.perf_counter() - mark))
 
-    splash = IntroScreen()
-    splash.show()
-
-    # 模拟加载过程
-    for i in range(1, 51):
-        splash.update_progress(i * 2, "LOADING KERNEL..." if i < 25 else "STARTING UI...")
-        QThread.msleep(10)
-        app.processEvents()
+    # 4. 导入界面模块 (加载较慢时显示启动画面)
+    loader = StartupLoader(app, phases)
+    loader.run()
 
+    mark = time.perf_counter()
+    from ui.main_window import MainWindow
     window = MainWindow()
     window.show()
-    splash.finish(window)
+    loader.finish(window)
+    phases.append(("创建并显示主窗口", time.perf_counter() - mark))
+
+    def on_interactive():
+        phases.append(("可交互 (自进程启动)", time.perf_counter() - _START))
+        if profiler:
+            profiler.uninstall()
+            report_startup(profiler, phases)
+        # 加密引擎与多进程模块在后台预先导入，首次提交任务时无需等待
+        from core.job_scheduler import preload
+        threading.Thread(target=preload, name="Preload", daemon=True).start()
 
+    # 首个事件循环周期 (窗口完成首次绘制) 视为可交互
+    QTimer.singleShot(0, on_interactive)
     sys.exit(app.exec())
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
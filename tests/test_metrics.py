@@ -0,0 +1,45 @@
+import time
+import unittest
+
+from core.concurrency import ConcurrencyController, DeviceGroup
+from core.metrics import BatchMetrics
+
+
+def _read_bound(wall):
+    return {"seconds": {"read": wall * 0.8, "cipher": wall * 0.1, "write": wall * 0.1},
+            "bytes": {"read": 1 << 20, "cipher": 1 << 20, "write": 1 << 20}}
+
+
+class BottleneckTest(unittest.TestCase):
+    def test_hdd_group_on_wide_pool_is_read_bound(self):
+        # 8 进程的进程池，但唯一的设备组是 HDD，并发窗口为 1
+        controller = ConcurrencyController(8)
+        group = DeviceGroup(("hdd", "hdd"), "hdd", 1, 1, "HDD", "HDD")
+        group.pending.extend(range(10))
+        controller.groups[group.key] = group
+        controller._order.append(group)
+        self.assertEqual(controller.capacity, 1)
+
+        metrics = BatchMetrics("test", 8)
+        metrics.sample_capacity(controller.capacity)
+        start = time.monotonic()
+        time.sleep(0.2)
+        metrics.record_file(_read_bound(time.monotonic() - start), time.monotonic() - start)
+        metrics.close()
+
+        self.assertGreater(metrics.utilization(), 0.5)
+        self.assertEqual(metrics.bottleneck(), "read")
+
+    def test_idle_workers_are_scheduling_bound(self):
+        metrics = BatchMetrics("test", 8)
+        metrics.sample_capacity(4)
+        time.sleep(0.2)
+        metrics.record_file(_read_bound(0.05), 0.05)
+        metrics.close()
+
+        self.assertLess(metrics.utilization(), 0.5)
+        self.assertEqual(metrics.bottleneck(), "idle")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,218 @@
+import os
+import time
+from html import escape
+from collections import deque
+from datetime import datetime
+from PySide6.QtWidgets import QWidget, QVBoxLayout, QHBoxLayout, QPlainTextEdit, QComboBox, QCheckBox, QLabel, QPushButton
+from PySide6.QtCore import QTimer, QUrl
+from PySide6.QtGui import QDesktopServices, QTextCursor
+
+from config import LOG_VIEW_MAX_LINES, LOG_VIEW_FLUSH_MS, LOG_VIEW_FLUSH_LINES
+
+# 日志级别 (由低到高)；file 为单个文件处理成功
+LEVEL_FILE, LEVEL_INFO, LEVEL_WARNING, LEVEL_ERROR = 0, 1, 2, 3
+
+# 过滤选项：(显示名称, 最低级别)
+FILTERS = (("全部", LEVEL_FILE), ("警告及错误", LEVEL_WARNING), ("仅错误", LEVEL_ERROR))
+
+_COLORS = {
+    "dark": {"time": "#a0a0a0", LEVEL_FILE: "#8fd18f", LEVEL_INFO: "#e0e0e0",
+             LEVEL_WARNING: "#e5c07b", LEVEL_ERROR: "#ff6b6b"},
+    "light": {"time": "#666666", LEVEL_FILE: "#2e7d32", LEVEL_INFO: "#1c1c1e",
+              LEVEL_WARNING: "#b26a00", LEVEL_ERROR: "#d32f2f"},
+}
+
+
+def _clock(ts):
+    return datetime.fromtimestamp(ts).strftime("%H:%M:%S.%f")[:-3]
+
+
+def classify(text):
+    """按消息前缀推断级别 (引擎日志以 ❌ / ⚠️ 标记错误与警告)"""
+    t = text.lstrip()
+    if t.startswith("❌"):
+        return LEVEL_ERROR
+    if t.startswith("⚠"):
+        return LEVEL_WARNING
+    return LEVEL_INFO
+
+
+class LogView(QWidget):
+    """
+    运行日志视图：消息先进入待显示队列，由定时器合并后一次性追加 (不再每条消息重排整个文档)。
+    控件与内存中只保留最近 LOG_VIEW_MAX_LINES 行，完整记录见 sys_logger 的日志文件。
+    汇总模式下逐文件的成功记录合并为 "✅ N 个文件处理成功"；级别过滤对已显示的内容同样生效。
+    """
+
+    def __init__(self, parent=None, log_file=None):
+        super().__init__(parent)
+        self.log_file = log_file
+        self.theme = "dark"
+        # 最近的消息 (切换过滤 / 汇总时据此重绘)；待显示的消息；队列溢出丢弃的条数
+        self.history = deque(maxlen=LOG_VIEW_MAX_LINES)
+        self.pending = deque()
+        self.dropped = 0
+        self._tail_run = 0
+        self.counts = {LEVEL_FILE: 0, LEVEL_WARNING: 0, LEVEL_ERROR: 0}
+
+        layout = QVBoxLayout(self)
+        layout.setContentsMargins(0, 0, 0, 0)
+
+        bar = QHBoxLayout()
+        self.cmb_filter = QComboBox()
+        for name, level in FILTERS:
+            self.cmb_filter.addItem(name, level)
+        self.cmb_filter.currentIndexChanged.connect(self.rerender)
+        self.chk_summary = QCheckBox("汇总成功文件")
+        self.chk_summary.setChecked(True)
+        self.chk_summary.toggled.connect(self.rerender)
+        self.lbl_counts = QLabel()
+        btn_clear = QPushButton("清空")
+        btn_clear.clicked.connect(self.clear)
+        btn_open = QPushButton("打开完整日志")
+        btn_open.clicked.connect(self.open_log_file)
+        bar.addWidget(QLabel("级别:"))
+        bar.addWidget(self.cmb_filter)
+        bar.addWidget(self.chk_summary)
+        bar.addStretch()
+        bar.addWidget(self.lbl_counts)
+        bar.addWidget(btn_clear)
+        bar.addWidget(btn_open)
+        layout.addLayout(bar)
+
+        self.text = QPlainTextEdit()
+        self.text.setReadOnly(True)
+        self.text.setUndoRedoEnabled(False)
+        self.text.setMaximumBlockCount(LOG_VIEW_MAX_LINES)
+        layout.addWidget(self.text)
+
+        self._update_counts()
+
+        self.timer = QTimer(self)
+        self.timer.timeout.connect(self.flush)
+        self.timer.start(LOG_VIEW_FLUSH_MS)
+
+    # ---------- 写入 (只入队，不触碰控件) ----------
+    def append(self, text, level=None):
+        self._push(classify(text) if level is None else level, text)
+
+    def add_result(self, name, success, detail=""):
+        if success:
+            self._push(LEVEL_FILE, f"✅ {name}")
+        else:
+            self._push(LEVEL_ERROR, f"❌ {name}: {detail}")
+
+    def _push(self, level, text):
+        entry = (time.time(), level, text)
+        self.history.append(entry)
+        if level in self.counts:
+            self.counts[level] += 1
+        # 待显示队列超过一屏可保留的行数时丢弃最早的 (控件同样只保留这么多行)
+        if len(self.pending) >= LOG_VIEW_MAX_LINES:
+            self.pending.popleft()
+            self.dropped += 1
+        self.pending.append(entry)
+
+    # ---------- 显示 ----------
+    def _visible(self, entries):
+        """按过滤与汇总设置生成显示行 [(时间, 级别, 文本, 合并条数)]：连续的成功记录合并为一行"""
+        min_level = self.cmb_filter.currentData()
+        summary = self.chk_summary.isChecked()
+        lines, run, last_time = [], 0, None
+        for ts, level, text in entries:
+            if level < min_level:
+                continue
+            if level == LEVEL_FILE and summary:
+                run += 1
+                last_time = ts
+                continue
+            if run:
+                lines.append((last_time, LEVEL_FILE, None, run))
+                run = 0
+            lines.append((ts, level, text, 0))
+        if run:
+            lines.append((last_time, LEVEL_FILE, None, run))
+        return lines
+
+    def _write(self, lines, dropped=0):
+        """整批拼成一段 HTML 追加 (每行一个段落)，超出 LOG_VIEW_MAX_LINES 的旧行由控件自动移除"""
+        if not lines and not dropped:
+            return
+        if dropped:
+            lines = [(time.time(), LEVEL_WARNING,
+                      f"⚠️ 消息过多，已省略 {dropped} 条 (完整记录见日志文件)", 0)] + lines
+        elif lines[0][3] and self._tail_run:
+            # 与上次刷新末尾的汇总行相接：替换该行更新计数，而不是每次刷新追加一行
+            ts, level, _, run = lines[0]
+            lines[0] = (ts, level, None, run + self._tail_run)
+            self._remove_last_line()
+        self._tail_run = lines[-1][3]
+
+        colors = _COLORS[self.theme]
+        html = "".join(f"<div><span style='color:{colors['time']}'>[{_clock(ts)}]</span> "
+                       f"<span style='color:{colors[level]}'>"
+                       f"{escape(text) if not run else f'✅ {run} 个文件处理成功'}</span></div>"
+                       for ts, level, text, run in lines)
+        bar = self.text.verticalScrollBar()
+        at_bottom = bar.value() >= bar.maximum() - 4
+        self.text.appendHtml(html)
+        if at_bottom:
+            bar.setValue(bar.maximum())
+
+    def _remove_last_line(self):
+        doc = self.text.document()
+        if doc.blockCount() <= 1:
+            self.text.clear()
+            return
+        cursor = QTextCursor(doc)
+        cursor.movePosition(QTextCursor.End)
+        cursor.select(QTextCursor.BlockUnderCursor)
+        cursor.removeSelectedText()
+
+    def flush(self):
+        """定时器回调：合并待显示的消息，每次最多写入 LOG_VIEW_FLUSH_LINES 行"""
+        if not self.pending and not self.dropped:
+            return
+        summary = self.chk_summary.isChecked()
+        entries = []
+        shown = 0
+        while self.pending and shown < LOG_VIEW_FLUSH_LINES:
+            entry = self.pending.popleft()
+            entries.append(entry)
+            if not (summary and entry[1] == LEVEL_FILE):
+                shown += 1
+        dropped, self.dropped = self.dropped, 0
+        self._write(self._visible(entries), dropped)
+        self._update_counts()
+
+    def rerender(self):
+        """切换过滤 / 汇总后按内存中的最近记录重绘"""
+        self.pending.clear()
+        self.dropped = 0
+        self._tail_run = 0
+        self.text.clear()
+        self._write(self._visible(self.history))
+
+    def clear(self):
+        self.history.clear()
+        self.pending.clear()
+        self.dropped = 0
+        self._tail_run = 0
+        for level in self.counts:
+            self.counts[level] = 0
+        self.text.clear()
+        self._update_counts()
+
+    def _update_counts(self):
+        self.lbl_counts.setText(f"成功 {self.counts[LEVEL_FILE]}  警告 {self.counts[LEVEL_WARNING]}  "
+                                f"错误 {self.counts[LEVEL_ERROR]}")
+
+    def set_theme(self, theme):
+        if theme != self.theme:
+            self.theme = theme
+            self.rerender()
+
+    def open_log_file(self):
+        path = self.log_file() if callable(self.log_file) else self.log_file
+        if path and os.path.exists(path):
+            QDesktopServices.openUrl(QUrl.fromLocalFile(path))
@@ -1,28 +1,19 @@
 import os
-import time
-import threading
-import hashlib
-import multiprocessing
-import shutil
-import base64
-from concurrent.futures import ProcessPoolExecutor
-from datetime import datetime
 from PySide6.QtWidgets import (QMainWindow, QWidget, QVBoxLayout, QHBoxLayout,
                                QTabWidget, QPushButton, QLabel, QFileDialog,
-                               QGroupBox, QTextEdit, QLineEdit, QProgressBar,
-                               QMessageBox, QListWidget, QAbstractItemView,
-                               QFrame, QStackedWidget, QApplication, QCheckBox)
-from PySide6.QtCore import QThread, Signal, Qt, QUrl
+                               QGroupBox, QLineEdit, QProgressBar,
+                               QMessageBox, QListView, QAbstractItemView,
+                               QFrame, QStackedWidget, QApplication, QCheckBox, QComboBox,
+                               QInputDialog, QSpinBox)
+from PySide6.QtCore import QObject, Signal, Qt, QUrl, QTimer
 from PySide6.QtGui import QDesktopServices, QPainter, QColor
 
-from config import DIRS
-from core.file_cipher import FileCipherEngine
+from config import DIRS, QOS_BACKGROUND_NICE
+from core.job_scheduler import JobScheduler
+from core.journal import find_unfinished, prune_finished, STATUS_ABANDONED
 from core.logger import sys_logger
-
-try:
-    from ui.splash import IntroScreen
-except ImportError:
-    pass
+from ui.queue_model import FileQueueModel, DirectoryScanThread
+from ui.log_view import LogView
 
 # ================= 样式表 =================
 DARK_THEME = """
@@ -30,10 +21,11 @@ QMainWindow, QWidget { background-color: #1c1c1e; color: #ffffff; font-family: '
 QFrame#TopBar { background-color: rgba(44, 44, 46, 0.8); border-bottom: 1px solid rgba(84, 84, 88, 0.6); }
 QGroupBox { border: none; border-radius: 12px; margin-top: 28px; background-color: #2c2c2e; padding-top: 20px; }
 QGroupBox::title { subcontrol-origin: margin; subcontrol-position: top left; left: 10px; color: #8e8e93; font-weight: 600; }
-QListWidget { background-color: rgba(0, 0, 0, 0.2); border-radius: 10px; padding: 5px; }
-QListWidget::item { height: 36px; padding-left: 10px; color: #dddddd; }
-QListWidget::item:selected { background-color: #0a84ff; color: #ffffff; }
-QLineEdit, QTextEdit { background-color: rgba(0, 0, 0, 0.2); border-radius: 8px; color: #ffffff; padding: 8px; }
+QListView { background-color: rgba(0, 0, 0, 0.2); border-radius: 10px; padding: 5px; }
+QListView::item { height: 36px; padding-left: 10px; color: #dddddd; }
+QListView::item:selected { background-color: #0a84ff; color: #ffffff; }
+QLineEdit, QTextEdit, QPlainTextEdit { background-color: rgba(0, 0, 0, 0.2); border-radius: 8px; color: #ffffff; padding: 8px; }
+QComboBox, QSpinBox { background-color: rgba(0, 0, 0, 0.2); border-radius: 8px; color: #ffffff; padding: 6px 8px; }
 QPushButton { background-color: rgba(255, 255, 255, 0.08); color: #ffffff; border-radius: 8px; padding: 8px 16px; }
 QPushButton:hover { background-color: rgba(255, 255, 255, 0.15); }
 QPushButton[class="primary"] { background-color: #0a84ff; font-weight: 600; }
@@ -54,10 +46,11 @@ QMainWindow, QWidget { background-color: #f2f2f7; color: #000000; font-family: '
 QFrame#TopBar { background-color: rgba(255, 255, 255, 0.7); border-bottom: 1px solid rgba(0, 0, 0, 0.05); }
 QGroupBox { border: 1px solid rgba(0,0,0,0.03); border-radius: 12px; margin-top: 28px; background-color: #ffffff; padding-top: 20px; }
 QGroupBox::title { subcontrol-origin: margin; subcontrol-position: top left; left: 10px; color: #8e8e93; font-weight: 600; }
-QListWidget { background-color: #f2f2f7; border-radius: 10px; padding: 5px; }
-QListWidget::item { height: 36px; padding-left: 10px; color: #1c1c1e; }
-QListWidget::item:selected { background-color: #007aff; color: #ffffff; }
-QLineEdit, QTextEdit { background-color: #f2f2f7; border-radius: 8px; color: #1c1c1e; padding: 8px; }
+QListView { background-color: #f2f2f7; border-radius: 10px; padding: 5px; }
+QListView::item { height: 36px; padding-left: 10px; color: #1c1c1e; }
+QListView::item:selected { background-color: #007aff; color: #ffffff; }
+QLineEdit, QTextEdit, QPlainTextEdit { background-color: #f2f2f7; border-radius: 8px; color: #1c1c1e; padding: 8px; }
+QComboBox, QSpinBox { background-color: #f2f2f7; border-radius: 8px; color: #1c1c1e; padding: 6px 8px; }
 QPushButton { background-color: #ffffff; color: #000000; border: 1px solid rgba(0,0,0,0.1); border-radius: 8px; padding: 8px 16px; }
 QPushButton:hover { background-color: #f9f9f9; }
 QPushButton[class="primary"] { background-color: #007aff; color: #ffffff; border: none; font-weight: 600; }
@@ -75,14 +68,52 @@ QCheckBox:disabled { color: #aaaaaa; }
 
 
 # ================= 组件：拖拽列表 =================
-class DragDropListWidget(QListWidget):
+class DragDropListView(QListView):
+    """
+    任务队列视图：基于 FileQueueModel，拖入的文件夹交给后台线程枚举，
+    结果分批追加，窗口在枚举数十万文件时仍保持响应。
+    """
+    sig_changed = Signal()
+
     def __init__(self, parent=None):
         super().__init__(parent)
         self.setAcceptDrops(True)
         self.setDragDropMode(QAbstractItemView.DropOnly)
         self.setSelectionMode(QAbstractItemView.ExtendedSelection)
+        # 统一行高：视图无需逐行测量，百万行也能即时滚动
+        self.setUniformItemSizes(True)
+        self.queue_model = FileQueueModel(self)
+        self.setModel(self.queue_model)
         self.theme_mode = "dark"
+        self._scanners = []
+
+    # ---------- 兼容旧 QListWidget 用法 ----------
+    def count(self):
+        return self.queue_model.rowCount()
+
+    def clear(self):
+        for t in self._scanners:
+            t.stop()
+        self.queue_model.clear()
+
+    def add_paths(self, paths):
+        added = self.queue_model.add_paths(paths)
+        if added:
+            self.sig_changed.emit()
+        return added
+
+    def paths(self):
+        return self.queue_model.paths()
 
+    def remove_selected(self):
+        rows = [idx.row() for idx in self.selectionModel().selectedRows()]
+        self.queue_model.remove_rows(rows)
+
+    @property
+    def is_scanning(self):
+        return bool(self._scanners)
+
+    # ---------- 拖放 ----------
     def dragEnterEvent(self, e):
         e.acceptProposedAction() if e.mimeData().hasUrls() else None
 
@@ -92,34 +123,26 @@ class DragDropListWidget(QListWidget):
     def dropEvent(self, e):
         if e.mimeData().hasUrls():
             e.accept()
-            added = False
-            existing_files = set()
-            for i in range(self.count()):
-                existing_files.add(self.item(i).text())
-
-            for url in e.mimeData().urls():
-                path = url.toLocalFile()
-                if os.path.isfile(path):
-                    if path not in existing_files:
-                        self.addItem(path)
-                        existing_files.add(path)
-                        added = True
-                elif os.path.isdir(path):
-                    for root, dirs, files in os.walk(path):
-                        for file in files:
-                            full_path = os.path.join(root, file)
-                            full_path = os.path.normpath(full_path)
-                            if full_path not in existing_files:
-                                self.addItem(full_path)
-                                existing_files.add(full_path)
-                                added = True
-
-            if added and self.window():
-                try:
-                    self.window().check_constraints()
-                    self.window().reset_ui_state(self.window().tabs.currentIndex() == 0)
-                except:
-                    pass
+            paths = [url.toLocalFile() for url in e.mimeData().urls()]
+            paths = [os.path.normpath(p) for p in paths if p]
+            if paths:
+                self.scan_paths(paths)
+
+    def scan_paths(self, paths):
+        """后台枚举文件/文件夹，分批加入队列"""
+        thread = DirectoryScanThread(paths, self)
+        thread.sig_batch.connect(self.add_paths)
+        thread.finished.connect(lambda: self._on_scan_finished(thread))
+        self._scanners.append(thread)
+        thread.start()
+        self.viewport().update()
+
+    def _on_scan_finished(self, thread):
+        if thread in self._scanners:
+            self._scanners.remove(thread)
+        thread.deleteLater()
+        self.viewport().update()
+        self.sig_changed.emit()
 
     def paintEvent(self, event):
         super().paintEvent(event)
@@ -131,440 +154,50 @@ class DragDropListWidget(QListWidget):
             font = self.font()
             font.setPointSize(10)
             painter.setFont(font)
-            painter.drawText(self.viewport().rect(), Qt.AlignCenter, "请将文件或文件夹拖入此区域")
+            text = "正在枚举文件..." if self.is_scanning else "请将文件或文件夹拖入此区域"
+            painter.drawText(self.viewport().rect(), Qt.AlignCenter, text)
             painter.restore()
 
 
-# ================= 辅助函数与常量 =================
-
-ENC_PREFIX = "ENC_DIR_"
-
-
-def format_size(size_bytes):
-    if size_bytes == 0: return "0 B"
-    units = ("B", "KB", "MB", "GB", "TB")
-    i = 0
-    while size_bytes >= 1024 and i < len(units) - 1:
-        size_bytes /= 1024
-        i += 1
-    return f"{size_bytes:.2f} {units[i]}"
-
-
-def get_drive_root(path):
-    """获取路径所在的驱动器根目录"""
-    path = os.path.abspath(path)
-    while not os.path.ismount(path):
-        parent = os.path.dirname(path)
-        if parent == path:
-            return parent
-        path = parent
-    return path
-
-
-def encrypt_dir_name_str(dir_name):
-    """加密文件夹名：添加前缀并Base64"""
-    try:
-        # 避免重复加密
-        if dir_name.startswith(ENC_PREFIX): return dir_name
-        encoded = base64.urlsafe_b64encode(dir_name.encode()).decode()
-        return f"{ENC_PREFIX}{encoded}"
-    except:
-        return dir_name
-
-
-def decrypt_dir_name_str(dir_name):
-    """【智能检测】只有当文件夹名包含特征前缀时才解密"""
-    if dir_name.startswith(ENC_PREFIX):
-        try:
-            encoded = dir_name[len(ENC_PREFIX):]
-            return base64.urlsafe_b64decode(encoded.encode()).decode()
-        except:
-            return dir_name
-    # 否则原样返回
-    return dir_name
-
-
-# ================= 跨进程任务 Wrapper =================
-def task_wrapper(file_path, target_full_path, key_bytes, is_enc, enc_name, queue, stop_event, pause_event):
+# ================= 批处理任务句柄 =================
+class BatchJob(QObject):
     """
-    进程池任务：直接调用 Engine 将 file_path 处理到 target_full_path。
+    调度器任务的 Qt 句柄：任务在 JobScheduler 的调度线程中执行，
+    回调转为信号后跨线程排队到界面线程。先连接信号，再调用 start() 提交。
     """
-    from core.file_cipher import FileCipherEngine
-    import time
-
-    class MPController:
-        def is_stop_requested(self):
-            return stop_event.is_set()
-
-        def wait_if_paused(self):
-            pause_event.wait()
-
-    last_update = 0
-
-    def mp_callback(current, total):
-        nonlocal last_update
-        now = time.time()
-        # 减少 IPC 通信频率，每 0.05s 发送一次
-        if now - last_update > 0.05 or current == total:
-            queue.put(("PROGRESS", file_path, current, total))
-            last_update = now
-
-    engine = FileCipherEngine()
-    try:
-        # 发送开始信号
-        queue.put(("START", file_path, os.path.getsize(file_path)))
-
-        # 调用核心处理函数 process_file_direct
-        success, msg, out_path = engine.process_file_direct(
-            file_path, target_full_path, key_bytes, is_enc,
-            encrypt_filename=enc_name,
-            callback=mp_callback,
-            controller=MPController()
-        )
-        return (file_path, success, msg, out_path)
-    except Exception as e:
-        # 捕获异常转为失败消息
-        return (file_path, False, str(e), "")
-
-
-# ================= 核心工作线程 =================
-class BatchWorkerThread(QThread):
     sig_progress = Signal(str, int)
     sig_log = Signal(str)
+    sig_result = Signal(str, bool, str)
     sig_finished = Signal(dict)
 
-    def __init__(self, files, key, is_encrypt, encrypt_filename=False,
-                 custom_out_dir=None,
-                 keep_structure=False, encrypt_dirname=False,
-                 use_ssd=False, ssd_dir=None):
+    def __init__(self, scheduler, files, key, is_encrypt, priority="NORMAL", **options):
         super().__init__()
-        self.files = files
-        self.key = key
         self.is_enc = is_encrypt
-        self.enc_name = encrypt_filename
-        self.custom_out = custom_out_dir
-
-        self.keep_structure = keep_structure
-        self.encrypt_dirname = encrypt_dirname
-        self.use_ssd = use_ssd
-        self.ssd_dir = ssd_dir
-
-        self.manager = multiprocessing.Manager()
-        self.queue = self.manager.Queue()
-        self.stop_event = self.manager.Event()
-        self.pause_event = self.manager.Event()
-        self.pause_event.set()
-        self._is_running = True
+        self.scheduler = scheduler
+        self.job = None
+        self._args = (files, key, is_encrypt)
+        self._options = dict(options, priority=priority)
+
+    def start(self):
+        self.job = self.scheduler.submit(*self._args,
+                                         on_progress=self.sig_progress.emit,
+                                         on_log=self.sig_log.emit,
+                                         on_result=self.sig_result.emit,
+                                         on_finished=self.sig_finished.emit,
+                                         **self._options)
 
     def pause(self):
-        self.pause_event.clear()
+        if self.job: self.scheduler.pause(self.job)
 
     def resume(self):
-        self.pause_event.set()
+        if self.job: self.scheduler.resume(self.job)
 
     def stop(self):
-        self.stop_event.set()
-        self._is_running = False
-
-    def run(self):
-        # 1. 预计算密钥字节流 (SHA256)
-        key_bytes = hashlib.sha256(self.key.encode()).digest()
-
-        results = {"success": [], "fail": []}
-
-        # 2. 扫描与计算总大小
-        valid_files = []
-        total_bytes = 0
-        self.processed_bytes_map = {}
-
-        # 计算公共基准路径
-        common_base = ""
-        if self.keep_structure and len(self.files) > 0:
-            try:
-                common_base = os.path.commonpath(self.files)
-                if os.path.isfile(common_base): common_base = os.path.dirname(common_base)
-            except:
-                pass
-
-        self.sig_log.emit("--- 正在扫描任务队列 ---")
-        for f in self.files:
-            if os.path.exists(f):
-                s = os.path.getsize(f)
-                total_bytes += s
-                valid_files.append(f)
-                self.processed_bytes_map[f] = 0
-            else:
-                results["fail"].append((f, "文件不存在"))
-
-        if not valid_files:
-            self.sig_finished.emit(results)
-            return
-
-        # 3. SSD 空间检测 & 路径规划
-        temp_stage_root = None
-        working_root_base = None  # 实际写入的根目录
-
-        if self.use_ssd and self.ssd_dir:
-            try:
-                # 获取分区根目录，创建临时暂存区
-                drive_root = get_drive_root(self.ssd_dir)
-                temp_stage_root = os.path.join(drive_root, "_SSD_ENCRYPT_STAGE_TEMP")
-
-                # 【检测】SSD 空间是否足够 (预留 1.2 倍)
-                usage = shutil.disk_usage(self.ssd_dir)
-                required = total_bytes * 1.2
-
-                if usage.free < required:
-                    self.sig_log.emit(
-                        f"⚠️ [空间检测] SSD 剩余空间不足! 需 {format_size(required)}, 余 {format_size(usage.free)}")
-                    self.sig_log.emit("⚠️ 已自动降级为直接写入模式")
-                    self.use_ssd = False
-                    working_root_base = self.custom_out  # 降级后直接写目标
-                else:
-                    self.sig_log.emit(f"✅ [SSD 加速] 已启用。暂存区: {temp_stage_root}")
-                    self.sig_log.emit("ℹ️ 提示: SSD 加速时内存占用升高属于正常系统缓存现象")
-                    # 清理并重建暂存区
-                    if os.path.exists(temp_stage_root): shutil.rmtree(temp_stage_root, ignore_errors=True)
-                    os.makedirs(temp_stage_root, exist_ok=True)
-                    working_root_base = temp_stage_root
-
-            except Exception as e:
-                self.sig_log.emit(f"❌ SSD 检测出错: {e}, 已禁用加速")
-                self.use_ssd = False
-                working_root_base = self.custom_out
-        else:
-            working_root_base = self.custom_out
-
-        # 4. 任务分发
-        max_workers = min(os.cpu_count(), len(valid_files))
-        # 如果是 SSD，IO 吞吐大，可以多开几个线程
-        if self.use_ssd: max_workers = max(max_workers, 4)
-
-        self.sig_log.emit(f"🚀 启动 {max_workers} 个加密核心...")
-
-        with ProcessPoolExecutor(max_workers=max_workers) as executor:
-            futures = []
-
-            for f_path in valid_files:
-                # --- A. 确定该文件的输出基准目录 ---
-                if not self.use_ssd and not self.custom_out:
-                    current_base = os.path.dirname(f_path)
-                else:
-                    current_base = working_root_base
-
-                # --- B. 计算相对结构 (智能解密检测在这里发生) ---
-                rel_path_struct = ""
-                if self.keep_structure and common_base:
-                    try:
-                        rel = os.path.relpath(os.path.dirname(f_path), common_base)
-                        if rel == ".": rel = ""
-
-                        # 处理每一层文件夹名
-                        parts = rel.split(os.sep)
-                        processed_parts = []
-                        for p in parts:
-                            if not p: continue
-                            if self.is_enc:
-                                # 【加密模式】：根据勾选决定是否加密目录名
-                                if self.encrypt_dirname:
-                                    processed_parts.append(encrypt_dir_name_str(p))
-                                else:
-                                    processed_parts.append(p)
-                            else:
-                                # 【解密模式】：强制自动检测前缀，不需要用户干预
-                                # 如果有 ENC_DIR_ 前缀就解密，没有就原样
-                                processed_parts.append(decrypt_dir_name_str(p))
-
-                        rel_path_struct = os.sep.join(processed_parts)
-                    except:
-                        rel_path_struct = ""
-
-                # --- C. 组合完整输出路径 ---
-                final_out_dir = os.path.join(current_base, rel_path_struct)
-
-                # 确定文件名
-                fname = os.path.basename(f_path)
-                if self.is_enc:
-                    target_file_path = os.path.join(final_out_dir, fname + ".enc")
-                else:
-                    target_file_path = os.path.join(final_out_dir, fname)
-
-                # 提交任务
-                futures.append(executor.submit(
-                    task_wrapper,
-                    f_path, target_file_path, key_bytes, self.is_enc, self.enc_name,
-                    self.queue, self.stop_event, self.pause_event
-                ))
-
-            # 5. 进度监听 (SSD模式下，此阶段占60%)
-            finished_count = 0
-            prog_factor = 0.6 if self.use_ssd else 1.0
-
-            while finished_count < len(valid_files) and self._is_running:
-                try:
-                    while not self.queue.empty():
-                        msg_type, *data = self.queue.get_nowait()
-                        if msg_type == "PROGRESS":
-                            fp, curr, _ = data
-                            self.processed_bytes_map[fp] = curr
-                except:
-                    pass
-
-                QThread.msleep(50)
-
-                done = sum(self.processed_bytes_map.values())
-                if total_bytes > 0:
-                    pct = int((done / total_bytes) * 100 * prog_factor)
-                    self.sig_progress.emit(f"正在处理... {pct}%", pct)
-
-                done_futures = [f for f in futures if f.done()]
-                if len(done_futures) > finished_count:
-                    for f in done_futures:
-                        if getattr(f, '_handled', False): continue
-                        f._handled = True
-                        finished_count += 1
-                        try:
-                            fp, success, msg, outp = f.result()
-                            if success:
-                                results["success"].append((fp, outp))
-                                self.sig_log.emit(f"✅ {os.path.basename(fp)}")
-                            else:
-                                results["fail"].append((fp, msg))
-                                self.sig_log.emit(f"❌ {os.path.basename(fp)}: {msg}")
-                        except Exception as e:
-                            self.sig_log.emit(f"❌ 异常: {e}")
-
-            if not self._is_running:
-                executor.shutdown(wait=False, cancel_futures=True)
-
-        # 6. SSD 模式收尾：统一回写 (修复了 80% 卡顿问题)
-        if self.use_ssd and self._is_running and temp_stage_root:
-            self.sig_log.emit("--- ⚡ SSD 高速回写 (平滑传输) ---")
-
-            try:
-                final_dest_root = self.custom_out
-                # 如果没有自定义输出目录，回写到 common_base 或源文件所在目录
-                if not final_dest_root:
-                    final_dest_root = common_base if common_base else os.path.dirname(self.files[0])
-
-                if not os.path.exists(final_dest_root):
-                    os.makedirs(final_dest_root, exist_ok=True)
-
-                items = os.listdir(temp_stage_root)
-
-                # 【改动】预先计算回写阶段的总字节数，用于平滑进度
-                total_stage_bytes = 0
-                for item in items:
-                    src_p = os.path.join(temp_stage_root, item)
-                    if os.path.isfile(src_p):
-                        total_stage_bytes += os.path.getsize(src_p)
-                    # 简化处理：如果是文件夹暂不递归细算，通常SSD缓存是扁平或加密结构的
-                    elif os.path.isdir(src_p):
-                        # 简单估算，或者遍历累加
-                        for root, _, fs in os.walk(src_p):
-                            for f in fs: total_stage_bytes += os.path.getsize(os.path.join(root, f))
-
-                if total_stage_bytes == 0: total_stage_bytes = 1  # 防止除零
-
-                moved_bytes = 0
-
-                for item in items:
-                    if not self._is_running: break
-                    src_item = os.path.join(temp_stage_root, item)
-                    dst_item = os.path.join(final_dest_root, item)
-
-                    if os.path.exists(dst_item):
-                        if os.path.isdir(dst_item):
-                            shutil.rmtree(dst_item)
-                        else:
-                            os.remove(dst_item)
-
-                    # 执行移动并获取增量字节 (更新 moved_bytes)
-                    moved_bytes = self._manual_move(src_item, dst_item, moved_bytes, total_stage_bytes)
-
-                shutil.rmtree(temp_stage_root)
-                self.sig_log.emit("✅ 回写完成，缓存已清理")
-
-            except Exception as e:
-                self.sig_log.emit(f"❌ 回写失败: {e} | 数据保留在: {temp_stage_root}")
-
-        msg = "任务完成" if self._is_running else "已终止"
-        self.sig_progress.emit(msg, 100)
-        self.sig_finished.emit(results)
-
-    def _manual_move(self, src, dst, current_moved_total, total_stage_bytes):
-        """
-        手动移动函数：支持跨盘符平滑进度更新。
-        返回: 更新后的 current_moved_total
-        """
-        try:
-            # 1. 尝试原子重命名 (同盘符极快)
-            # 在 Linux/Unix 下 os.rename 可跨文件系统吗？通常不行。Windows 也不行。
-            # 先检查是否在同一设备
-            src_dev = os.stat(src).st_dev
-            dst_dir = os.path.dirname(dst)
-            if not os.path.exists(dst_dir): os.makedirs(dst_dir, exist_ok=True)
-            dst_dev = os.stat(dst_dir).st_dev
-
-            is_dir = os.path.isdir(src)
-
-            # 如果在同一设备，直接移动（瞬间完成），直接加进度
-            if src_dev == dst_dev:
-                shutil.move(src, dst)
-                # 计算大小增量
-                if is_dir:
-                    size = 0
-                    for r, _, fs in os.walk(dst):
-                        for f in fs: size += os.path.getsize(os.path.join(r, f))
-                    return current_moved_total + size
-                else:
-                    return current_moved_total + os.path.getsize(dst)
-
-            # 2. 跨设备移动 (SSD -> HDD)：手动复制并更新进度
-            if is_dir:
-                # 文件夹递归处理略复杂，这里简化使用 shutil.move 但无法细粒度更新
-                # 或者使用 shutil.copytree 的机制。
-                # 考虑到加密结构通常是单文件处理，这里如果是目录，直接 move
-                # 除非我们重写 copytree。为保持稳定性，目录仍用 move，文件用流式。
-                shutil.move(src, dst)
-                # 估算增加进度
-                size = 0
-                for r, _, fs in os.walk(dst):
-                    for f in fs: size += os.path.getsize(os.path.join(r, f))
-                return current_moved_total + size
+        if self.job: self.scheduler.stop(self.job)
 
-            else:
-                # 文件：手动流式复制
-                f_size = os.path.getsize(src)
-                chunk_size = 10 * 1024 * 1024  # 10MB chunk
-
-                with open(src, 'rb') as fsrc, open(dst, 'wb') as fdst:
-                    while True:
-                        if not self._is_running: raise InterruptedError("Stopped")
-                        buf = fsrc.read(chunk_size)
-                        if not buf: break
-                        fdst.write(buf)
-
-                        # 【核心】细粒度更新进度
-                        current_moved_total += len(buf)
-                        # 映射到 60% - 100% 区间
-                        pct = 60 + int((current_moved_total / total_stage_bytes) * 40)
-                        pct = min(pct, 99)
-                        self.sig_progress.emit(f"回写数据... {pct}%", pct)
-
-                # 复制完后删除源
-                os.remove(src)
-                # 复制元数据
-                shutil.copystat(src, dst) if os.path.exists(src) else None
-
-                return current_moved_total
-
-        except Exception as e:
-            self.sig_log.emit(f"⚠️ 手动移动警告: {e}, 尝试回退到 shutil.move")
-            if os.path.exists(src) and not os.path.exists(dst):
-                shutil.move(src, dst)
-                return current_moved_total + os.path.getsize(dst)
-            return current_moved_total
+    def set_rate_limit(self, bytes_per_sec):
+        if self.job: self.scheduler.set_rate_limit(self.job, bytes_per_sec)
+        else: self._options["rate_limit"] = bytes_per_sec
 
 
 # ================= 主窗口 =================
@@ -580,12 +213,18 @@ class MainWindow(QMainWindow):
         self.custom_dec_path = None
         self.custom_ssd_path = None
         self.last_out_dir = ""
-        self.is_paused = False
-        self.worker = None
+        # 加密与解密各自一个任务，共用同一个调度器 / 进程池，可同时运行
+        self.scheduler = JobScheduler()
+        self.workers = {True: None, False: None}
+        self.paused = {True: False, False: False}
 
         self._init_ui()
         self.apply_theme()
 
+        # 窗口显示后再检查中断的任务 (不阻塞启动)
+        prune_finished()
+        QTimer.singleShot(0, self.check_unfinished_jobs)
+
     def _init_ui(self):
         container = QWidget()
         self.setCentralWidget(container)
@@ -630,8 +269,9 @@ class MainWindow(QMainWindow):
         # 左侧列表
         grp_left = QGroupBox("文件处理队列")
         v_left = QVBoxLayout(grp_left)
-        file_list = DragDropListWidget()
+        file_list = DragDropListView()
         file_list.theme_mode = "dark" if self.is_dark else "light"
+        file_list.sig_changed.connect(lambda: self._on_queue_changed(is_encrypt))
         btn_bar = QHBoxLayout()
         btn_add = QPushButton("添加文件...")
         btn_add.clicked.connect(lambda: self.action_add_file(is_encrypt))
@@ -742,8 +382,42 @@ class MainWindow(QMainWindow):
             chk_del = QCheckBox("解密后移除加密包")
             v_right.addWidget(chk_del)
 
+        # 删除前覆写 (仅在勾选删除时可用)
+        chk_wipe = QCheckBox("删除前覆写源文件 (安全擦除，较慢)")
+        chk_wipe.setEnabled(False)
+        chk_del.stateChanged.connect(lambda state: chk_wipe.setEnabled(state == 2))
+        v_right.addWidget(chk_wipe)
+
+        # 性能诊断：记录执行时间线 (Logs/Trace，可用 ui.perfetto.dev 打开)
+        chk_trace = QCheckBox("记录执行时间线 (性能诊断)")
+        v_right.addWidget(chk_trace)
+
         v_right.addStretch()
 
+        # --- 任务优先级 (多个任务同时运行时按优先级分配处理核心) ---
+        h_prio = QHBoxLayout()
+        h_prio.addWidget(QLabel("任务优先级:"))
+        cmb_prio = QComboBox()
+        cmb_prio.addItem("普通", "NORMAL")
+        cmb_prio.addItem("高 (紧急任务优先处理)", "HIGH")
+        cmb_prio.addItem("低 (后台慢慢处理)", "LOW")
+        h_prio.addWidget(cmb_prio, 1)
+        v_right.addLayout(h_prio)
+
+        # --- 后台 QoS：降低 CPU/IO 优先级 + 限速 (运行中可调)，避免影响同机的其他服务 ---
+        h_qos = QHBoxLayout()
+        chk_bg = QCheckBox("后台模式 (低 CPU/IO 优先级)")
+        h_qos.addWidget(chk_bg)
+        h_qos.addStretch()
+        h_qos.addWidget(QLabel("限速:"))
+        spin_rate = QSpinBox()
+        spin_rate.setRange(0, 10000)
+        spin_rate.setSuffix(" MB/s")
+        spin_rate.setSpecialValueText("不限")
+        spin_rate.valueChanged.connect(lambda v: self.action_set_rate_limit(is_encrypt, v))
+        h_qos.addWidget(spin_rate)
+        v_right.addLayout(h_qos)
+
         lbl_status = QLabel("等待指令")
         lbl_status.setAlignment(Qt.AlignCenter)
         lbl_status.setStyleSheet("color: #888; font-weight: bold;")
@@ -773,11 +447,11 @@ class MainWindow(QMainWindow):
         l_ctrl.setSpacing(10)
         btn_pause = QPushButton("挂起任务")
         btn_pause.setMinimumHeight(48)
-        btn_pause.clicked.connect(self.action_toggle_pause)
+        btn_pause.clicked.connect(lambda: self.action_toggle_pause(is_encrypt))
         btn_stop = QPushButton("终止操作")
         btn_stop.setProperty("class", "danger")
         btn_stop.setMinimumHeight(48)
-        btn_stop.clicked.connect(self.action_stop_task)
+        btn_stop.clicked.connect(lambda: self.action_stop_task(is_encrypt))
         l_ctrl.addWidget(btn_pause)
         l_ctrl.addWidget(btn_stop)
         stack.addWidget(w_ctrl)
@@ -803,11 +477,12 @@ class MainWindow(QMainWindow):
 
         refs = {
             "list": file_list, "pwd": txt_pwd, "path": txt_path,
-            "chk_name": chk_name, "chk_del": chk_del,
+            "chk_name": chk_name, "chk_del": chk_del, "chk_wipe": chk_wipe,
             "chk_struct": chk_struct, "chk_dir_name_enc": chk_dir_name_enc,
             "chk_ssd": chk_ssd, "txt_ssd": txt_ssd,
             "status": lbl_status, "pbar": pbar, "stack": stack,
-            "btn_pause": btn_pause
+            "btn_pause": btn_pause, "priority": cmb_prio,
+            "chk_bg": chk_bg, "rate": spin_rate, "chk_trace": chk_trace
         }
         return page, refs
 
@@ -827,9 +502,8 @@ class MainWindow(QMainWindow):
         vl.setContentsMargins(25, 25, 25, 25)
         grp = QGroupBox("系统运行日志")
         v = QVBoxLayout(grp)
-        self.txt_log = QTextEdit()
-        self.txt_log.setReadOnly(True)
-        v.addWidget(self.txt_log)
+        self.log_view = LogView(log_file=lambda: sys_logger.log_file)
+        v.addWidget(self.log_view)
         vl.addWidget(grp)
         self.tabs.addTab(page, "日志审计")
 
@@ -846,6 +520,7 @@ class MainWindow(QMainWindow):
         self.ui_dec["list"].theme_mode = "dark" if self.is_dark else "light"
         self.ui_enc["list"].viewport().update()
         self.ui_dec["list"].viewport().update()
+        self.log_view.set_theme("dark" if self.is_dark else "light")
 
     def check_constraints(self):
         # 加密界面
@@ -874,17 +549,22 @@ class MainWindow(QMainWindow):
         flter = "所有文件 (*)" if is_encrypt else "加密文件 (*.enc)"
         files, _ = QFileDialog.getOpenFileNames(self, "选择文件", "", flter)
         if files:
-            existing = set([ui["list"].item(i).text() for i in range(ui["list"].count())])
-            for f in files:
-                if f not in existing: ui["list"].addItem(f)
+            ui["list"].add_paths([os.path.normpath(f) for f in files])
             self.check_constraints()
 
     def action_remove_file(self, lst, is_encrypt):
         self.reset_ui_state(is_encrypt)
-        for item in lst.selectedItems():
-            lst.takeItem(lst.row(item))
+        lst.remove_selected()
         self.check_constraints()
 
+    def _on_queue_changed(self, is_encrypt):
+        ui = self.ui_enc if is_encrypt else self.ui_dec
+        # 任务运行中队列被锁定，不重置界面状态
+        if ui["stack"].currentIndex() == 1:
+            return
+        self.check_constraints()
+        self.reset_ui_state(is_encrypt)
+
     def action_select_dir(self, is_encrypt):
         d = QFileDialog.getExistingDirectory(self, "选择输出目录")
         if d:
@@ -922,10 +602,11 @@ class MainWindow(QMainWindow):
         ui = self.ui_enc if is_encrypt else self.ui_dec
         count = ui["list"].count()
         if count == 0: return QMessageBox.warning(self, "操作提示", "任务队列为空。")
+        if ui["list"].is_scanning: return QMessageBox.warning(self, "操作提示", "正在枚举文件，请稍候。")
         pwd = ui["pwd"].text()
         if not pwd: return QMessageBox.warning(self, "安全提示", "必须输入密钥。")
 
-        files = [ui["list"].item(i).text() for i in range(count)]
+        files = ui["list"].paths()
         path = self.custom_enc_path if is_encrypt else self.custom_dec_path
 
         keep_struct = ui["chk_struct"].isChecked()
@@ -943,63 +624,132 @@ class MainWindow(QMainWindow):
             return QMessageBox.warning(self, "参数缺失",
                                        "您已启用 SSD 加速，但未选择有效的缓存目录。\n请点击 '择盘' 按钮设置路径。")
 
-        ui["list"].setEnabled(False)
-        ui["pwd"].setEnabled(False)
-        ui["stack"].setCurrentIndex(1)
-        ui["pbar"].setValue(0)
-        ui["status"].setText("正在初始化加密引擎...")
-
-        self.is_paused = False
-        self.worker = BatchWorkerThread(
-            files, pwd, is_encrypt,
+        self._launch_job(
+            is_encrypt, files, pwd,
             encrypt_filename=ui["chk_name"].isChecked() if is_encrypt and ui["chk_name"] else False,
             custom_out_dir=path,
             keep_structure=keep_struct,
             encrypt_dirname=enc_dirname,
             use_ssd=use_ssd,
-            ssd_dir=ssd_path
+            ssd_dir=ssd_path,
+            journal_dir=DIRS["JOURNAL"],
+            nice=QOS_BACKGROUND_NICE if ui["chk_bg"].isChecked() else 0,
+            io_priority="idle" if ui["chk_bg"].isChecked() else None,
+            rate_limit=ui["rate"].value() * 1024 * 1024,
+            delete_source=ui["chk_del"].isChecked(),
+            wipe="random" if ui["chk_del"].isChecked() and ui["chk_wipe"].isChecked() else None,
+            trace_dir=DIRS["TRACE"] if ui["chk_trace"].isChecked() else None
         )
 
-        self.worker.sig_progress.connect(self.update_progress)
-        self.worker.sig_log.connect(self.append_log)
-        self.worker.sig_finished.connect(lambda r: self.on_finished(r, is_encrypt))
-        self.worker.start()
+    def _launch_job(self, is_encrypt, files, pwd, **options):
+        ui = self.ui_enc if is_encrypt else self.ui_dec
+        ui["list"].setEnabled(False)
+        ui["pwd"].setEnabled(False)
+        ui["stack"].setCurrentIndex(1)
+        ui["pbar"].setValue(0)
+        ui["status"].setText("正在初始化加密引擎...")
 
-    def update_progress(self, text, val):
-        if not self.worker: return
-        is_enc_task = self.worker.is_enc
-        ui = self.ui_enc if is_enc_task else self.ui_dec
+        self.paused[is_encrypt] = False
+        ui["btn_pause"].setText("挂起任务")
+        worker = BatchJob(self.scheduler, files, pwd, is_encrypt,
+                          priority=ui["priority"].currentData(), metrics_dir=DIRS["METRICS"],
+                          events_dir=DIRS["EVENTS"], log_results=False, **options)
+
+        worker.sig_progress.connect(lambda text, val: self.update_progress(is_encrypt, text, val))
+        worker.sig_log.connect(self.append_log)
+        worker.sig_result.connect(self.append_result)
+        worker.sig_finished.connect(lambda r: self.on_finished(r, is_encrypt))
+        self.workers[is_encrypt] = worker
+        worker.start()
+
+    def check_unfinished_jobs(self):
+        """启动时检查上次异常中断的任务，提示恢复 (跳过已完成文件，回收暂存输出)"""
+        deferred = 0
+        for state in find_unfinished():
+            is_encrypt = state.is_encrypt
+            if self.workers[is_encrypt]:
+                continue
+            if state.deferred:
+                deferred += 1
+                continue
+            box = QMessageBox(QMessageBox.Question, "发现未完成的任务",
+                              f"{state.summary_text()}\n\n是否继续处理剩余文件？", parent=self)
+            btn_resume = box.addButton("恢复任务", QMessageBox.AcceptRole)
+            btn_drop = box.addButton("放弃", QMessageBox.DestructiveRole)
+            box.addButton("稍后处理", QMessageBox.RejectRole)
+            box.exec()
+
+            if box.clickedButton() is btn_drop:
+                state.mark(STATUS_ABANDONED)
+                self.append_log(f"已放弃未完成的任务 {state.job_id}")
+                continue
+            if box.clickedButton() is not btn_resume:
+                state.defer()
+                continue
+
+            pwd, ok = QInputDialog.getText(self, "恢复任务", "请输入原任务的密钥:", QLineEdit.Password)
+            if not ok or not pwd:
+                continue
+            if not state.check_key(pwd):
+                QMessageBox.warning(self, "安全提示", "密钥与原任务不一致，无法恢复。")
+                continue
+
+            self.tabs.setCurrentIndex(0 if is_encrypt else 1)
+            self.append_log(f"♻️ 恢复任务: {state.summary_text()}")
+            self._launch_job(is_encrypt, state.files, pwd, resume=state, **state.options)
+        if deferred:
+            self.append_log(f"⏸️ 有 {deferred} 个暂不恢复的未完成任务 (python cli.py jobs 查看，cli.py resume 恢复)")
+
+    def update_progress(self, is_encrypt, text, val):
+        if not self.workers[is_encrypt]: return
+        ui = self.ui_enc if is_encrypt else self.ui_dec
+        if self.paused[is_encrypt]: text = "任务已挂起"
         ui["status"].setText(text)
         ui["pbar"].setValue(val)
 
     def append_log(self, text):
-        t = datetime.now().strftime("%H:%M:%S.%f")[:-3]
-        color = "#a0a0a0" if self.is_dark else "#666"
-        self.txt_log.append(f"<span style='color:{color}'>[{t}]</span> {text}")
+        # 界面只入队 (定时合并显示)，完整记录写入日志文件
+        self.log_view.append(text)
         sys_logger.log(text)
 
-    def action_toggle_pause(self):
-        if not self.worker: return
-        is_enc_task = self.worker.is_enc
-        ui = self.ui_enc if is_enc_task else self.ui_dec
-        if self.is_paused:
-            self.worker.resume()
-            self.is_paused = False
+    def append_result(self, path, success, detail):
+        name = os.path.basename(path)
+        self.log_view.add_result(name, success, detail)
+        if success:
+            sys_logger.log(f"✅ {name}")
+        else:
+            sys_logger.log(f"❌ {name}: {detail}", "error")
+
+    def action_toggle_pause(self, is_encrypt):
+        worker = self.workers[is_encrypt]
+        if not worker: return
+        ui = self.ui_enc if is_encrypt else self.ui_dec
+        if self.paused[is_encrypt]:
+            worker.resume()
+            self.paused[is_encrypt] = False
             ui["btn_pause"].setText("挂起任务")
             ui["status"].setText("正在处理...")
         else:
-            self.worker.pause()
-            self.is_paused = True
+            worker.pause()
+            self.paused[is_encrypt] = True
             ui["btn_pause"].setText("继续任务")
             ui["status"].setText("任务已挂起")
 
-    def action_stop_task(self):
-        if self.worker:
-            if self.is_paused: self.worker.resume()
-            self.worker.stop()
-            self.append_log(f" 用户请求强行终止任务...")
+    def action_set_rate_limit(self, is_encrypt, mb_per_sec):
+        """运行中调整限速，立即下发给正在执行的任务"""
+        worker = self.workers[is_encrypt]
+        if worker:
+            worker.set_rate_limit(mb_per_sec * 1024 * 1024)
+
+    def action_stop_task(self, is_encrypt):
+        worker = self.workers[is_encrypt]
+        if worker:
+            worker.stop()
+            self.paused[is_encrypt] = False
+            self.append_log(f" 用户请求强行终止{'加密' if is_encrypt else '解密'}任务...")
 
     def on_finished(self, results, is_encrypt):
+        self.workers[is_encrypt] = None
         ui = self.ui_enc if is_encrypt else self.ui_dec
         ui["stack"].setCurrentIndex(2)
         ui["list"].setEnabled(True)
@@ -1009,16 +759,6 @@ class MainWindow(QMainWindow):
         if results["success"]:
             self.last_out_dir = os.path.dirname(results["success"][0][1])
 
-        chk_del = ui["chk_del"]
-        if chk_del.isChecked():
-            self.append_log("正在执行安全删除...")
-            for src, _ in results["success"]:
-                try:
-                    os.remove(src)
-                    self.append_log(f"已移除源文件: {os.path.basename(src)}")
-                except Exception as e:
-                    self.append_log(f"移除失败 {src}: {e}")
-
         succ = len(results["success"])
         fail = len(results["fail"])
         if fail == 0:
@@ -1026,6 +766,13 @@ class MainWindow(QMainWindow):
         else:
             QMessageBox.warning(self, "完成 (含异常)", f"成功: {succ}\n失败: {fail}\n请检查日志。")
 
+    def closeEvent(self, event):
+        # 终止所有任务并关闭进程池，避免残留工作进程
+        if any(self.workers.values()):
+            self.append_log("正在终止未完成的任务...")
+        self.scheduler.close()
+        super().closeEvent(event)
+
     def action_open_folder(self):
         if self.last_out_dir and os.path.exists(self.last_out_dir):
             QDesktopServices.openUrl(QUrl.fromLocalFile(self.last_out_dir))
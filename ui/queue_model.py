@@ -0,0 +1,77 @@
+import os
+from PySide6.QtCore import QAbstractListModel, QModelIndex, QThread, Qt, Signal
+
+from core.path_store import CompactPathStore
+from core.scanner import ParallelScanner
+
+
+class FileQueueModel(QAbstractListModel):
+    """任务队列模型：数据保存在 CompactPathStore 中，视图按需取行，不为每个文件创建控件项"""
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.store = CompactPathStore()
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.store)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        if role in (Qt.DisplayRole, Qt.ToolTipRole):
+            return self.store[index.row()]
+        return None
+
+    def add_paths(self, paths):
+        """追加路径 (自动去重)，返回新增数量"""
+        new, seen = [], set()
+        for p in paths:
+            if p in seen or p in self.store:
+                continue
+            seen.add(p)
+            new.append(p)
+        if not new:
+            return 0
+        first = len(self.store)
+        self.beginInsertRows(QModelIndex(), first, first + len(new) - 1)
+        self.store.extend(new)
+        self.endInsertRows()
+        return len(new)
+
+    def remove_rows(self, rows):
+        if not rows:
+            return
+        self.beginResetModel()
+        self.store.remove_rows(rows)
+        self.endResetModel()
+
+    def clear(self):
+        self.beginResetModel()
+        self.store.clear()
+        self.endResetModel()
+
+    def paths(self):
+        return self.store.to_list()
+
+
+class DirectoryScanThread(QThread):
+    """后台枚举拖入的文件/文件夹，分批把路径交回 GUI 线程"""
+    sig_batch = Signal(list)
+
+    def __init__(self, paths, parent=None):
+        super().__init__(parent)
+        self.scanner = ParallelScanner(paths, with_size=False)
+
+    def stop(self):
+        self.scanner.stop()
+
+    def run(self):
+        self.scanner.start()
+        while True:
+            entries = self.scanner.poll()
+            if entries:
+                self.sig_batch.emit([os.path.normpath(p) for p, _ in entries])
+            if self.scanner.done:
+                break
+            QThread.msleep(100)
+        self.scanner.join()
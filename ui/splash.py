@@ -1,11 +1,63 @@
 from PySide6.QtWidgets import QSplashScreen
 from PySide6.QtCore import Qt, QTimer, QRectF, QPointF
-from PySide6.QtGui import (QColor, QFont, QPainter, QPen, QConicalGradient,
-                           QRadialGradient, QLinearGradient, QBrush, QPainterPath)
-import math
+from PySide6.QtGui import (QColor, QFont, QPainter, QPen, QPixmap, QConicalGradient,
+                           QRadialGradient, QLinearGradient, QGuiApplication)
+import sys
+import time
+
+from config import SPLASH_ANIMATION, SPLASH_FPS, SPLASH_MIN_FPS, SPLASH_FRAME_BUDGET_MS
+
+# 动画速度 (按实际经过的时间推进，降帧后转速不变)
+FAST_DEG_PER_SEC = 750
+SLOW_DEG_PER_SEC = -312.5
+PULSE_PERIOD = 0.16
+
+RADIUS_CORE = 20
+RADIUS_FAST = 60
+RADIUS_SLOW = 45
+
+_RENDER_HINTS = QPainter.Antialiasing | QPainter.TextAntialiasing | QPainter.SmoothPixmapTransform
+
+
+def software_only():
+    """远程桌面 / 无 GPU 的虚拟显示：每帧都要经软件合成与网络传输，只绘制静态画面"""
+    if QGuiApplication.platformName() in ("offscreen", "minimal", "vnc", "linuxfb"):
+        return True
+    if sys.platform == "win32":
+        try:
+            import ctypes
+            return bool(ctypes.windll.user32.GetSystemMetrics(0x1000))  # SM_REMOTESESSION
+        except (AttributeError, OSError):
+            return False
+    return False
+
+
+def _canvas(w, h, dpr):
+    pix = QPixmap(int(w * dpr), int(h * dpr))
+    pix.setDevicePixelRatio(dpr)
+    pix.fill(Qt.transparent)
+    return pix
+
+
+def _sprite(radius, dpr, draw):
+    """以中心为原点绘制的图层 (旋转 / 缩放后整体贴图)"""
+    size = radius * 2
+    pix = _canvas(size, size, dpr)
+    painter = QPainter(pix)
+    painter.setRenderHints(_RENDER_HINTS)
+    painter.translate(radius, radius)
+    draw(painter)
+    painter.end()
+    return pix
 
 
 class IntroScreen(QSplashScreen):
+    """
+    启动画面。背景、标题与各个光环预先渲染为 QPixmap (按窗口大小与 DPI 缓存)，
+    每帧只旋转 / 缩放贴图；状态文字与进度条在进度变化时重绘。
+    绘制开销超出预算时逐级降低帧率，远程桌面等纯软件渲染环境直接显示静态画面。
+    """
+
     def __init__(self):
         super().__init__()
         self.setFixedSize(500, 320)
@@ -15,23 +67,33 @@ class IntroScreen(QSplashScreen):
         self.angle_fast = 0
         self.angle_slow = 0
         self.pulse_scale = 1.0
-        self.pulse_direction = 0.02
 
         self.loading_text = "CORE INITIALIZING..."
         self.progress = 0
 
+        self._layers = None
+        self._layers_key = None
+        self._status = None
+        self._status_key = None
+
+        self._start = time.perf_counter()
+        self._frame_cost = 0.0
+        self._frames = 0
+        self.interval = max(1, int(1000 / SPLASH_FPS))
+
         self.timer = QTimer(self)
         self.timer.timeout.connect(self.animate)
-        self.timer.start(16)
+        self.animated = SPLASH_ANIMATION == "on" or (SPLASH_ANIMATION == "auto" and not software_only())
+        if self.animated:
+            self.timer.start(self.interval)
 
     def animate(self):
-        self.angle_fast = (self.angle_fast + 12) % 360
-        self.angle_slow = (self.angle_slow - 5) % 360
-
-        self.pulse_scale += self.pulse_direction
-        if self.pulse_scale > 1.05 or self.pulse_scale < 0.95:
-            self.pulse_direction *= -1
-
+        t = time.perf_counter() - self._start
+        self.angle_fast = (t * FAST_DEG_PER_SEC) % 360
+        self.angle_slow = (t * SLOW_DEG_PER_SEC) % 360
+        # 三角波：0.95 ~ 1.05 往返
+        phase = (t / PULSE_PERIOD) % 1.0
+        self.pulse_scale = 0.95 + 0.1 * (1 - abs(2 * phase - 1))
         self.update()
 
     def update_progress(self, val, msg):
@@ -39,106 +101,143 @@ class IntroScreen(QSplashScreen):
         self.loading_text = f">_{msg.upper()}"
         self.update()
 
-    def paintEvent(self, event):
-        painter = QPainter(self)
-        painter.setRenderHints(QPainter.Antialiasing | QPainter.TextAntialiasing | QPainter.SmoothPixmapTransform)
-
-        w = self.width()
-        h = self.height()
-        rect = self.rect()
+    # ---------- 自适应帧率 ----------
+    def _adapt(self, cost):
+        self._frame_cost = cost if not self._frames else self._frame_cost * 0.8 + cost * 0.2
+        self._frames += 1
+        if SPLASH_ANIMATION != "auto" or not self.animated or self._frames % 15:
+            return
+        if self._frame_cost * 1000 <= SPLASH_FRAME_BUDGET_MS:
+            return
+        slowest = int(1000 / SPLASH_MIN_FPS)
+        if self.interval < slowest:
+            self.interval = min(slowest, self.interval * 2)
+            self.timer.setInterval(self.interval)
+        else:
+            # 最低帧率仍超出预算：停止动画，只在进度变化时重绘
+            self.timer.stop()
+            self.animated = False
+
+    # ---------- 预渲染图层 ----------
+    def _build_layers(self, w, h, dpr):
         cx, cy = w // 2, h // 2 - 15
 
-        # 1. 绘制背景
-        bg_rect = rect.adjusted(5, 5, -5, -5)
+        # 1. 背景 + 标题 + 进度条底槽
+        bg = _canvas(w, h, dpr)
+        painter = QPainter(bg)
+        painter.setRenderHints(_RENDER_HINTS)
         bg_grad = QRadialGradient(cx, cy, w * 0.8)
         bg_grad.setColorAt(0.0, QColor("#1a1b20"))
         bg_grad.setColorAt(1.0, QColor("#090a0c"))
-
         painter.setBrush(bg_grad)
         painter.setPen(QPen(QColor("#2a2b30"), 1))
-        painter.drawRoundedRect(bg_rect, 15, 15)
-
-        # 2. 绘制中心能量核心
-        painter.save()
-        painter.translate(cx, cy)
-        painter.scale(self.pulse_scale, self.pulse_scale)
-
-        core_grad = QRadialGradient(0, 0, 20)
-        core_grad.setColorAt(0.0, QColor(255, 255, 255, 200))
-        core_grad.setColorAt(0.3, QColor("#00e5ff"))
-        core_grad.setColorAt(1.0, Qt.transparent)
+        painter.drawRoundedRect(self.rect().adjusted(5, 5, -5, -5), 15, 15)
 
-        painter.setPen(Qt.NoPen)
-        painter.setBrush(core_grad)
-        painter.drawEllipse(QPointF(0, 0), 20, 20)
-        painter.restore()
-
-        # 3. 绘制动态能量环
-        painter.save()
-        painter.translate(cx, cy)
-        painter.rotate(self.angle_fast)
-
-        grad_fast = QConicalGradient(0, 0, 0)
-        grad_fast.setColorAt(0.0, QColor("#00e5ff"))
-        grad_fast.setColorAt(0.2, QColor(0, 229, 255, 50))
-        grad_fast.setColorAt(1.0, Qt.transparent)
-
-        pen_fast = QPen(grad_fast, 6)
-        pen_fast.setCapStyle(Qt.RoundCap)
-        painter.setPen(pen_fast)
-        radius_fast = 60
-        painter.drawArc(QRectF(-radius_fast, -radius_fast, radius_fast * 2, radius_fast * 2), 0, 270 * 16)
-
-        pen_glow = QPen(QColor(0, 229, 255, 30), 12)
-        painter.setPen(pen_glow)
-        painter.drawArc(QRectF(-radius_fast, -radius_fast, radius_fast * 2, radius_fast * 2), 10 * 16, 250 * 16)
-        painter.restore()
-
-        painter.save()
-        painter.translate(cx, cy)
-        painter.rotate(self.angle_slow)
-
-        grad_slow = QConicalGradient(0, 0, 180)
-        grad_slow.setColorAt(0.0, QColor("#ff0055"))
-        grad_slow.setColorAt(0.3, QColor(255, 0, 85, 40))
-        grad_slow.setColorAt(1.0, Qt.transparent)
-
-        pen_slow = QPen(grad_slow, 4)
-        pen_slow.setCapStyle(Qt.RoundCap)
-        painter.setPen(pen_slow)
-        radius_slow = 45
-        painter.drawArc(QRectF(-radius_slow, -radius_slow, radius_slow * 2, radius_slow * 2), 0, 220 * 16)
-        painter.restore()
-
-        # 4. 绘制文字信息
         title_font = QFont("Segoe UI", 22, QFont.Bold)
         title_font.setLetterSpacing(QFont.AbsoluteSpacing, 2)
         painter.setFont(title_font)
-
         painter.setPen(QColor(0, 229, 255, 30))
         painter.drawText(QRectF(0, h - 110, w, 40), Qt.AlignCenter, "ENCRYPTION CORE")
         painter.setPen(QColor("#ffffff"))
         painter.drawText(QRectF(0, h - 110, w, 40), Qt.AlignCenter, "ENCRYPTION CORE")
 
-        status_font = QFont("Consolas", 9)
-        painter.setFont(status_font)
-        painter.setPen(QColor("#00e5ff"))
-        painter.drawText(QRectF(40, h - 50, w - 80, 20), Qt.AlignLeft | Qt.AlignVCenter, self.loading_text)
-
-        painter.setPen(QColor("#666666"))
-        painter.drawText(QRectF(40, h - 50, w - 80, 20), Qt.AlignRight | Qt.AlignVCenter, f"[{self.progress}%]")
-
-        # 5. 极简进度条
-        bar_bg = QRectF(40, h - 25, w - 80, 3)
         painter.setBrush(QColor("#222222"))
         painter.setPen(Qt.NoPen)
-        painter.drawRoundedRect(bar_bg, 1.5, 1.5)
+        painter.drawRoundedRect(QRectF(40, h - 25, w - 80, 3), 1.5, 1.5)
+        painter.end()
+
+        # 2. 中心能量核心 (脉动时整体缩放，留出放大的余量)
+        def draw_core(p):
+            core_grad = QRadialGradient(0, 0, RADIUS_CORE)
+            core_grad.setColorAt(0.0, QColor(255, 255, 255, 200))
+            core_grad.setColorAt(0.3, QColor("#00e5ff"))
+            core_grad.setColorAt(1.0, Qt.transparent)
+            p.setPen(Qt.NoPen)
+            p.setBrush(core_grad)
+            p.drawEllipse(QPointF(0, 0), RADIUS_CORE, RADIUS_CORE)
+
+        # 3. 快速外环 (含光晕) 与慢速内环
+        def draw_fast(p):
+            grad = QConicalGradient(0, 0, 0)
+            grad.setColorAt(0.0, QColor("#00e5ff"))
+            grad.setColorAt(0.2, QColor(0, 229, 255, 50))
+            grad.setColorAt(1.0, Qt.transparent)
+            pen = QPen(grad, 6)
+            pen.setCapStyle(Qt.RoundCap)
+            p.setPen(pen)
+            box = QRectF(-RADIUS_FAST, -RADIUS_FAST, RADIUS_FAST * 2, RADIUS_FAST * 2)
+            p.drawArc(box, 0, 270 * 16)
+            p.setPen(QPen(QColor(0, 229, 255, 30), 12))
+            p.drawArc(box, 10 * 16, 250 * 16)
+
+        def draw_slow(p):
+            grad = QConicalGradient(0, 0, 180)
+            grad.setColorAt(0.0, QColor("#ff0055"))
+            grad.setColorAt(0.3, QColor(255, 0, 85, 40))
+            grad.setColorAt(1.0, Qt.transparent)
+            pen = QPen(grad, 4)
+            pen.setCapStyle(Qt.RoundCap)
+            p.setPen(pen)
+            p.drawArc(QRectF(-RADIUS_SLOW, -RADIUS_SLOW, RADIUS_SLOW * 2, RADIUS_SLOW * 2), 0, 220 * 16)
+
+        return {"bg": bg,
+                "core": (_sprite(RADIUS_CORE + 2, dpr, draw_core), RADIUS_CORE + 2),
+                "fast": (_sprite(RADIUS_FAST + 8, dpr, draw_fast), RADIUS_FAST + 8),
+                "slow": (_sprite(RADIUS_SLOW + 4, dpr, draw_slow), RADIUS_SLOW + 4)}
+
+    def _build_status(self, w, h, dpr):
+        """状态文字 + 进度条 (只在进度变化时重绘)"""
+        pix = _canvas(w, 50, dpr)
+        painter = QPainter(pix)
+        painter.setRenderHints(_RENDER_HINTS)
+        painter.setFont(QFont("Consolas", 9))
+        painter.setPen(QColor("#00e5ff"))
+        painter.drawText(QRectF(40, 0, w - 80, 20), Qt.AlignLeft | Qt.AlignVCenter, self.loading_text)
+        painter.setPen(QColor("#666666"))
+        painter.drawText(QRectF(40, 0, w - 80, 20), Qt.AlignRight | Qt.AlignVCenter, f"[{self.progress}%]")
 
         if self.progress > 0:
-            bar_w = (w - 80) * (self.progress / 100.0)
-            bar_fg = QRectF(40, h - 25, bar_w, 3)
             bar_grad = QLinearGradient(40, 0, w - 40, 0)
             bar_grad.setColorAt(0, QColor("#00e5ff"))
             bar_grad.setColorAt(1, QColor("#ff0055"))
             painter.setBrush(bar_grad)
-            painter.drawRoundedRect(bar_fg, 1.5, 1.5)
\ No newline at end of file
+            painter.setPen(Qt.NoPen)
+            painter.drawRoundedRect(QRectF(40, 25, (w - 80) * (self.progress / 100.0), 3), 1.5, 1.5)
+        painter.end()
+        return pix
+
+    def paintEvent(self, event):
+        start = time.perf_counter()
+        w, h = self.width(), self.height()
+        dpr = self.devicePixelRatioF()
+
+        key = (w, h, dpr)
+        if self._layers_key != key:
+            self._layers = self._build_layers(w, h, dpr)
+            self._layers_key = key
+            self._status_key = None
+        status_key = (key, self.loading_text, self.progress)
+        if self._status_key != status_key:
+            self._status = self._build_status(w, h, dpr)
+            self._status_key = status_key
+
+        painter = QPainter(self)
+        painter.setRenderHints(_RENDER_HINTS)
+        painter.drawPixmap(0, 0, self._layers["bg"])
+
+        cx, cy = w // 2, h // 2 - 15
+        for name, angle, scale in (("core", 0, self.pulse_scale), ("fast", self.angle_fast, 1.0),
+                                   ("slow", self.angle_slow, 1.0)):
+            pix, r = self._layers[name]
+            painter.save()
+            painter.translate(cx, cy)
+            if angle:
+                painter.rotate(angle)
+            if scale != 1.0:
+                painter.scale(scale, scale)
+            painter.drawPixmap(-r, -r, pix)
+            painter.restore()
+
+        painter.drawPixmap(0, h - 50, self._status)
+        painter.end()
+        self._adapt(time.perf_counter() - start)